@@ -0,0 +1,69 @@
+"""
+Throughput of ConcurrentDictOfLoggedDict with a growing number of threads. Each thread updates its own share of the
+records (a new value per round) and reads others with get(); every few rounds it iterates over all the records.
+
+Threads only run in parallel on free-threaded CPython (3.13t and later, with the GIL disabled): with the GIL, the
+number of operations per second stays flat (or drops) as threads are added.
+
+Usage: python -m benchmarks.concurrentStress [numRecords] [numRounds]
+"""
+import sys
+from threading import Barrier, Thread
+from time import perf_counter
+
+from src.CAPcore.Concurrent import ConcurrentDictOfLoggedDict
+
+
+def worker(data, barrier, keys, otherKeys, numRounds, counts, n):
+    barrier.wait()
+    numOps = 0
+    for r in range(numRounds):
+        for k, other in zip(keys, otherKeys):
+            data.update({k: {'round': r, 'worker': n}})
+            data.get(other)
+            numOps += 2
+        if r % 10 == 0:
+            numOps += sum(1 for _ in data.keys())
+    counts[n] = numOps
+
+
+def run(numThreads: int, numRecords: int, numRounds: int) -> float:
+    data = ConcurrentDictOfLoggedDict(epochTimestamps=True, keepHistory=False)
+    allKeys = [f"k{i}" for i in range(numRecords)]
+    data.update({k: {'round': -1, 'worker': -1} for k in allKeys})
+
+    barrier = Barrier(numThreads + 1)
+    counts = [0] * numThreads
+    perThread = numRecords // numThreads
+    threads = []
+    for n in range(numThreads):
+        keys = allKeys[n * perThread:(n + 1) * perThread]
+        otherKeys = list(reversed(keys))
+        threads.append(Thread(target=worker, args=(data, barrier, keys, otherKeys, numRounds // numThreads, counts, n)))
+
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = perf_counter() - start
+
+    assert data.checkCounters()
+    return sum(counts) / elapsed
+
+
+def main(numRecords: int = 4000, numRounds: int = 80):
+    isGILEnabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f"Python {sys.version.split()[0]} GIL {'enabled' if isGILEnabled else 'disabled'}, {numRecords} records")
+    print(f"{'threads':>7} {'ops/s':>12} {'speedup':>8}")
+
+    base = None
+    for numThreads in (1, 2, 4, 8):
+        opsPerSecond = run(numThreads, numRecords, numRounds)
+        base = base or opsPerSecond
+        print(f"{numThreads:7} {opsPerSecond:12.0f} {opsPerSecond / base:8.2f}")
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -0,0 +1,56 @@
+"""
+Memory of a DictOfLoggedDict loaded from parsed rows (every key and value a new object, as when reading a CSV or
+JSON) without and with interning, and the statistics of the pool.
+
+Usage: python -m benchmarks.internMemory [numRecords]
+"""
+import sys
+import tracemalloc
+from time import perf_counter
+
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict
+from src.CAPcore.Interning import disableInterning, enableInterning
+
+TEAMS = [f"Team number {i}" for i in range(30)]
+STATUSES = ["active", "injured", "suspended", "retired"]
+
+
+def parsedRow(i: int) -> dict:
+    # json.loads/csv build new objects for every key and value: joined strings do the same
+    fields = {'team': TEAMS[i % len(TEAMS)], 'status': STATUSES[i % len(STATUSES)], 'position': "guard",
+              'name': f"Player {i}", 'season': "2024-2025"}
+    return {"".join(list(k)): "".join(list(v)) for k, v in fields.items()}
+
+
+def load(numRecords: int, measureMemory: bool):
+    if measureMemory:
+        tracemalloc.start()
+    start = perf_counter()
+    data = DictOfLoggedDict(keepHistory=False)
+    data.update({f"p{i}": parsedRow(i) for i in range(numRecords)})
+    elapsed = perf_counter() - start
+    memory = 0
+    if measureMemory:
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    return data, memory, elapsed
+
+
+def main(numRecords: int = 50000):
+    _, _, plainTime = load(numRecords, False)
+    _, plainMemory, _ = load(numRecords, True)
+    pool = enableInterning()
+    _, _, internTime = load(numRecords, False)
+    pool.clear()
+    _, internMemory, _ = load(numRecords, True)
+    disableInterning()
+
+    stats = pool.stats()
+    print(f"{numRecords} records")
+    print(f"{'plain':>8} {plainMemory / 2 ** 20:8.1f} MiB {plainTime:6.2f}s")
+    print(f"{'interned':>8} {internMemory / 2 ** 20:8.1f} MiB {internTime:6.2f}s")
+    print(f"pool: {stats.size} values, hit rate {stats.hitRate:.1%}, {stats.bytesSaved / 2 ** 20:.1f} MiB saved")
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
@@ -0,0 +1,49 @@
+"""
+Per object memory of LoggedValue, LoggedDict and DictData with __slots__ compared to the same attributes kept in a
+__dict__ (the layout before __slots__ were added). Only the object itself is measured, as attribute values are shared.
+
+Usage: python -m benchmarks.memSlots [numObjects]
+"""
+import sys
+import tracemalloc
+
+from src.CAPcore.DictLoggedDict import DictData
+from src.CAPcore.LoggedDict import LoggedDict
+from src.CAPcore.LoggedValue import LoggedValue
+from src.CAPcore.Python import classSlots
+
+
+def dictBasedClass(cls):
+    """Builds a class that holds the same attributes as the objects of cls, in a __dict__"""
+    attrs = sorted(classSlots(cls))
+
+    def init(self, source):
+        for attr in attrs:
+            setattr(self, attr, getattr(source, attr))
+
+    return type(f"DictBased{cls.__name__}", (), {'__init__': init})
+
+
+def memPerObject(builder, numObjects):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [builder() for _ in range(numObjects)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return (after - before - sys.getsizeof(objects)) / numObjects
+
+
+def main(numObjects: int = 100000):
+    sources = {'LoggedValue': LoggedValue(5), 'LoggedDict': LoggedDict(), 'DictData': DictData()}
+
+    print(f"{'class':12} {'__dict__':>10} {'__slots__':>10}  (bytes per object, {numObjects} objects)")
+    for name, obj in sources.items():
+        dictBasedCls = dictBasedClass(type(obj))
+        dictBased = memPerObject(lambda o=obj, c=dictBasedCls: c(o), numObjects)
+        slotBased = memPerObject(lambda o=obj: object.__new__(type(o)), numObjects)
+        print(f"{name:12} {dictBased:10.1f} {slotBased:10.1f}")
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
@@ -0,0 +1,52 @@
+"""
+Time of DictOfLoggedDict.diff against Parallel.parallelDiff with a growing number of worker processes. The new values
+change one field of about 10% of the records, add some and leave some out.
+
+Times include starting the workers. Speedup is bounded by the number of CPUs and by the work left in the parent
+(finding the shared keys, merging the results and the records added or removed). The pool is forced (minRecords=0) so
+that it is measured even where parallelDiff would compute the diff in the calling process.
+
+Usage: python -m benchmarks.parallelDiff [numRecords] [chunkSize]
+"""
+import os
+import sys
+from time import perf_counter
+
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict
+from src.CAPcore.Parallel import DEFAULTCHUNKSIZE, chooseStartMethod, parallelDiff
+
+NUMFIELDS = 12
+
+
+def buildData(numRecords: int):
+    data = DictOfLoggedDict(epochTimestamps=True, keepHistory=False)
+    data.update({f"k{i}": {f"f{j}": f"value {i} {j}" for j in range(NUMFIELDS)} for i in range(numRecords)})
+
+    newValues = {}
+    for i in range(numRecords // 50, numRecords + numRecords // 50):
+        record = {f"f{j}": f"value {i} {j}" for j in range(NUMFIELDS)}
+        if i % 10 == 0:
+            record['f0'] = 'changed'
+        newValues[f"k{i}"] = record
+    return data, newValues
+
+
+def main(numRecords: int = 200000, chunkSize: int = DEFAULTCHUNKSIZE):
+    data, newValues = buildData(numRecords)
+    print(f"{numRecords} records, chunks of {chunkSize}, {os.cpu_count()} CPUs, {chooseStartMethod()}")
+
+    start = perf_counter()
+    expected = data.diff(newValues)
+    serial = perf_counter() - start
+    print(f"{'serial diff':>12} {serial:8.2f}s")
+
+    for numWorkers in (2, 4, 8):
+        start = perf_counter()
+        result = parallelDiff(data, newValues, maxWorkers=numWorkers, chunkSize=chunkSize, minRecords=0)
+        elapsed = perf_counter() - start
+        assert result.changeCount == expected.changeCount
+        print(f"{numWorkers:4} workers {elapsed:8.2f}s {serial / elapsed:6.2f}x")
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:3]])
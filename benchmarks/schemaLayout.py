@@ -0,0 +1,58 @@
+"""
+Memory and times (load, diff, replace) of a DictOfLoggedDict whose records have the same keys, with plain dicts and
+with shared schemas (DictOfLoggedDict(sharedSchemas=True)). Memory and load time are measured together, with
+tracemalloc on, so the load times are inflated. The diff time is the best of 3 runs.
+
+Usage: python -m benchmarks.schemaLayout [numRecords]
+"""
+import sys
+import tracemalloc
+from time import perf_counter
+
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict
+
+NUMFIELDS = 8
+
+
+def rows(numRecords: int, changed: bool = False) -> dict:
+    result = {}
+    for i in range(numRecords):
+        record = {f"field{j}": i * NUMFIELDS + j for j in range(NUMFIELDS)}
+        if changed and i % 10 == 0:
+            record['field0'] = -1
+        result[f"k{i}"] = record
+    return result
+
+
+def timeDiff(data: DictOfLoggedDict, newValues: dict) -> float:
+    start = perf_counter()
+    data.diff(newValues)
+    return perf_counter() - start
+
+
+def main(numRecords: int = 50000):
+    source = rows(numRecords)
+    newValues = rows(numRecords, changed=True)
+    print(f"{numRecords} records with {NUMFIELDS} fields")
+    print(f"{'layout':>8} {'memory':>10} {'load':>7} {'diff':>7} {'replace':>8}")
+
+    for sharedSchemas in (False, True):
+        tracemalloc.start()
+        start = perf_counter()
+        data = DictOfLoggedDict.fromIterable(source, keepHistory=False, sharedSchemas=sharedSchemas)
+        loadTime = perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        diffTime = min(timeDiff(data, newValues) for _ in range(3))
+
+        start = perf_counter()
+        data.replace(newValues)
+        replaceTime = perf_counter() - start
+
+        name = "schemas" if sharedSchemas else "dicts"
+        print(f"{name:>8} {memory / 2 ** 20:6.1f} MiB {loadTime:6.2f}s {diffTime:6.2f}s {replaceTime:7.2f}s")
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
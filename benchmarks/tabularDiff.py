@@ -0,0 +1,64 @@
+"""
+Time of TabularDiff.diffTable against DictOfLoggedDict.diff for a columnar snapshot that changes one field of about
+10% of the records. diff is timed twice: with the rows already built as dicts, and including building them from the
+columns, which is what a caller that has the table must do before calling it.
+
+Values live in a LoggedValue each, so both compare them one by one in Python: diffTable saves building the rows, not
+the comparisons.
+
+Usage: python -m benchmarks.tabularDiff [numRecords]
+"""
+import sys
+from time import perf_counter
+
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict
+from src.CAPcore.TabularDiff import diffTable
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+NUMFIELDS = 10
+NUMRUNS = 5
+
+
+def buildData(numRecords: int):
+    data = DictOfLoggedDict(keepHistory=False)
+    data.update({f"k{i}": {f"f{j}": f"value {i} {j}" for j in range(NUMFIELDS)} for i in range(numRecords)})
+
+    table = {'id': [f"k{i}" for i in range(numRecords)]}
+    for j in range(NUMFIELDS):
+        table[f"f{j}"] = [f"value {i} {j}" if (i % 10 or j) else 'changed' for i in range(numRecords)]
+    return data, table
+
+
+def tableRows(table: dict) -> dict:
+    return {k: {name: column[row] for name, column in table.items() if name != 'id'}
+            for row, k in enumerate(table['id'])}
+
+
+def bestTime(func) -> float:
+    result = None
+    for _ in range(NUMRUNS):
+        start = perf_counter()
+        func()
+        elapsed = perf_counter() - start
+        result = elapsed if result is None else min(result, elapsed)
+    return result
+
+
+def main(numRecords: int = 20000):
+    data, table = buildData(numRecords)
+    rows = tableRows(table)
+    print(f"{numRecords} records of {NUMFIELDS} fields, NumPy {'available' if numpy is not None else 'not available'}")
+
+    assert diffTable(data, table, 'id').changeCount == data.diff(rows).changeCount
+    for name, func in (("diff (rows built)", lambda: data.diff(rows)),
+                       ("rows + diff", lambda: data.diff(tableRows(table))),
+                       ("diffTable", lambda: diffTable(data, table, 'id'))):
+        print(f"{name:>18} {bestTime(func):8.3f}s")
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
@@ -0,0 +1,56 @@
+"""
+Batches of changes for LoggedDict, DictData and DictOfLoggedDict.
+
+Inside a batch the changes made through the methods of the container get the same timestamp (the clock is read
+once) and the history entries and change counters they would add are left for the end of the batch, where a single
+summary entry is written. Optionally, if the block raises, the container is restored to its state before the batch.
+"""
+from contextlib import contextmanager
+
+from .LoggedValue import changeTimestamp
+
+
+class BatchState:
+    """
+    Status of an open batch
+    """
+    __slots__ = ('timestamp', 'numEntries', 'numChanges')
+
+    def __init__(self, timestamp, numChanges=None):
+        self.timestamp = timestamp
+        self.numEntries: int = 0  # History entries held back
+        self.numChanges = numChanges  # Value of the change counter of the container at the start
+
+
+@contextmanager
+def batchOf(container, timestamp=None, rollback: bool = False):
+    """
+    Implementation of the batch() method of the containers. A batch opened while another one is open joins it (its
+    timestamp and rollback settings are ignored).
+    :param container: a LoggedDict, DictData or DictOfLoggedDict
+    :param timestamp: time for all the changes. If None, the time when the batch starts
+    :param rollback: if the block raises an exception, restore the container to how it was before the batch (with a
+                     transaction, see the begin() method of the container, so it can't be used while another
+                     transaction is open). Listeners are not told about the restoration
+    """
+    if container.batchState is not None:
+        yield container
+        return
+
+    transaction = container.begin() if rollback else None
+    state = BatchState(changeTimestamp(timestamp, container.timestamp), getattr(container, 'numChanges', None))
+    container.batchState = state
+    try:
+        yield container
+    except BaseException:
+        container.batchState = None
+        if transaction is not None:
+            transaction.rollback()
+        else:
+            container._endBatch(state)
+        raise
+
+    container.batchState = None
+    container._endBatch(state)
+    if transaction is not None:
+        transaction.commit()
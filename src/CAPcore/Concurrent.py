@@ -0,0 +1,243 @@
+"""
+Thread-safe DictOfLoggedDict.
+
+Records are protected by striped locks (the record of k by stripes[hash(k) % numStripes]) so threads working on
+different records don't wait for each other (in free-threaded CPython they run in parallel). The structure of the
+container (insertion of records, counters, its own history) is protected by structureLock, which is only held for
+short bookkeeping steps. Operations that span the whole container (replace, renameKeys, exclusions, diffs, compaction,
+indexes...) take every lock, see exclusive().
+
+Locks are always taken in the same order (stripes in ascending order, then structureLock) so they can't deadlock.
+Listeners are called with the lock of the record and structureLock held: they must not wait for other threads that use
+the container. keys(), items() and values() iterate over a copy taken at once, never over the live records, and get()
+doesn't support views (a view would read the record without its lock). A batch holds every lock until it ends; a
+transaction doesn't, so it also records (and rolls back) the changes other threads make while it is open.
+
+The time of a change is taken before the lock of the record, so a thread can get the lock after another one that took
+a later time. Changes of a record are never recorded before the last one: they get its time instead. Its commit and
+rollback take every lock, so other threads don't see (or change) records while they are being restored.
+"""
+from contextlib import contextmanager, ExitStack
+from functools import wraps
+from threading import RLock
+from time import struct_time
+from typing import List, Optional, Set
+
+from .DictLoggedDict import DictOfLoggedDict
+from .Transactions import ContainerTransaction
+
+
+def _exclusive(func):
+    @wraps(func)
+    def wrapper(self, *kargs, **kwargs):
+        with self.exclusive():
+            return func(self, *kargs, **kwargs)
+
+    return wrapper
+
+
+class ConcurrentTransaction(ContainerTransaction):
+    """
+    Transaction of a ConcurrentDictOfLoggedDict: commit and rollback run with every lock of the container held
+    """
+
+    def commit(self):
+        with self.container.exclusive():
+            super().commit()
+
+    def rollback(self):
+        with self.container.exclusive():
+            super().rollback()
+
+
+class ConcurrentDictOfLoggedDict(DictOfLoggedDict):
+    def __init__(self, exclusions: Optional[Set[str]] = None, timestamp: Optional[struct_time] = None,
+                 epochTimestamps: bool = False, keepHistory: bool = True, sharedSchemas: bool = False,
+                 compactHistory: bool = False, numStripes: int = 64):
+        """
+        :param exclusions: see DictOfLoggedDict
+        :param timestamp: see DictOfLoggedDict
+        :param epochTimestamps: see DictOfLoggedDict
+        :param keepHistory: see DictOfLoggedDict
+        :param sharedSchemas: see DictOfLoggedDict
+        :param compactHistory: see DictOfLoggedDict
+        :param numStripes: number of locks shared by the records
+        """
+        self._createLocks(numStripes)
+        super().__init__(exclusions=exclusions, timestamp=timestamp, epochTimestamps=epochTimestamps,
+                         keepHistory=keepHistory, sharedSchemas=sharedSchemas, compactHistory=compactHistory)
+
+    def _createLocks(self, numStripes: int):
+        if numStripes < 1:
+            raise ValueError(f"numStripes must be positive: {numStripes}")
+        self.structureLock = RLock()
+        self.stripes: List[RLock] = [RLock() for _ in range(numStripes)]
+
+    def recordLock(self, k) -> RLock:
+        """
+        Lock that protects the record of k
+        """
+        return self.stripes[hash(k) % len(self.stripes)]
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Context manager that holds every lock of the container: nothing else changes it while the block runs
+        """
+        with ExitStack() as stack:
+            for lock in self.stripes:
+                stack.enter_context(lock)
+            stack.enter_context(self.structureLock)
+            yield self
+
+    # Bookkeeping of the container
+    def _insertRecord(self, k, record):
+        with self.structureLock:
+            super()._insertRecord(k, record)
+
+    def _countChange(self, live: int, deleted: int):
+        with self.structureLock:
+            super()._countChange(live, deleted)
+
+    def _noteChange(self, changeTime, data: Optional[str] = None):
+        with self.structureLock:
+            super()._noteChange(max(changeTime, self.timestamp), data)
+
+    def _touch(self, k):
+        with self.structureLock:
+            super()._touch(k)
+
+    def _recordChanged(self, k, event):
+        # Indexes and listeners are shared by all the records
+        with self.structureLock:
+            super()._recordChanged(k, event)
+
+    # Operations on a single record
+    def __setitem__(self, k, v, timestamp: Optional[struct_time] = None):
+        with self.recordLock(k):
+            return super().__setitem__(k, v, timestamp=timestamp)
+
+    def _recordTime(self, k, changeTime):
+        """
+        Time for a change of the record of k taken before its lock: changeTime or, if it is later, the time of the last
+        change of the record or its values. Called with the lock held. O(number of subkeys), as comparing the record
+        """
+        record = self.current.get(k)
+        if record is None:
+            return changeTime
+        return max(changeTime, record.last_updated, *(v.last_updated for v in record.current.values()))
+
+    def _updateRecord(self, k, v, changeTime, replaceInner: bool) -> bool:
+        with self.recordLock(k):
+            return super()._updateRecord(k, v, self._recordTime(k, changeTime), replaceInner)
+
+    def _purgeRecord(self, k, changeTime) -> bool:
+        with self.recordLock(k):
+            return super()._purgeRecord(k, self._recordTime(k, changeTime))
+
+    def pop(self, key, *kargs, timestamp: Optional[struct_time] = None):
+        with self.recordLock(key):
+            return super().pop(key, *kargs, timestamp=timestamp)
+
+    def __getitem__(self, k):
+        with self.recordLock(k):
+            return super().__getitem__(k)
+
+    def get(self, key, views: bool = False):
+        """
+        Copy of the record of key. views is not supported (a view would read the record without the lock)
+        """
+        if views:
+            raise ValueError("ConcurrentDictOfLoggedDict: views can't be used concurrently")
+        with self.recordLock(key):
+            return super().get(key)
+
+    # Iteration: over a consistent copy
+    def _liveCopy(self) -> dict:
+        """
+        Copy of the live records as dicts, taken with every lock held so it doesn't include half-done changes
+        :return: {outer key: dict}
+        """
+        with self.exclusive():
+            return {k: v._asdict() for k, v in self.current.items() if not v.isDeleted()}
+
+    def keys(self):
+        with self.structureLock:
+            result = [k for k, v in self.current.items() if not v.isDeleted()]
+        yield from result
+
+    def items(self, views: bool = False):
+        if views:
+            raise ValueError("ConcurrentDictOfLoggedDict: views can't be used concurrently")
+        yield from self._liveCopy().items()
+
+    def values(self, views: bool = False):
+        if views:
+            raise ValueError("ConcurrentDictOfLoggedDict: views can't be used concurrently")
+        yield from self._liveCopy().values()
+
+    def keysV(self):
+        with self.structureLock:
+            return list(self.current.keys())
+
+    def itemsV(self):
+        with self.structureLock:
+            return list(self.current.items())
+
+    def valuesV(self):
+        with self.structureLock:
+            return list(self.current.values())
+
+    # Operations on the whole container
+    @contextmanager
+    def batch(self, timestamp: Optional[struct_time] = None, rollback: bool = False):
+        """
+        See DictOfLoggedDict.batch. Other threads wait until the batch ends
+        """
+        with self.exclusive(), super().batch(timestamp=timestamp, rollback=rollback):
+            yield self
+
+    def begin(self) -> ConcurrentTransaction:
+        """
+        See DictOfLoggedDict.begin. Commit and rollback wait for the changes other threads are making
+        """
+        with self.exclusive():
+            if self.transaction is not None:
+                raise ValueError("A transaction is already open")
+            return ConcurrentTransaction(self)
+
+    replace = _exclusive(DictOfLoggedDict.replace)
+    applyDiff = _exclusive(DictOfLoggedDict.applyDiff)
+    applyChange = _exclusive(DictOfLoggedDict.applyChange)
+    addExclusion = _exclusive(DictOfLoggedDict.addExclusion)
+    removeExclusion = _exclusive(DictOfLoggedDict.removeExclusion)
+    renameKeys = _exclusive(DictOfLoggedDict.renameKeys)
+    compact = _exclusive(DictOfLoggedDict.compact)
+    setKeepHistory = _exclusive(DictOfLoggedDict.setKeepHistory)
+    addChangeListener = _exclusive(DictOfLoggedDict.addChangeListener)
+    removeChangeListener = _exclusive(DictOfLoggedDict.removeChangeListener)
+    addIndex = _exclusive(DictOfLoggedDict.addIndex)
+    removeIndex = _exclusive(DictOfLoggedDict.removeIndex)
+    find = _exclusive(DictOfLoggedDict.find)
+    snapshot = _exclusive(DictOfLoggedDict.snapshot)
+    diff = _exclusive(DictOfLoggedDict.diff)
+    differs = _exclusive(DictOfLoggedDict.differs)
+    subkeys = _exclusive(DictOfLoggedDict.subkeys)
+    extractKey = _exclusive(DictOfLoggedDict.extractKey)
+    compareWithOtherKeys = _exclusive(DictOfLoggedDict.compareWithOtherKeys)
+    checkCounters = _exclusive(DictOfLoggedDict.checkCounters)
+    show = _exclusive(DictOfLoggedDict.show)
+    changesSince = _exclusive(DictOfLoggedDict.changesSince)
+    _asdict = _exclusive(DictOfLoggedDict._asdict)
+
+    def __getstate__(self):
+        with self.exclusive():
+            result = super().__getstate__()
+        result['numStripes'] = len(result.pop('stripes'))
+        result.pop('structureLock')
+        return result
+
+    def __setstate__(self, state):
+        auxState = dict(state)
+        self._createLocks(auxState.pop('numStripes', 64))
+        super().__setstate__(auxState)
@@ -1,10 +1,50 @@
-from functools import wraps
-from time import gmtime, struct_time, strftime
-from typing import Optional, Set, List, Dict, Tuple
-
-from .LoggedDict import LoggedDict
-from .LoggedValue import DATEFORMAT
+from copy import deepcopy
+from functools import partial, wraps
+from time import struct_time
+from typing import Callable, Optional, Set, List, Dict, Tuple
+from weakref import WeakSet
+
+from .Batch import BatchState, batchOf
+from .Indexes import SubkeyIndex
+from .LoggedDict import ChangeEvent, LoggedDict, LoggedDictDiff, LoggedDictView
+from .LoggedValue import changeTimestamp, formatTimestamp, initialTimestamp
 from .Misc import compareSets, SetDiff, chainKargs
+from .Python import slotsGetState
+from .Retention import CompactionReport, RetentionPolicy, addReports
+from .Schemas import SchemaDict, SchemaFamily
+from .Snapshots import Snapshot
+from .Subscriptions import ChangeQueue, DEFAULTQUEUELENGTH
+from .Transactions import ContainerTransaction
+
+
+class UpdateRecord:
+    """
+    History entry of an update of a DictData. Keeps the diff (or a copy of the parameters of the call when there is no
+    diff) and renders the text only when it is printed.
+    """
+    __slots__ = ('operation', 'kargs', 'kwargs', 'changes')
+
+    def __init__(self, operation: str, kargs: Tuple = (), kwargs: Optional[Dict] = None, changes=None):
+        self.operation: str = operation
+        self.changes = changes
+        # Copied: the caller may change them later. Not kept when the diff tells what changed
+        self.kargs: Tuple = deepcopy(kargs) if changes is None else ()
+        self.kwargs: Dict = deepcopy(kwargs or {}) if changes is None else {}
+
+    def __str__(self):
+        if self.changes is None:
+            return f"Updated data {self.operation} kargs={self.kargs} kwargs={self.kwargs}"
+        return f"Updated data {self.changes}"
+
+    __repr__ = __str__
+
+    def __eq__(self, other):
+        if isinstance(other, (str, UpdateRecord)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
 
 
 def _checkDeletedUpdate(func, canDiff=False):
@@ -14,17 +54,26 @@ def _checkDeletedUpdate(func, canDiff=False):
             raise ValueError("Attempting to update a deleted record")
         result = False
 
-        changes = f"{func.__name__} kargs={kargs} kwargs={kwargs}"
+        if self.batchState is not None:
+            # The history entry is left for the end of the batch
+            result = func(self, *kargs, **kwargs)
+            if result:
+                self.batchState.numEntries += 1
+            return result
+
+        if not self.keepHistory:
+            return func(self, *kargs, **kwargs)
+
+        changes = None
         if canDiff:
             purgedKWParams = {k: v for k, v in kwargs.items() if k not in {'timestamp'}}
-            auxChanges = self.diff(*kargs, **purgedKWParams)
-            changes = f"{auxChanges}"
+            changes = self.diff(*kargs, **purgedKWParams)
 
         result = func(self, *kargs, **kwargs)
 
         if result:
-            dateField = kwargs.get('timestamp', gmtime())
-            self.addHistory(dateField, f"Updated data {changes}")
+            dateField = self._changeTime(kwargs.get('timestamp'))
+            self.addHistory(UpdateRecord(func.__name__, kargs, kwargs, changes), timestamp=dateField)
         return result
 
     return wrapper
@@ -42,11 +91,26 @@ def _checkDeletedRead(func):
 
 
 class DictData(LoggedDict):
-    def __init__(self, timestamp: Optional[struct_time] = None, exclusions: Optional[Set] = None):
-        super().__init__(exclusions=exclusions)
-        self.last_updated = timestamp or gmtime()
+    __slots__ = ('last_updated', 'deleted', 'history', 'keepHistory', 'owner')
+
+    def __init__(self, timestamp: Optional[struct_time] = None, exclusions: Optional[Set] = None,
+                 epochTimestamps: bool = False, keepHistory: bool = True, compactHistory: bool = False):
+        """
+        :param timestamp: time of creation. An int (nanoseconds since the epoch) sets epoch mode
+        :param exclusions: keys that won't be stored
+        :param epochTimestamps: if True (or timestamp is an int) timestamps are kept as int nanoseconds since the epoch
+        :param keepHistory: if False no history entries are recorded (nor diffs computed for them). Values still keep
+                            their own history
+        :param compactHistory: the values keep their history in a CompactHistory (see LoggedValue)
+        """
+        super().__init__(exclusions=exclusions, timestamp=timestamp, epochTimestamps=epochTimestamps,
+                         compactHistory=compactHistory)
+        self.last_updated = self.timestamp
         self.deleted = False
         self.history: List = []
+        self.keepHistory: bool = keepHistory
+        # DictOfLoggedDict told (with _countChange) when the record is deleted or restored
+        self.owner = None
 
         self.addHistory(data="Creation without data", timestamp=self.last_updated)
 
@@ -54,16 +118,29 @@ class DictData(LoggedDict):
         return self.deleted
 
     def addHistory(self, data, timestamp: Optional[struct_time] = None):
-        dateField = timestamp or gmtime()
+        if self.batchState is not None:
+            self.batchState.numEntries += 1
+            return
+        if not self.keepHistory:
+            return
+        dateField = self._changeTime(timestamp)
         self.history.append((dateField, data))
 
+    def _endBatch(self, state):
+        if state.numEntries:
+            self.addHistory(f"Batch: {state.numEntries} changes", timestamp=state.timestamp)
+
     def delete(self, timestamp: Optional[struct_time] = None) -> bool:
         if self.isDeleted():
             return False
-        dateField = timestamp or gmtime()
+        dateField = self._changeTime(timestamp)
         self.last_updated = dateField
         self.deleted = True
+        if self.owner is not None:
+            self.owner._countChange(-1, 1)
         self.addHistory(data="Deleted", timestamp=dateField)
+        if self.changeListeners:
+            self._notify(None, 'D', dateField)
 
         return True
 
@@ -71,16 +148,50 @@ class DictData(LoggedDict):
         if not self.isDeleted():
             return False
 
-        dateField = timestamp or gmtime()
+        dateField = self._changeTime(timestamp)
         self.last_updated = dateField
         self.deleted = False
+        if self.owner is not None:
+            self.owner._countChange(1, -1)
         self.addHistory(data="Restored", timestamp=dateField)
+        if self.changeListeners:
+            self._notify(None, 'C', dateField)
 
         return True
 
+    def compact(self, policy: RetentionPolicy, values: bool = True) -> CompactionReport:
+        """
+        Applies a retention policy to the history of the record and, if values, to those of its values
+        :param policy: a RetentionPolicy
+        :param values: apply the policy to the values too
+        :return: CompactionReport with the number of history entries removed (from the record and its values) and the
+                 (approximate) memory released
+        """
+        recordResult = policy.apply(self.history, 0)
+        valuesResults = [v.compact(policy) for v in self.current.values()] if values else []
+        return CompactionReport(values=sum(r.entries for r in valuesResults), records=recordResult.entries,
+                                bytes=recordResult.bytes + sum(r.bytes for r in valuesResults))
+
+    def applyChange(self, event) -> bool:
+        if event.subkey is None and event.action == 'D':
+            return self.delete(timestamp=event.timestamp)
+        if event.subkey is None and event.action == 'C':
+            return self.restore(timestamp=event.timestamp)
+        return super().applyChange(event)
+
+    def __getstate__(self):
+        # The owner adopts the record again when it is unpickled
+        return slotsGetState(self, skip={'changeListeners', 'batchState', 'owner'})
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        if not hasattr(self, 'keepHistory'):
+            self.keepHistory = True
+        self.owner = None
+
     def showV(self, compact=True, indent: int = 0, firstIndent: Optional[int] = None):
         delTxt = " D" if self.deleted else ""
-        dateTxt = strftime(DATEFORMAT, self.last_updated)
+        dateTxt = formatTimestamp(self.last_updated)
         lenTxt = f"l"":"f"{len(self.history)}"
 
         result = (f"{super().show(compact=compact, indent=indent, firstIndent=firstIndent)}"
@@ -101,6 +212,7 @@ class DictData(LoggedDict):
                 continue
             setattr(result, attr, getattr(data, attr))
 
+        result._adoptValues()
         result.last_updated = data.timestamp
         result.addHistory(f"Imported {data}")
 
@@ -129,7 +241,9 @@ class DictData(LoggedDict):
     # valuesV=_checkDeletedRead(LoggedDict.valuesV)
 
     _asdict = _checkDeletedRead(LoggedDict._asdict)
+    view = _checkDeletedRead(LoggedDict.view)
     diff = _checkDeletedRead(LoggedDict.diff)
+    differs = _checkDeletedRead(LoggedDict.differs)
     compareWithOtherKeys = _checkDeletedRead(LoggedDict.compareWithOtherKeys)
     # show=_checkDeletedRead(LoggedDict.show)
     # __repr__=_checkDeletedRead(LoggedDict.__repr__)
@@ -139,8 +253,20 @@ class DictData(LoggedDict):
 
 
 class DictOfLoggedDict:
-    def __init__(self, exclusions: Optional[Set[str]] = None, timestamp: Optional[struct_time] = None):
-        changeTime = timestamp or gmtime()
+    def __init__(self, exclusions: Optional[Set[str]] = None, timestamp: Optional[struct_time] = None,
+                 epochTimestamps: bool = False, keepHistory: bool = True, sharedSchemas: bool = False,
+                 compactHistory: bool = False):
+        """
+        :param exclusions: keys that won't be stored in the records
+        :param timestamp: time of creation. An int (nanoseconds since the epoch) sets epoch mode
+        :param epochTimestamps: if True (or timestamp is an int) timestamps are kept as int nanoseconds since the epoch
+                                and only converted to struct_time for display
+        :param keepHistory: if False neither the container nor its records record history entries. See setKeepHistory
+        :param sharedSchemas: records with the same keys share their key layout and the records share the exclusions
+                              of the container (see Schemas). Saves memory when records have the same keys
+        :param compactHistory: the values of the records keep their history in a CompactHistory (see LoggedValue)
+        """
+        changeTime = initialTimestamp(timestamp, epochTimestamps)
         if exclusions is not None and not isinstance(exclusions, (set, list, tuple)):
             raise TypeError(
                 f"DictOfLoggedDict: expected set/list/tuple for exclusions: '{exclusions}' ({type(exclusions)}")
@@ -151,6 +277,21 @@ class DictOfLoggedDict:
         self.timestamp: struct_time = changeTime
         self.numChanges: int = 0
         self.history: List[Tuple[struct_time, str]] = []
+        # Keep len() O(1). Records deleted or restored directly (getV(k).delete()) tell the container, see
+        # DictData.owner
+        self.numLive: int = 0
+        self.numDeleted: int = 0
+        self.keepHistory: bool = keepHistory
+        self.changeListeners: List[Callable] = []
+        self.indexes: Dict[str, SubkeyIndex] = {}
+        self.batchState: Optional[BatchState] = None
+        self.transaction: Optional[ContainerTransaction] = None
+        self.snapshots: WeakSet = WeakSet()
+        # Sequence number of the last change of each record, in increasing order (see changesSince)
+        self.changeSeq: int = 0
+        self.changeLog: Dict[str, int] = {}
+        self.schemas: Optional[SchemaFamily] = SchemaFamily(exclusions=self.exclusions) if sharedSchemas else None
+        self.compactHistory: bool = compactHistory
 
         self.addHistory("Created", changeTime)
 
@@ -163,27 +304,321 @@ class DictOfLoggedDict:
         return auxResult._asdict()
 
     def __setitem__(self, k, v, timestamp: Optional[struct_time] = None):
-        changeTime = timestamp or gmtime()
-        currVal = self.current.get(k, DictData(exclusions=self.exclusions, timestamp=changeTime))
+        changeTime = self._changeTime(timestamp)
+        currVal = self.current.get(k)
+        if currVal is not None and not currVal.isDeleted() and not currVal.differs(v):
+            # Not touched (see _touch): nothing will change
+            return False
+        self._touch(k)
+        isNew = currVal is None
+        if isNew:
+            currVal = self._newRecord(changeTime)
         changes = currVal.replace(v, timestamp=changeTime)
 
-        self.current[k] = currVal
+        if isNew:
+            self._insertRecord(k, currVal)
         if changes:
-            self.timestamp = changeTime
-            self.numChanges += 1
-            self.addHistory(f"Set '{k}':{currVal}")
+            self._noteChange(changeTime, f"Set '{k}':{currVal}" if self.keepHistory else None)
         return changes
 
+    def _insertRecord(self, k, record: DictData):
+        """
+        Adds a new record, already filled. Listeners are told about it (and start following it) only now: records that
+        end up not being inserted are never notified
+        """
+        self.current[k] = record
+        self.numLive += 1
+        if self.changeListeners or self.indexes:
+            record.addChangeListener(partial(self._recordChanged, k))
+            self._recordChanged(k, ChangeEvent(None, None, 'A', record.last_updated, None, LoggedDict._asdict(record)))
+
+    def _countChange(self, live: int, deleted: int):
+        self.numLive += live
+        self.numDeleted += deleted
+
+    def _noteChange(self, changeTime, data: Optional[str] = None):
+        """
+        Bookkeeping of the container after a change: timestamp, change counter and history entry (if data)
+        """
+        self.timestamp = changeTime
+        self.numChanges += 1
+        if data is not None:
+            self.addHistory(data, timestamp=changeTime)
+
+    def _newRecord(self, timestamp) -> DictData:
+        if self.schemas is None:
+            result = DictData(exclusions=self.exclusions, timestamp=timestamp, keepHistory=self.keepHistory,
+                              compactHistory=self.compactHistory)
+        else:
+            result = DictData(timestamp=timestamp, keepHistory=self.keepHistory, compactHistory=self.compactHistory)
+            result.current = SchemaDict(self.schemas.root)
+            result.exclusions = self.schemas.exclusions
+        result.owner = self
+        return result
+
+    def _watchRecords(self):
+        for k, v in self.current.items():
+            v.addChangeListener(partial(self._recordChanged, k))
+
+    def _unwatchRecords(self):
+        for v in self.current.values():
+            for recordListener in list(v.changeListeners or []):
+                if getattr(recordListener, 'func', None) == self._recordChanged:
+                    v.removeChangeListener(recordListener)
+
+    def addChangeListener(self, listener: Callable):
+        """
+        Registers a callable that will receive a ChangeEvent for every change of the records (done through the methods
+        of the container, of the records or of their values). Records of a container loaded lazily are all read.
+        :param listener: callable with a ChangeEvent as single parameter
+        """
+        if not (self.changeListeners or self.indexes):
+            self._watchRecords()
+        self.changeListeners.append(listener)
+
+    def removeChangeListener(self, listener: Callable):
+        if listener in self.changeListeners:
+            self.changeListeners.remove(listener)
+        if not (self.changeListeners or self.indexes):
+            self._unwatchRecords()
+
+    def subscribe(self, maxLength: Optional[int] = DEFAULTQUEUELENGTH) -> ChangeQueue:
+        """
+        Registers a bounded queue that receives the change events of the records, with their outer key (see
+        Subscriptions)
+        :param maxLength: maximum number of events kept by the queue (None for no limit)
+        :return: the queue
+        """
+        result = ChangeQueue(maxLength)
+        self.addChangeListener(result)
+        return result
+
+    def unsubscribe(self, queue: ChangeQueue):
+        self.removeChangeListener(queue)
+
+    def addIndex(self, subkey):
+        """
+        Creates a secondary index on a subkey (value -> outer keys of the live records with that value), used by
+        find(). It is kept up to date through the change notifications of the records, so changes made directly on
+        the LoggedValue objects are not seen. Indexes are not pickled. Records of a container loaded lazily are all
+        read.
+        :param subkey: subkey to index
+        """
+        if subkey in self.indexes:
+            return
+        index = SubkeyIndex(subkey)
+        for k, v in self.current.items():
+            index.refresh(k, v)
+        if not (self.changeListeners or self.indexes):
+            self._watchRecords()
+        self.indexes[subkey] = index
+
+    def removeIndex(self, subkey):
+        self.indexes.pop(subkey, None)
+        if not (self.changeListeners or self.indexes):
+            self._unwatchRecords()
+
+    def find(self, conditions: Optional[Dict] = None, **kwargs) -> Set:
+        """
+        Finds the live records whose subkeys have given values: find(field=value) or find({'field': value}).
+        Conditions on indexed subkeys are answered by the index, in O(matches). The rest are checked on the records
+        that meet the former (or on all the records if no condition is on an indexed subkey)
+        :param conditions: dict subkey -> value
+        :param kwargs: more conditions
+        :return: set with the outer keys of the records that meet all the conditions
+        """
+        allConditions = dict(conditions or {}, **kwargs)
+        if not allConditions:
+            raise ValueError("find: no conditions provided")
+
+        result = None
+        for subkey in sorted(set(allConditions).intersection(self.indexes)):
+            matches = self.indexes[subkey].find(allConditions[subkey])
+            result = matches if result is None else result.intersection(matches)
+            if not result:
+                return result
+        pending = {k: v for k, v in allConditions.items() if k not in self.indexes}
+        if not pending:
+            return result
+
+        candidates = self.keys() if result is None else result
+        return {k for k in candidates if self._meets(self.current[k], pending)}
+
+    @staticmethod
+    def _meets(record: DictData, conditions: Dict) -> bool:
+        for subkey, value in conditions.items():
+            loggedValue = record.current.get(subkey)
+            if loggedValue is None or loggedValue.isDeleted() or loggedValue.get() != value:
+                return False
+        return True
+
+    def applyChange(self, event) -> bool:
+        """
+        Applies a change, as notified to listeners, with its original timestamp (used to replay journals). The
+        bookkeeping of the container (timestamp, numChanges, history) is left to the caller
+        :param event: a ChangeEvent
+        :return: True if something changed
+        """
+        if event.key is None and event.action == 'X':
+            return self._applyExclusions(event.newValue - event.oldValue, event.oldValue - event.newValue,
+                                         event.timestamp)
+        record = self.current.get(event.key)
+        if record is None and event.subkey is None:
+            if event.action != 'A':
+                return False
+            record = self._newRecord(event.timestamp)
+            for subkey, value in event.newValue.items():
+                LoggedDict.__setitem__(record, subkey, value, timestamp=event.timestamp)
+            self._touch(event.key)
+            self._insertRecord(event.key, record)
+            return True
+        if event.subkey is None and event.action == 'A':
+            return False
+        self._touch(event.key)
+        if record is None:
+            record = self._newRecord(event.timestamp)
+            result = record.applyChange(event)
+            self._insertRecord(event.key, record)
+            return result
+        return record.applyChange(event)
+
+    def _recordChanged(self, k, event):
+        if self.indexes:
+            self._updateIndexes(k, event)
+        if self.changeListeners:
+            auxEvent = event._replace(key=k)
+            for listener in self.changeListeners:
+                listener(auxEvent)
+
+    def _updateIndexes(self, k, event):
+        if event.subkey is None:
+            # Deletion, restoration or rename of the record: it is already in current
+            for index in self.indexes.values():
+                index.refresh(k, self.current.get(k))
+            return
+        index = self.indexes.get(event.subkey)
+        if index is None:
+            return
+        # Records are followed from the moment they are inserted, see _insertRecord
+        if event.action == 'D':
+            index.discard(k)
+        else:
+            index.set(k, event.newValue)
+
+    def setKeepHistory(self, keepHistory: bool):
+        """
+        Turns on or off the recording of history entries, for the container and all its records (e.g. for bulk loads)
+        :param keepHistory: new value
+        """
+        self.keepHistory = keepHistory
+        for v in self.current.values():
+            v.keepHistory = keepHistory
+
     def addHistory(self, data: str, timestamp: Optional[struct_time] = None):
-        dateField = timestamp or gmtime()
+        if self.batchState is not None:
+            self.batchState.numEntries += 1
+            return
+        if not self.keepHistory:
+            return
+        dateField = self._changeTime(timestamp)
         self.history.append((dateField, data))
 
-    def get(self, key):
+    def _changeTime(self, timestamp):
+        """
+        Timestamp for a change: the provided one, the one of the open batch or now
+        """
+        if timestamp is None and self.batchState is not None:
+            return self.batchState.timestamp
+        return changeTimestamp(timestamp, self.timestamp)
+
+    def batch(self, timestamp: Optional[struct_time] = None, rollback: bool = False):
+        """
+        Context manager that groups the changes made inside it through the methods of the container: all of them get
+        the same timestamp and, at the end, the container gets a single history entry and change count for all of
+        them. Records keep their own history entries. See Batch.batchOf
+        :param timestamp: time for all the changes. If None, the time when the batch starts
+        :param rollback: restore the container to how it was before the batch if the block raises an exception
+        """
+        return batchOf(self, timestamp=timestamp, rollback=rollback)
+
+    def _endBatch(self, state: BatchState):
+        changed = state.numEntries or self.numChanges != state.numChanges
+        self.numChanges = state.numChanges
+        if not changed:
+            return
+        self.timestamp = state.timestamp
+        self.numChanges += 1
+        self.addHistory(f"Batch: {state.numEntries} changes", timestamp=state.timestamp)
+
+    def begin(self) -> ContainerTransaction:
+        """
+        Starts a transaction (see Transactions): the state of each record is saved the first time a method of the
+        container changes it, so commit and rollback cost O(records changed). Changes made directly on the records
+        (getV(k).update(...)) are not recorded. Listeners are not told about rollbacks. Used as a context manager, it
+        commits at the end of the block or rolls back if it raises an exception
+        :return: the transaction
+        """
+        if self.transaction is not None:
+            raise ValueError("A transaction is already open")
+        return ContainerTransaction(self)
+
+    def snapshot(self) -> Snapshot:
+        """
+        Read-only view of the container as it is now. It is O(1): the records are shared and the container copies one
+        into the snapshot only before changing it (see Snapshots). Close the snapshot (or use it as a context manager)
+        when done with it
+        :return: the snapshot
+        """
+        return Snapshot(self)
+
+    def _touch(self, k):
+        """
+        Called by the methods of the container before changing the record of k
+        """
+        self.changeSeq += 1
+        # Re-inserted so changeLog stays sorted by sequence number
+        self.changeLog.pop(k, None)
+        self.changeLog[k] = self.changeSeq
+        if self.transaction is not None:
+            self.transaction.touch(k)
+        if self.snapshots:
+            for snapshot in self.snapshots:
+                snapshot.save(k)
+
+    def changesSince(self, cursor: int = 0) -> Tuple[Dict, int]:
+        """
+        Records changed after cursor, in O(records changed). Changes are numbered when a method of the container is
+        about to change a record, so records that container-wide operations (renameKeys, exclusions) go through are
+        reported even if they stay the same, and changes made directly on the records (getV(k).update(...)) are not
+        seen
+        :param cursor: sequence number returned by the previous call (0 for all the records ever changed)
+        :return: ({outer key: dict of values, or None if the record is deleted}, new cursor)
+        """
+        if cursor > self.changeSeq:
+            raise ValueError(f"changesSince: cursor {cursor} is ahead of the container ({self.changeSeq})")
+        keys = []
+        for k in reversed(self.changeLog):
+            if self.changeLog[k] <= cursor:
+                break
+            keys.append(k)
+
+        result = {}
+        for k in reversed(keys):
+            record = self.current.get(k)
+            result[k] = None if record is None or record.isDeleted() else record._asdict()
+        return result, self.changeSeq
+
+    def get(self, key, views: bool = False):
+        """
+        :param key: outer key
+        :param views: return a read-only view of the record (see LoggedDictView) instead of a copy as dict
+        """
         if key not in self.current:
             raise KeyError(f"Unknown key '{key}'")
         if self.current[key].isDeleted():
             raise KeyError(f"Requested item is deleted '{key}'")
-        return self.current.get(key)._asdict()
+        record = self.current.get(key)
+        return LoggedDictView(record) if views else record._asdict()
 
     def getV(self, key):
         if key not in self.current:
@@ -191,7 +626,7 @@ class DictOfLoggedDict:
         return self.current.get(key)
 
     def pop(self, key, *kargs, timestamp: Optional[struct_time] = None):
-        changeTime = timestamp or gmtime()
+        changeTime = self._changeTime(timestamp)
         if (key not in self.current) or (self.current[key].isDeleted()):
             if kargs:
                 return kargs[0]  # default
@@ -201,114 +636,234 @@ class DictOfLoggedDict:
             raise KeyError(f"Requested item is deleted '{key}'")
         result = self.get(key)
 
+        self._touch(key)
         self.getV(key).delete(timestamp=changeTime)
         self.timestamp = changeTime
 
         return result
 
     def update(self, newValues, timestamp: Optional[struct_time] = None, replaceInner: bool = False):
-        changeTime = timestamp or gmtime()
+        changeTime = self._changeTime(timestamp)
         result = False
 
         if not isinstance(newValues, (dict, DictOfLoggedDict)):
             raise TypeError(f"update: expected dict or DictOfLoggedDict, got '{type(newValues)}'")
 
         for k, v in newValues.items():
-            currVal = self.current.get(k, DictData(exclusions=self.exclusions, timestamp=timestamp))
+            result |= self._updateRecord(k, v, changeTime, replaceInner)
+
+        if result:
+            self._noteChange(changeTime, f"Update {newValues}" if self.keepHistory else None)
+        return result
+
+    def _updateRecord(self, k, v, changeTime, replaceInner: bool) -> bool:
+        """
+        Updates (or replaces) the record of k, creating or restoring it if needed
+        :return: True if something changed
+        """
+        currVal = self.current.get(k)
+        isNew = currVal is None
+        if isNew:
+            currVal = self._newRecord(changeTime)
+        else:
+            # Unchanged records are not touched (see _touch)
+            if not currVal.isDeleted() and not currVal.differs(v, doUpdate=not replaceInner):
+                return False
+            self._touch(k)
 
-            if currVal.isDeleted():
-                result |= currVal.restore()
+        result = False
+        if currVal.isDeleted() and currVal.restore(timestamp=changeTime):
+            result = True
 
-            r1 = currVal.replace(v, timestamp=changeTime) if replaceInner else currVal.update(v, timestamp=changeTime)
+        if replaceInner:
+            changed = currVal.replace(v, timestamp=changeTime)
+        else:
+            changed = currVal.update(v, timestamp=changeTime)
 
-            if r1:
-                self.current[k] = currVal
+        if changed and isNew:
+            # New records that would stay empty are not inserted, nor touched
+            self._touch(k)
+            self._insertRecord(k, currVal)
 
-            result |= r1
-        if result:
-            self.timestamp = changeTime
-            self.numChanges += 1
-            self.addHistory(f"Update {newValues}", timestamp=timestamp)
-        return result
+        return result or changed
 
     def purge(self, *kargs, timestamp: Optional[struct_time] = None):
-        changeTime = timestamp or gmtime()
+        changeTime = self._changeTime(timestamp)
         result = False
         keys2delete = set(chainKargs(*kargs))
 
         for k in keys2delete:
-            if k in self.current:
-                result |= self.current[k].delete(timestamp=changeTime)
+            result |= self._purgeRecord(k, changeTime)
 
         if result:
             keysStr = ",".join(map(lambda x: f"'{x}'", keys2delete))
-            self.timestamp = changeTime
-            self.numChanges += 1
-            self.addHistory(f"Purged {keysStr}", timestamp=timestamp)
+            self._noteChange(changeTime, f"Purged {keysStr}")
 
         return result
 
+    def _purgeRecord(self, k, changeTime) -> bool:
+        record = self.current.get(k)
+        if record is None or record.isDeleted():
+            return False
+        self._touch(k)
+        return record.delete(timestamp=changeTime)
+
     def replace(self, newValues, timestamp=None) -> bool:
-        changeTime = timestamp or gmtime()
+        changeTime = self._changeTime(timestamp)
 
         result = False
         if not isinstance(newValues, (dict, DictOfLoggedDict)):
             raise TypeError(f"Parameter expected to be a dict or DictOfLoggedDict. Provided {type(newValues)}")
 
-        resDiff = self.diff(newValues, doUpdate=False)
-
-        if not resDiff:
-            return result
-
+        # Each record is compared once, by update, which skips those that don't change
         compKeys = self.compareWithOtherKeys(newValues)
         result |= self.purge(compKeys.missing, timestamp=timestamp)
 
         data2update = {k: newValues.get(k) for k in sorted((compKeys.new).union(compKeys.shared))}
 
         result |= self.update(data2update, timestamp=changeTime, replaceInner=True)
+        if not result:
+            return result
 
         self.timestamp = changeTime
         self.numChanges += 1
-        self.addHistory(f"Replace {newValues}", timestamp=timestamp)
+        if self.keepHistory:
+            self.addHistory(f"Replace {newValues}", timestamp=timestamp)
 
         return result
 
+    def applyDiff(self, diff, timestamp: Optional[struct_time] = None, doUpdate: bool = False) -> bool:
+        """
+        Applies in one go the changes of a diff computed against the current contents (by diff() or
+        TabularDiff.diffTable), leaving the container as replace (or update) would. Changed values are set straight
+        from the diff, without comparing them again, and the container gets a single history entry.
+        :param diff: a DictOfLoggedDictDiff
+        :param timestamp: time of the changes
+        :param doUpdate: the diff is for an update: records in diff.removed are not deleted
+        :return: True if something changed
+        """
+        if not diff:
+            return False
+        changeTime = self._changeTime(timestamp)
+        result = False
+
+        for k, v in diff.added.items():
+            # Inserted (or restored) only if that changes something, as in update
+            result |= self._updateRecord(k, v, changeTime, replaceInner=not doUpdate)
+
+        for k, recordDiff in diff.changed.items():
+            self._touch(k)
+            record = self.current[k]
+            values = dict(recordDiff.added)
+            values.update((subkey, newValue) for subkey, (_, newValue) in recordDiff.changed.items())
+            # Base methods: the diff is already known. A replace sets the values one by one, which keeps new subkeys
+            # set to None, and an update skips them
+            if doUpdate:
+                changed = LoggedDict.update(record, values, timestamp=changeTime)
+            else:
+                changed = False
+                for subkey, value in values.items():
+                    changed |= LoggedDict.__setitem__(record, subkey, value, timestamp=changeTime)
+            if recordDiff.removed:
+                changed |= LoggedDict.purge(record, list(recordDiff.removed), timestamp=changeTime)
+            if changed:
+                record.addHistory(UpdateRecord('applyDiff', changes=recordDiff), timestamp=changeTime)
+            result |= changed
+
+        if not doUpdate:
+            for k in diff.removed:
+                result |= self._purgeRecord(k, changeTime)
+
+        if not result:
+            return result
+
+        self.timestamp = changeTime
+        self.numChanges += 1
+        self.addHistory(f"Applied diff: {diff.changeCount} changes", timestamp=changeTime)
+
+        return True
+
     def addExclusion(self, *kargs, timestamp: Optional[struct_time] = None) -> bool:
-        keys2add = set(chainKargs(*kargs))
+        return self._applyExclusions(set(chainKargs(*kargs)), set(), self._changeTime(timestamp))
+
+    def _applyExclusions(self, keys2add: Set, keys2remove: Set, changeTime) -> bool:
+        """
+        Adds and removes exclusions of the container and its live records, and tells the listeners
+        :return: True if a value of a record was purged
+        """
+        oldExclusions = set(self.exclusions)
+        changed = self._addExclusions(keys2add, changeTime) if keys2add else False
+        if keys2remove:
+            self._removeExclusions(keys2remove)
+        if self.changeListeners and self.exclusions != oldExclusions:
+            event = ChangeEvent(None, None, 'X', changeTime, oldExclusions, set(self.exclusions))
+            for listener in self.changeListeners:
+                listener(event)
+        return changed
+
+    def _addExclusions(self, keys2add: Set, timestamp) -> bool:
         changed = False
         self.exclusions.update(keys2add)
+        self._shareExclusions()
 
-        for v in self.valuesV():
+        for k, v in self.itemsV():
             if v.isDeleted():
                 continue
+            self._touch(k)
             changed |= v.addExclusion(keys2add, timestamp=timestamp)
+            self._shareExclusions(v)
 
         return changed
 
+    def _shareExclusions(self, record: Optional[DictData] = None):
+        """
+        With shared schemas, updates the exclusions shared by the records (if record is None) or makes record use them
+        if it has the same ones
+        """
+        if self.schemas is None:
+            return
+        if record is None:
+            self.schemas.exclusions = frozenset(self.exclusions)
+        elif record.exclusions == self.schemas.exclusions:
+            record.exclusions = self.schemas.exclusions
+
     def removeExclusion(self, *kargs):
-        keys2remove = set(chainKargs(*kargs))
+        self._applyExclusions(set(), set(chainKargs(*kargs)), self._changeTime(None))
 
+    def _removeExclusions(self, keys2remove: Set):
         self.exclusions.difference_update(keys2remove)
+        self._shareExclusions()
 
-        for v in self.valuesV():
+        for k, v in self.itemsV():
             if v.isDeleted():
                 continue
+            self._touch(k)
             v.removeExclusion(keys2remove)
+            self._shareExclusions(v)
 
     def keys(self):
+        liveKeys = getattr(self.current, 'liveKeys', None)
+        if liveKeys is not None:
+            # Records loaded from a file (see DictLoggedDictStore.LazyRecords): they are not decoded
+            yield from liveKeys()
+            return
         for k, v in self.current.items():
             if not v.isDeleted():
                 yield k
 
-    def items(self):
+    def items(self, views: bool = False):
+        """
+        Live records
+        :param views: yield read-only views of the records (see LoggedDictView) instead of copies as dict
+        """
         for k, v in self.current.items():
             if not v.isDeleted():
-                yield k, v._asdict()
+                yield k, (LoggedDictView(v) if views else v._asdict())
 
-    def values(self):
+    def values(self, views: bool = False):
         for v in self.current.values():
             if not v.isDeleted():
-                yield v._asdict()
+                yield LoggedDictView(v) if views else v._asdict()
 
     def keysV(self):
         return self.current.keys()
@@ -321,14 +876,15 @@ class DictOfLoggedDict:
 
     def renameKeys(self, keyMapping: Dict[str, str], timestamp: Optional[struct_time] = None, includeDeleted=False
                    ) -> bool:
-        changeTime = timestamp or gmtime()
+        changeTime = self._changeTime(timestamp)
 
         result = False
 
-        for v in self.valuesV():
+        for k, v in self.itemsV():
             if not includeDeleted and v.isDeleted():
                 continue
-            if v.renameKeys(keyMapping=keyMapping):
+            self._touch(k)
+            if v.renameKeys(keyMapping=keyMapping, timestamp=changeTime):
                 v.addHistory(f"Renamed keys: {keyMapping}", timestamp=changeTime)
                 v.last_updated = changeTime
                 result |= True
@@ -338,6 +894,19 @@ class DictOfLoggedDict:
 
         return result
 
+    def compact(self, policy: RetentionPolicy) -> CompactionReport:
+        """
+        Applies a retention policy to the histories of the container, its records and their values in one pass
+        :param policy: a RetentionPolicy (see Retention)
+        :return: CompactionReport with the number of history entries removed and the (approximate) memory released
+        """
+        if self.transaction is not None:
+            raise ValueError("compact: histories can't be compacted while a transaction is open")
+        containerResult = policy.apply(self.history, 0)
+
+        return addReports(*[record.compact(policy) for record in self.current.values()],
+                          CompactionReport(container=containerResult.entries, bytes=containerResult.bytes))
+
     def _asdict(self):
         result = dict(self.items())
         return result
@@ -345,19 +914,20 @@ class DictOfLoggedDict:
     def subkeys(self):
         result = set()
 
-        for v in self.values():
+        for v in self.values(views=True):
             result.update(v.keys())
 
         return result
 
     def extractKey(self, key, default=None):
-        result = {k: v.get(key, default) for k, v in self.items()}
+        result = {k: v.get(key, default) for k, v in self.items(views=True)}
 
         return result
 
     def diff(self, other, doUpdate: bool = False):
         """
-        Computes the changes made if a replace or an update were to be done
+        Computes the changes made if a replace or an update were to be done. Keys are not sorted, that is left to
+        DictOfLoggedDictDiff.show
         :param other: values to replace or update
         :param doUpdate: do an Update instead of a replace
         :return:
@@ -367,21 +937,80 @@ class DictOfLoggedDict:
 
         result = DictOfLoggedDictDiff()
 
-        compKeys = self.compareWithOtherKeys(other)
-
-        for k in sorted(compKeys.new):
-            result.addKey(k, other.get(k))
-        for k in sorted(compKeys.shared):
-            currVal = self.getV(k)
-            otherVal = other.get(k) if isinstance(other, dict) else other.getV(k)
+        for k, otherVal in self._otherItems(other):
+            currVal = self.current.get(k)
+            if currVal is None or currVal.isDeleted():
+                result.addKey(k, other.get(k))
+                continue
             result.change(k, currVal, otherVal, doUpdate=doUpdate)
-        for k in sorted(compKeys.missing):
-            result.removeKey(k, self.getV(k))
+        for k, currVal in self.current.items():
+            if not currVal.isDeleted() and k not in other:
+                result.removeKey(k, currVal)
 
         return result
 
+    def differs(self, other, doUpdate: bool = False) -> bool:
+        """
+        Tells if a replace or an update would change anything, stopping at the first difference found. Same result as
+        bool(self.diff(other, doUpdate))
+        :param other: values to replace or update
+        :param doUpdate: do an Update instead of a replace
+        :return: True if there are differences
+        """
+        if not isinstance(other, (dict, DictOfLoggedDict)):
+            raise TypeError(f"Parameter expected to be a dict or DictOfLoggedDict. Provided {type(other)}")
+
+        numShared = 0
+        for k, otherVal in self._otherItems(other):
+            currVal = self.current.get(k)
+            if currVal is None or currVal.isDeleted():
+                return True
+            if currVal.differs(otherVal, doUpdate=doUpdate):
+                return True
+            numShared += 1
+
+        return numShared != self.numLive
+
+    @staticmethod
+    def _otherItems(other):
+        """
+        Live items of the dict or DictOfLoggedDict other, with DictData records for the latter
+        """
+        if isinstance(other, dict):
+            return other.items()
+        return ((k, v) for k, v in other.itemsV() if not v.isDeleted())
+
     def __len__(self):
-        return sum(1 for _ in self.keys())
+        return self.numLive
+
+    def countKeys(self):
+        """
+        Counts live and deleted records walking the whole container
+        :return: (live, deleted)
+        """
+        numDeleted = sum(1 for v in self.current.values() if v.isDeleted())
+        return len(self.current) - numDeleted, numDeleted
+
+    def checkCounters(self, inner: bool = True) -> bool:
+        """
+        Debugging aid: checks that the live/deleted counters kept by the object match the actual contents
+        :param inner: also check the counters of the records
+        :return: True if they are consistent
+        """
+        result = (self.numLive, self.numDeleted) == self.countKeys()
+        if inner:
+            result &= all(v.checkCounters() for v in self.current.values())
+        return result
+
+    def _recount(self):
+        self.numLive, self.numDeleted = self.countKeys()
+
+    def _adoptRecords(self):
+        """
+        Makes the container the owner of its records (after unpickling them)
+        """
+        for v in self.current.values():
+            v.owner = self
 
     def lenV(self):
         return len(self.current)
@@ -418,7 +1047,7 @@ class DictOfLoggedDict:
         return result
 
     def buildMetadataStr(self):
-        dateTxt = strftime(DATEFORMAT, self.timestamp)
+        dateTxt = formatTimestamp(self.timestamp)
         lenTxt = f"l"":"f"{self.numChanges}"
         metadataStr = f"[t:{dateTxt} {lenTxt}]"
         return metadataStr
@@ -431,6 +1060,48 @@ class DictOfLoggedDict:
         currentKeys = set(self.keys())
         return compareSets(currentKeys, otherKeys)
 
+    @staticmethod
+    def fromIterable(iterable, timestamp: Optional[struct_time] = None, exclusions: Optional[Set[str]] = None,
+                     epochTimestamps: bool = False, keepHistory: bool = True, sharedSchemas: bool = False,
+                     compactHistory: bool = False):
+        """
+        Builds a DictOfLoggedDict from a stream of (key, dict) pairs. Records are filled directly, all with the same
+        timestamp, without the diffs and history entries of update(); the container gets a single history entry that
+        doesn't include the data. Repeated keys are merged as update() would do.
+        :param iterable: (key, dict) pairs (or a dict or DictOfLoggedDict)
+        :param timestamp: time for the creation and all the values
+        :param exclusions: keys that won't be stored in the records
+        :param epochTimestamps: see DictOfLoggedDict()
+        :param keepHistory: see DictOfLoggedDict()
+        :param sharedSchemas: see DictOfLoggedDict()
+        :param compactHistory: see DictOfLoggedDict()
+        :return: a new DictOfLoggedDict
+        """
+        result = DictOfLoggedDict(exclusions=exclusions, timestamp=timestamp, epochTimestamps=epochTimestamps,
+                                  keepHistory=keepHistory, sharedSchemas=sharedSchemas, compactHistory=compactHistory)
+        changeTime = result.timestamp
+        pairs = iterable.items() if isinstance(iterable, (dict, DictOfLoggedDict)) else iterable
+
+        for k, v in pairs:
+            record = result.current.get(k)
+            isNew = record is None
+            if isNew:
+                record = result._newRecord(changeTime)
+            # Base method: skips the diff and history entry added by DictData.update
+            changed = LoggedDict.update(record, v.items() if isinstance(v, LoggedDict) else v, timestamp=changeTime)
+            if changed:
+                # Nothing to save yet (no transactions or snapshots), only numbers the change
+                result._touch(k)
+            if changed and isNew:
+                result.current[k] = record
+                result.numLive += 1
+
+        if result.numLive:
+            result.numChanges += 1
+            result.addHistory(f"Bulk load: {result.numLive} records", timestamp=changeTime)
+
+        return result
+
     # Function excluded from coverage as it involves a one off operation from legacy data
     @staticmethod
     def updateRelease(data):  # pragma: no cover
@@ -453,6 +1124,8 @@ class DictOfLoggedDict:
 
         for k in data.current.keys():
             result.current[k] = DictData.fromLoggedDict(data.current[k])
+        result._adoptRecords()
+        result._recount()
 
         setattr(result, 'last_updated', data.timestamp)
         result.addHistory("Updated data format")
@@ -460,11 +1133,48 @@ class DictOfLoggedDict:
 
         return result
 
+    def __getstate__(self):
+        # Listeners are bound to the live object and indexes are built from the data, they are not kept
+        result = dict(self.__dict__)
+        result['changeListeners'] = []
+        result['indexes'] = {}
+        result['batchState'] = None
+        result['transaction'] = None
+        result['snapshots'] = None
+        return result
+
+    def __setstate__(self, state):
+        self.keepHistory = True
+        self.changeListeners = []
+        self.indexes = {}
+        self.batchState = None
+        self.transaction = None
+        self.changeSeq = 0
+        self.changeLog = {}
+        self.schemas = None
+        self.compactHistory = False
+        self.__dict__.update(state)
+        self.snapshots = WeakSet()
+        if 'current' in state:
+            self._adoptRecords()
+        if 'numLive' not in state:
+            self._recount()
+
     def __repr__(self):
         return self.show(compact=True)
 
     def __ne__(self, other):
-        return self.diff(other)
+        if not isinstance(other, (dict, DictOfLoggedDict)):
+            return NotImplemented
+        return self.differs(other)
+
+    def __eq__(self, other):
+        if not isinstance(other, (dict, DictOfLoggedDict)):
+            return NotImplemented
+        return not self.differs(other)
+
+    # Containers are mutable: hashed (and compared with other types) by identity, as before __eq__ was defined
+    __hash__ = object.__hash__
 
     def __contains__(self, k):
         return (k in self.current) and not self.current[k].isDeleted()
@@ -483,6 +1193,14 @@ class DictOfLoggedDictDiff:
             self.changed[k] = diff
             self.changeCount += 1
 
+    def addChange(self, k, diff: LoggedDictDiff):
+        """
+        Adds the (already computed) differences of a record
+        """
+        if diff:
+            self.changed[k] = diff
+            self.changeCount += 1
+
     def addKey(self, k, vNew):
         self.added[k] = vNew
         self.changeCount += 1
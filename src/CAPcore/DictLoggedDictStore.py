@@ -0,0 +1,415 @@
+"""
+Chunked on-disk format for DictOfLoggedDict.
+
+Every record (the DictData of an outer key) is pickled on its own so it can be decoded independently, and an index
+with the position of each record plus the attributes of the container is written at the end of the file:
+
+  MAGIC | record | record | ... | index | footer
+
+footer is the offset and length of the index followed by MAGIC. Saving incrementally appends the records that
+changed and a new index+footer; the records and index they supersede are left in the file as garbage until the next
+full save. The footer is written (and synced) after the rest, so if an incremental save is interrupted the file ends
+in an incomplete tail: readIndex then goes back to the last complete footer, which gives the contents as of the
+previous save.
+
+DictOfLoggedDictView gives read-only access to a file through mmap, so processes that only read share the pages of
+the file instead of holding private copies of the whole structure.
+
+Files are pickles: load only trusted ones.
+"""
+import mmap
+import os
+import pickle
+import struct
+from collections.abc import MutableMapping
+from typing import Dict, Optional, Tuple
+
+from .DictLoggedDict import DictOfLoggedDict, DictData
+
+MAGIC = b"CAPDOLD\x01"
+FOOTERFORMAT = "<QQ"
+FOOTERLEN = struct.calcsize(FOOTERFORMAT) + len(MAGIC)
+SCANBLOCKLEN = 1 << 20
+
+# Entries of the index: key -> (offset, length, record is deleted)
+IndexEntry = Tuple[int, int, bool]
+
+
+def recordSignature(record: DictData) -> Tuple:
+    """
+    Summary of the state of a record that changes whenever the record is modified (any change adds history to the
+    record or to its values or changes their timestamps). Used to find the records to write in incremental saves.
+    :param record: a DictData
+    :return: a tuple
+    """
+    return (record.deleted, record.last_updated, len(record.history), frozenset(record.exclusions),
+            tuple((k, len(v.history), v.last_updated) for k, v in record.current.items()))
+
+
+def _indexAt(handle, footerEnd: int) -> Optional[Dict]:
+    """
+    Reads the index of the footer that ends at footerEnd
+    :return: the contents of the index or None if there isn't a complete footer and index there
+    """
+    footerStart = footerEnd - FOOTERLEN
+    if footerStart < len(MAGIC):
+        return None
+    handle.seek(footerStart)
+    footer = handle.read(FOOTERLEN)
+    if footer[-len(MAGIC):] != MAGIC:
+        return None
+    indexOffset, indexLen = struct.unpack(FOOTERFORMAT, footer[:-len(MAGIC)])
+    # The index is written right before its footer
+    if indexOffset < len(MAGIC) or indexOffset + indexLen != footerStart:
+        return None
+    handle.seek(indexOffset)
+    try:
+        result = pickle.loads(handle.read(indexLen))
+    except Exception:  # pylint: disable=broad-exception-caught
+        return None
+    if not isinstance(result, dict) or 'records' not in result or 'container' not in result:
+        return None
+    return result
+
+
+def _magicEnds(handle, fileLen: int):
+    """
+    Positions where the occurrences of MAGIC in the file end, from the end of the file backwards
+    """
+    end = fileLen
+    while end > len(MAGIC):
+        start = max(0, end - SCANBLOCKLEN)
+        handle.seek(start)
+        block = handle.read(end - start)
+        pos = len(block)
+        while True:
+            pos = block.rfind(MAGIC, 0, pos)
+            if pos < 0:
+                break
+            yield start + pos + len(MAGIC)
+            pos += len(MAGIC) - 1
+        if start == 0:
+            return
+        # Overlap, for occurrences across blocks
+        end = start + len(MAGIC) - 1
+
+
+def readIndex(handle) -> Tuple[Dict, Dict]:
+    """
+    Reads the index of a file in chunked format. If the file doesn't end in a complete footer (an interrupted
+    incremental save) the last complete one is used
+    :param handle: file open in binary mode (or an mmap)
+    :return: (record index, attributes of the container)
+    """
+    handle.seek(0, os.SEEK_END)
+    fileLen = handle.tell()
+    if fileLen < len(MAGIC) + FOOTERLEN:
+        raise ValueError("File too short to be a chunked DictOfLoggedDict")
+    handle.seek(0)
+    if handle.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a chunked DictOfLoggedDict file (wrong header)")
+    indexData = _indexAt(handle, fileLen)
+    if indexData is None:
+        for footerEnd in _magicEnds(handle, fileLen - 1):
+            indexData = _indexAt(handle, footerEnd)
+            if indexData is not None:
+                break
+        else:
+            raise ValueError("Not a chunked DictOfLoggedDict file (no complete footer). Was it completely written?")
+
+    return indexData['records'], indexData['container']
+
+
+class LazyRecords(MutableMapping):
+    """
+    Records of a DictOfLoggedDict read from a file in chunked format. Each one is decoded on first access and kept
+    from then on (with its signature, to find out later if it changed). Used as DictOfLoggedDict.current.
+    """
+
+    def __init__(self, filename: str, index: Dict[str, IndexEntry], owner: Optional[DictOfLoggedDict] = None):
+        """
+        :param filename: file in chunked format
+        :param index: index of the file
+        :param owner: container the records are decoded for (see DictData.owner)
+        """
+        self.filename: str = filename
+        self.index: Dict[str, IndexEntry] = index
+        self.owner: Optional[DictOfLoggedDict] = owner
+        self.loaded: Dict[str, DictData] = {}
+        self.signatures: Dict[str, Tuple] = {}
+        self.numExtra: int = 0  # loaded keys that are not in index
+
+    def _load(self, k) -> DictData:
+        offset, length, _ = self.index[k]
+        with open(self.filename, "rb") as handle:
+            handle.seek(offset)
+            result = pickle.loads(handle.read(length))
+        result.owner = self.owner
+        self.loaded[k] = result
+        self.signatures[k] = recordSignature(result)
+        return result
+
+    def liveKeys(self):
+        """
+        Keys of the live records, without decoding them (the index tells if the records not read yet are deleted)
+        """
+        for k in self:
+            record = self.loaded.get(k)
+            if (not self.index[k][2]) if record is None else (not record.isDeleted()):
+                yield k
+
+    def changedKeys(self):
+        """
+        Keys of the records that are not in the file or were modified since they were read
+        """
+        for k, v in self.loaded.items():
+            if k not in self.index or self.signatures.get(k) != recordSignature(v):
+                yield k
+
+    def markSaved(self, index: Dict[str, IndexEntry]):
+        self.index = index
+        self.numExtra = 0
+        self.signatures = {k: recordSignature(v) for k, v in self.loaded.items()}
+
+    def __getitem__(self, k):
+        if k in self.loaded:
+            return self.loaded[k]
+        if k in self.index:
+            return self._load(k)
+        raise KeyError(k)
+
+    def __setitem__(self, k, v):
+        if k not in self.loaded and k not in self.index:
+            self.numExtra += 1
+        self.loaded[k] = v
+
+    def __delitem__(self, k):
+        if k not in self:
+            raise KeyError(k)
+        if k not in self.index:
+            self.numExtra -= 1
+        self.loaded.pop(k, None)
+        self.signatures.pop(k, None)
+        self.index.pop(k, None)
+
+    def __contains__(self, k):
+        return k in self.loaded or k in self.index
+
+    def __iter__(self):
+        yield from self.index
+        yield from (k for k in self.loaded if k not in self.index)
+
+    def __len__(self):
+        return len(self.index) + self.numExtra
+
+    def numLoaded(self) -> int:
+        return len(self.loaded)
+
+    def __reduce__(self):
+        # Pickling (or deep copying) the container materializes every record
+        return dict, (dict(self.items()),)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+def _containerState(data: DictOfLoggedDict) -> Dict:
+    return {k: v for k, v in data.__getstate__().items() if k != 'current'}
+
+
+def _writeTail(handle, records: Dict[str, IndexEntry], data: DictOfLoggedDict, sync: bool = False):
+    """
+    Writes the index and the footer
+    :param sync: fsync the file before writing the footer (so the footer isn't on disk without what it points to) and
+                 after
+    """
+    indexData = pickle.dumps({'records': records, 'container': _containerState(data)})
+    indexOffset = handle.tell()
+    handle.write(indexData)
+    if sync:
+        handle.flush()
+        os.fsync(handle.fileno())
+    handle.write(struct.pack(FOOTERFORMAT, indexOffset, len(indexData)) + MAGIC)
+    if sync:
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def _writeRecord(handle, record: DictData) -> IndexEntry:
+    recordData = pickle.dumps(record)
+    offset = handle.tell()
+    handle.write(recordData)
+    return offset, len(recordData), record.isDeleted()
+
+
+def saveChunked(data: DictOfLoggedDict, filename: str, incremental: bool = False) -> int:
+    """
+    Saves a DictOfLoggedDict in chunked format.
+    :param data: container to save
+    :param filename: destination
+    :param incremental: if the container was loaded from filename (with loadChunked), append only the records that
+                        were accessed and changed since and a new index. Otherwise (or if not possible) the whole
+                        file is rewritten
+    :return: number of records written
+    """
+    if incremental and isinstance(data.current, LazyRecords) and data.current.filename == filename:
+        return _saveIncremental(data, filename)
+
+    auxFilename = filename + ".tmp"
+    records = {}
+    with open(auxFilename, "wb") as handle:
+        handle.write(MAGIC)
+        for k, v in data.current.items():
+            records[k] = _writeRecord(handle, v)
+        _writeTail(handle, records, data)
+    os.replace(auxFilename, filename)
+
+    if isinstance(data.current, LazyRecords) and data.current.filename == filename:
+        data.current.markSaved(records)
+
+    return len(records)
+
+
+def _saveIncremental(data: DictOfLoggedDict, filename: str) -> int:
+    lazy: LazyRecords = data.current
+    records = dict(lazy.index)
+    changed = list(lazy.changedKeys())
+    with open(filename, "r+b") as handle:
+        handle.seek(0, os.SEEK_END)
+        for k in changed:
+            records[k] = _writeRecord(handle, lazy.loaded[k])
+        _writeTail(handle, records, data, sync=True)
+
+    lazy.markSaved(records)
+
+    return len(changed)
+
+
+def loadChunked(filename: str, lazy: bool = True) -> DictOfLoggedDict:
+    """
+    Loads a DictOfLoggedDict saved with saveChunked
+    :param filename: file to read
+    :param lazy: if True records are decoded on first access. Otherwise all of them are read now
+    :return: the container
+    """
+    with open(filename, "rb") as handle:
+        records, containerState = readIndex(handle)
+
+    result = DictOfLoggedDict.__new__(DictOfLoggedDict)
+    result.__setstate__(containerState)
+    result.current = LazyRecords(filename, records, owner=result)
+    if not lazy:
+        result.current = dict(result.current.items())
+
+    return result
+
+
+def loadRecord(filename: str, key, index: Optional[Dict[str, IndexEntry]] = None) -> DictData:
+    """
+    Reads a single record from a file in chunked format
+    :param filename: file to read
+    :param key: outer key of the record
+    :param index: index of the file, if already read
+    :return: the DictData of the key
+    """
+    with open(filename, "rb") as handle:
+        if index is None:
+            index, _ = readIndex(handle)
+        offset, length, _ = index[key]
+        handle.seek(offset)
+        return pickle.loads(handle.read(length))
+
+
+class DictOfLoggedDictView:
+    """
+    Read-only view of a DictOfLoggedDict saved with saveChunked, backed by a mmap of the file. Records are decoded
+    on demand (straight from the mapped pages, without copying them) and not kept, so the memory of the process
+    doesn't grow with what is read and processes reading the same file share its pages.
+
+    The file must not be rewritten while it is open.
+    """
+
+    def __init__(self, filename: str):
+        self.filename: str = filename
+        with open(filename, "rb") as handle:
+            self.buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index, containerState = readIndex(self.buffer)
+
+        self.exclusions = containerState.get('exclusions', set())
+        self.timestamp = containerState.get('timestamp')
+        self.numChanges: int = containerState.get('numChanges', 0)
+        self.history = containerState.get('history', [])
+        self.numLive: int = sum(1 for entry in self.index.values() if not entry[2])
+
+    def _decode(self, key) -> DictData:
+        offset, length, _ = self.index[key]
+        with memoryview(self.buffer)[offset:offset + length] as chunk:
+            return pickle.loads(chunk)
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def _isLive(self, key) -> bool:
+        return key in self.index and not self.index[key][2]
+
+    def __contains__(self, key):
+        return self._isLive(key)
+
+    def __len__(self):
+        return self.numLive
+
+    def lenV(self):
+        return len(self.index)
+
+    def keys(self):
+        for k, entry in self.index.items():
+            if not entry[2]:
+                yield k
+
+    def keysV(self):
+        return self.index.keys()
+
+    def getV(self, key) -> DictData:
+        """
+        Decodes a record. The result is a private copy: changes are not saved
+        """
+        if key not in self.index:
+            raise KeyError(f"Unknown key '{key}'")
+        return self._decode(key)
+
+    def get(self, key):
+        if key not in self.index:
+            raise KeyError(f"Unknown key '{key}'")
+        if not self._isLive(key):
+            raise KeyError(f"Requested item is deleted '{key}'")
+        return self._decode(key)._asdict()
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def items(self):
+        for k in self.keys():
+            yield k, self._decode(k)._asdict()
+
+    def values(self):
+        for _, v in self.items():
+            yield v
+
+    def subkeys(self):
+        result = set()
+
+        for v in self.values():
+            result.update(v.keys())
+
+        return result
+
+    def extractKey(self, key, default=None):
+        result = {k: v.get(key, default) for k, v in self.items()}
+
+        return result
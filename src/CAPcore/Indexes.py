@@ -0,0 +1,84 @@
+"""
+Secondary indexes for DictOfLoggedDict: for a subkey, the outer keys of the records that have each value.
+
+DictOfLoggedDict.addIndex creates them and keeps them up to date through the change notifications of its records.
+"""
+from collections.abc import Hashable
+from typing import Any, Dict, Set
+
+_ABSENT = object()
+
+
+class SubkeyIndex:
+    """
+    Value -> outer keys map of a subkey. Also keeps the value indexed for each key (so it can be removed without
+    looking for it) and, apart, the keys whose value can't be hashed, which are checked one by one.
+    """
+    __slots__ = ('subkey', 'buckets', 'values', 'unhashable')
+
+    def __init__(self, subkey):
+        self.subkey = subkey
+        self.buckets: Dict[Any, Set] = {}
+        self.values: Dict[Any, Any] = {}
+        self.unhashable: Set = set()
+
+    def set(self, k, value):
+        """
+        Indexes k with value (removing what was indexed for k before)
+        """
+        self.discard(k)
+        self.values[k] = value
+        if isinstance(value, Hashable):
+            try:
+                self.buckets.setdefault(value, set()).add(k)
+                return
+            except TypeError:  # Hashable tuples with unhashable items
+                pass
+        self.unhashable.add(k)
+
+    def discard(self, k):
+        value = self.values.pop(k, _ABSENT)
+        if value is _ABSENT:
+            return
+        if k in self.unhashable:
+            self.unhashable.discard(k)
+            return
+        bucket = self.buckets[value]
+        bucket.discard(k)
+        if not bucket:
+            del self.buckets[value]
+
+    def refresh(self, k, record):
+        """
+        Indexes k with the current value of the subkey in record (or removes it if the record is deleted or doesn't
+        have the subkey)
+        :param k: outer key
+        :param record: DictData of k (or None)
+        """
+        if record is None or record.isDeleted():
+            self.discard(k)
+            return
+        loggedValue = record.current.get(self.subkey)
+        if loggedValue is None or loggedValue.isDeleted():
+            self.discard(k)
+            return
+        self.set(k, loggedValue.get())
+
+    def find(self, value) -> Set:
+        """
+        :param value: value to look for
+        :return: set with the outer keys of the records where the subkey has value
+        """
+        result = set()
+        try:
+            result.update(self.buckets.get(value, ()))
+        except TypeError:  # unhashable value: only in unhashable
+            pass
+        result.update(k for k in self.unhashable if self.values[k] == value)
+        return result
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return f"SubkeyIndex('{self.subkey}': {len(self.buckets)} values, {len(self.values)} keys)"
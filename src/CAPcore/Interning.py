@@ -0,0 +1,107 @@
+"""
+Optional interning of keys and values of logged containers.
+
+Records often repeat the same subkeys and the same categorical values (team names, status codes...), each a different
+object when they come from parsing. With a pool in use (LoggedValue.internPool, see enableInterning), LoggedValue keeps
+(in its value and its history) and LoggedDict keeps (as keys) the object of the pool equal to each new one, so the
+copies can be freed.
+
+Only str, bytes, int and float are pooled, looked up with their type (1, 1.0 and True are equal but are not
+interchangeable). Floats are also looked up with their sign (0.0 and -0.0 are equal but are not interchangeable either)
+and NaN is never pooled (it isn't equal to itself, so it would never be found). Long strings and values seen after the
+pool is full are not added. The counters of the pool are approximate when several threads use it.
+"""
+import math
+import sys
+from collections import namedtuple
+from typing import Optional
+
+from .LoggedValue import LoggedValue
+
+INTERNABLE = (str, bytes, int, float)
+
+InternStats = namedtuple('InternStats', field_names=['lookups', 'hits', 'hitRate', 'size', 'bytesSaved'])
+
+
+class InternPool:
+    def __init__(self, maxSize: Optional[int] = 1000000, maxLength: int = 256):
+        """
+        :param maxSize: maximum number of values kept. None for no limit
+        :param maxLength: longest str or bytes that is pooled
+        """
+        # A dict per type, so equal values of different types are kept apart
+        self.pools: dict = {valueType: {} for valueType in INTERNABLE}
+        self.size: int = 0
+        self.maxSize: Optional[int] = maxSize
+        self.maxLength: int = maxLength
+        self.lookups: int = 0
+        self.hits: int = 0
+        self.bytesSaved: int = 0
+
+    def intern(self, value):
+        """
+        :param value: any value
+        :return: the value of the pool equal to value (value itself if there is none or it can't be pooled)
+        """
+        valueType = type(value)
+        if valueType not in self.pools or (valueType in (str, bytes) and len(value) > self.maxLength):
+            return value
+        if valueType is float:
+            if math.isnan(value):
+                return value
+            key = (value, math.copysign(1.0, value))
+        else:
+            key = value
+        self.lookups += 1
+        pool = self.pools[valueType]
+        result = pool.get(key)
+        if result is None:
+            if self.maxSize is None or self.size < self.maxSize:
+                pool[key] = value
+                self.size += 1
+            return value
+        self.hits += 1
+        if result is not value:
+            self.bytesSaved += sys.getsizeof(value)
+        return result
+
+    def stats(self) -> InternStats:
+        """
+        :return: InternStats with the lookups done, how many found the value in the pool (and the rate), the values
+                 in the pool and the (approximate) bytes of the duplicates that were replaced by pooled values
+        """
+        hitRate = self.hits / self.lookups if self.lookups else 0.0
+        return InternStats(lookups=self.lookups, hits=self.hits, hitRate=hitRate, size=self.size,
+                           bytesSaved=self.bytesSaved)
+
+    def clear(self):
+        for pool in self.pools.values():
+            pool.clear()
+        self.size = self.lookups = self.hits = self.bytesSaved = 0
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        stats = self.stats()
+        return f"InternPool(size={stats.size}, hitRate={stats.hitRate:.2%}, bytesSaved={stats.bytesSaved})"
+
+
+def enableInterning(pool: Optional[InternPool] = None) -> InternPool:
+    """
+    Starts interning the keys and values set from now on in all the logged containers
+    :param pool: pool to use. If None, a new one
+    :return: the pool in use
+    """
+    LoggedValue.internPool = pool if pool is not None else InternPool()
+    return LoggedValue.internPool
+
+
+def disableInterning() -> Optional[InternPool]:
+    """
+    Stops interning. Values already interned stay shared
+    :return: the pool that was in use (None if there wasn't one)
+    """
+    result = LoggedValue.internPool
+    LoggedValue.internPool = None
+    return result
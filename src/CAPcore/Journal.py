@@ -0,0 +1,159 @@
+"""
+Append-only journal of the changes of logged containers (LoggedDict, DictData, DictOfLoggedDict).
+
+A ChangeJournal is registered as a change listener and appends each ChangeEvent to a file as a length-prefixed
+pickle. Records are written in groups (group commit) and the file is fsync'ed every a configurable number of groups.
+A record cut by a crash is dropped when the journal is opened again, before appending to it. After a crash, loading
+the last snapshot of the container (pickle, saveChunked) and replaying the journal started after it rebuilds the
+container, so durability costs O(changes) instead of saving the whole structure.
+
+Journals are pickles: replay only trusted ones.
+"""
+import os
+import pickle
+import struct
+from typing import Iterator
+
+from .LoggedDict import ChangeEvent
+
+FRAMEHEADER = "<I"
+FRAMEHEADERLEN = struct.calcsize(FRAMEHEADER)
+
+
+def _completeLength(handle) -> int:
+    """
+    Length of the complete records at the start of a journal (what follows them is an interrupted write)
+    :param handle: journal file open for reading in binary mode
+    """
+    handle.seek(0, os.SEEK_END)
+    fileLen = handle.tell()
+    result = 0
+    while result + FRAMEHEADERLEN <= fileLen:
+        handle.seek(result)
+        (length,) = struct.unpack(FRAMEHEADER, handle.read(FRAMEHEADERLEN))
+        if result + FRAMEHEADERLEN + length > fileLen:
+            break
+        result += FRAMEHEADERLEN + length
+    return result
+
+
+class ChangeJournal:
+    def __init__(self, filename: str, groupSize: int = 64, fsyncEvery: int = 1):
+        """
+        :param filename: journal file. Records are appended to it if it exists (after dropping an incomplete one at
+                         the end)
+        :param groupSize: number of changes that are buffered before writing them (group commit). 1 writes every
+                          change as it happens
+        :param fsyncEvery: fsync the file every fsyncEvery group writes. 0 leaves it to the OS
+        """
+        if groupSize < 1:
+            raise ValueError(f"ChangeJournal: groupSize must be at least 1: {groupSize}")
+        self.filename: str = filename
+        self.groupSize: int = groupSize
+        self.fsyncEvery: int = fsyncEvery
+        self.buffer: list = []
+        self.numGroups: int = 0
+        self.numRecords: int = 0
+        self.containers: list = []
+        self.handle = open(filename, "a+b")  # pylint: disable=consider-using-with
+        self.handle.truncate(_completeLength(self.handle))
+
+    def __call__(self, event: ChangeEvent):
+        self.buffer.append(event)
+        if len(self.buffer) >= self.groupSize:
+            self.commit()
+
+    def commit(self):
+        """
+        Writes the buffered changes
+        """
+        if not self.buffer:
+            return
+        frames = []
+        for event in self.buffer:
+            payload = pickle.dumps(tuple(event))
+            frames.append(struct.pack(FRAMEHEADER, len(payload)) + payload)
+        self.handle.write(b"".join(frames))
+        self.handle.flush()
+        self.numRecords += len(self.buffer)
+        self.numGroups += 1
+        self.buffer = []
+        if self.fsyncEvery and (self.numGroups % self.fsyncEvery == 0):
+            os.fsync(self.handle.fileno())
+
+    def attach(self, container):
+        """
+        Registers the journal as change listener of a container (until detach or close)
+        :param container: LoggedDict, DictData or DictOfLoggedDict
+        :return: the journal
+        """
+        container.addChangeListener(self)
+        self.containers.append(container)
+        return self
+
+    def detach(self, container):
+        container.removeChangeListener(self)
+        # By identity: containers compare their contents
+        self.containers = [c for c in self.containers if c is not container]
+        self.commit()
+
+    def close(self):
+        """
+        Detaches the journal from the containers it is attached to and closes the file
+        """
+        if self.handle.closed:
+            return
+        for container in self.containers:
+            container.removeChangeListener(self)
+        self.containers = []
+        self.commit()
+        if self.fsyncEvery:
+            os.fsync(self.handle.fileno())
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+def readJournal(filename: str) -> Iterator[ChangeEvent]:
+    """
+    Reads the changes recorded in a journal. An incomplete record at the end (interrupted write) is ignored
+    :param filename: journal file
+    :return: ChangeEvents in the order they happened
+    """
+    with open(filename, "rb") as handle:
+        while True:
+            header = handle.read(FRAMEHEADERLEN)
+            if len(header) < FRAMEHEADERLEN:
+                return
+            (length,) = struct.unpack(FRAMEHEADER, header)
+            payload = handle.read(length)
+            if len(payload) < length:
+                return
+            yield ChangeEvent(*pickle.loads(payload))
+
+
+def replayJournal(container, filename: str) -> int:
+    """
+    Applies the changes of a journal to a container (typically the snapshot the journal was started after). The
+    container must not have the journal attached while replaying.
+    :param container: LoggedDict, DictData or DictOfLoggedDict
+    :param filename: journal file
+    :return: number of changes that modified the container
+    """
+    result = 0
+    lastTime = None
+    for event in readJournal(filename):
+        if container.applyChange(event):
+            result += 1
+            lastTime = event.timestamp
+
+    if result and hasattr(container, 'numChanges'):
+        container.timestamp = lastTime
+        container.numChanges += 1
+        container.addHistory(f"Replayed {result} changes from journal {filename}", timestamp=lastTime)
+
+    return result
@@ -1,8 +1,22 @@
-from time import gmtime, struct_time
-from typing import Set, Optional, Dict
+from collections import namedtuple
+from collections.abc import Mapping
+from time import struct_time
+from typing import Callable, Set, Optional, Dict
 
-from .LoggedValue import LoggedValue
+from .Batch import BatchState, batchOf
+from .LoggedValue import LoggedValue, changeTimestamp, initialTimestamp
 from .Misc import compareSets, SetDiff, chainKargs
+from .Python import slotsGetState, slotsSetState
+from .Schemas import alignedSlots
+from .Subscriptions import ChangeQueue, DEFAULTQUEUELENGTH
+from .Transactions import RecordTransaction
+
+# Change notified to listeners of logged containers. key is the key of the container (outer key in a DictOfLoggedDict,
+# None for a standalone LoggedDict) and subkey the key of the value (None for changes of a whole record). Actions
+# are those of LoggedValue history plus A (new key; for a new record of a DictOfLoggedDict, newValue has its contents)
+# and N (keys renamed, newValue is the mapping). Changes of the exclusions of a DictOfLoggedDict have key and subkey
+# None, action X and the exclusions before and after as values
+ChangeEvent = namedtuple('ChangeEvent', field_names=['key', 'subkey', 'action', 'timestamp', 'oldValue', 'newValue'])
 
 
 class LoggedDictDiff:
@@ -61,15 +75,66 @@ class LoggedDictDiff:
     __str__ = __repr__
 
 
+class LoggedDictView(Mapping):
+    """
+    Read-only view of the live values of a LoggedDict (or DictData). Nothing is copied: each access reads the
+    current state of the dict, so the view reflects the changes made after it was created.
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __getitem__(self, k):
+        value = self.data.current[k]
+        if value.isDeleted():
+            raise KeyError(k)
+        return value.get()
+
+    def __iter__(self):
+        for k, v in self.data.current.items():
+            if not v.isDeleted():
+                yield k
+
+    def __len__(self):
+        return self.data.numLive
+
+    def __contains__(self, k):
+        value = self.data.current.get(k)
+        return value is not None and not value.isDeleted()
+
+    def copy(self) -> dict:
+        return dict(self.items())
+
+    def __repr__(self):
+        return repr(self.copy())
+
+
 class LoggedDict:
-    def __init__(self, exclusions: Optional[Set] = None, timestamp=None):
+    __slots__ = ('current', 'exclusions', 'timestamp', 'numLive', 'numDeleted', 'changeListeners', 'batchState',
+                 'compactHistory')
+
+    def __init__(self, exclusions: Optional[Set] = None, timestamp=None, epochTimestamps: bool = False,
+                 compactHistory: bool = False):
+        """
+        :param exclusions: keys that won't be stored
+        :param timestamp: time of creation. An int (nanoseconds since the epoch) sets epoch mode
+        :param epochTimestamps: if True (or timestamp is an int) timestamps are kept as int nanoseconds since the epoch
+        :param compactHistory: the values keep their history in a CompactHistory (see LoggedValue)
+        """
 
         if exclusions is not None and not isinstance(exclusions, (set, list, tuple)):
             raise TypeError(f"LoggedDict: expected set/list/tuple for exclusions: {exclusions}")
 
         self.current: Dict[LoggedValue] = {}
         self.exclusions: Set[str] = set(exclusions) if exclusions else set()
-        self.timestamp = timestamp or gmtime()
+        self.timestamp = initialTimestamp(timestamp, epochTimestamps)
+        # Keep len() O(1). Values deleted or restored directly (getV(k).clear()) tell the dict, see LoggedValue.owner
+        self.numLive: int = 0
+        self.numDeleted: int = 0
+        self.changeListeners: Optional[list] = None
+        self.batchState: Optional[BatchState] = None
+        self.compactHistory: bool = compactHistory
 
     def __getitem__(self, item):
         return self.current.__getitem__(item).get()
@@ -77,16 +142,150 @@ class LoggedDict:
     def __setitem__(self, k, v, timestamp=None):
         if k in self.exclusions:
             raise KeyError(f"Key '{k}' in exclusions: {sorted(self.exclusions)}")
-        currVal = self.current.get(k, LoggedValue())  # default=
-        changes = currVal.set(v, timestamp=timestamp)
+        changeTime = self._changeTime(timestamp)
+        currVal = self.current.get(k)
+        isNew = currVal is None
+        wasDeleted = (not isNew) and currVal.isDeleted()
+        oldValue = None if (isNew or wasDeleted) else currVal.value
+        if isNew:
+            currVal = LoggedValue(timestamp=changeTime, compactHistory=self.compactHistory)
+            currVal.owner = self
+            self.numLive += 1
+            if LoggedValue.internPool is not None:
+                k = LoggedValue.internPool.intern(k)
+        changes = currVal._update(v, timestamp=changeTime)
 
         self.current[k] = currVal
+        if self.changeListeners and (changes or isNew):
+            self._notifyValueChange(k, isNew, wasDeleted, currVal.last_updated, oldValue, v)
         return changes
 
     def __len__(self):
-        result = len(list(self.keys()))
+        return self.numLive
+
+    def countKeys(self):
+        """
+        Counts live and deleted keys walking the whole dict
+        :return: (live, deleted)
+        """
+        numDeleted = sum(1 for v in self.current.values() if v.isDeleted())
+        return len(self.current) - numDeleted, numDeleted
+
+    def checkCounters(self) -> bool:
+        """
+        Debugging aid: checks that the live/deleted counters kept by the object match the actual contents
+        :return: True if they are consistent
+        """
+        return (self.numLive, self.numDeleted) == self.countKeys()
+
+    def _recount(self):
+        self.numLive, self.numDeleted = self.countKeys()
+
+    def _countChange(self, live: int, deleted: int):
+        """
+        Called by the values when they are deleted or restored
+        """
+        self.numLive += live
+        self.numDeleted += deleted
+
+    def _adoptValues(self):
+        """
+        Makes the dict the owner of its values (after unpickling them or taking them from another dict)
+        """
+        for v in self.current.values():
+            v.owner = self
+
+    def _changeTime(self, timestamp):
+        """
+        Timestamp for a change: the provided one, the one of the open batch or now
+        """
+        if timestamp is None and self.batchState is not None:
+            return self.batchState.timestamp
+        return changeTimestamp(timestamp, self.timestamp)
+
+    def batch(self, timestamp=None, rollback: bool = False):
+        """
+        Context manager that groups the changes made inside it under the same timestamp (see Batch.batchOf)
+        :param timestamp: time for all the changes. If None, the time when the batch starts
+        :param rollback: restore the dict to how it was before the batch if the block raises an exception
+        """
+        return batchOf(self, timestamp=timestamp, rollback=rollback)
+
+    def _endBatch(self, state: BatchState):
+        """
+        Bookkeeping at the end of a batch. A LoggedDict has none
+        """
+
+    def begin(self) -> RecordTransaction:
+        """
+        Starts a transaction (see Transactions). The values are saved as they are now, without copying their histories,
+        and restored by rollback(). Listeners are not told about rollbacks
+        :return: the transaction
+        """
+        return RecordTransaction(self)
+
+    def addChangeListener(self, listener: Callable):
+        """
+        Registers a callable that will receive a ChangeEvent for every change of the values, done through the methods
+        of the container or of the values (getV(k).set(v))
+        :param listener: callable with a ChangeEvent as single parameter
+        """
+        if self.changeListeners is None:
+            self.changeListeners = []
+        self.changeListeners.append(listener)
+
+    def removeChangeListener(self, listener: Callable):
+        if self.changeListeners and listener in self.changeListeners:
+            self.changeListeners.remove(listener)
+        if not self.changeListeners:
+            self.changeListeners = None
+
+    def subscribe(self, maxLength: Optional[int] = DEFAULTQUEUELENGTH) -> ChangeQueue:
+        """
+        Registers a bounded queue that receives the change events (see Subscriptions)
+        :param maxLength: maximum number of events kept by the queue (None for no limit)
+        :return: the queue
+        """
+        result = ChangeQueue(maxLength)
+        self.addChangeListener(result)
         return result
 
+    def unsubscribe(self, queue: ChangeQueue):
+        self.removeChangeListener(queue)
+
+    def _notify(self, subkey, action: str, timestamp, oldValue=None, newValue=None):
+        event = ChangeEvent(None, subkey, action, timestamp, oldValue, newValue)
+        for listener in self.changeListeners:
+            listener(event)
+
+    def _valueChanged(self, value: LoggedValue, action: str, oldValue, newValue):
+        """
+        Called by the values changed directly (getV(k).set(v), getV(k).clear()), when there are listeners. The key is
+        looked for walking the dict, O(len): the methods of the dict tell the listeners themselves
+        """
+        for k, v in self.current.items():
+            if v is value:
+                self._notify(k, action, value.last_updated, oldValue, newValue)
+                return
+
+    def _notifyValueChange(self, k, isNew: bool, wasDeleted: bool, timestamp, oldValue, newValue):
+        action = 'A' if isNew else ('C' if wasDeleted else 'U')
+        self._notify(k, action, timestamp, oldValue, newValue)
+
+    def applyChange(self, event: ChangeEvent) -> bool:
+        """
+        Applies a change, as notified to listeners, with its original timestamp (used to replay journals)
+        :param event: a ChangeEvent (key is ignored)
+        :return: True if something changed
+        """
+        if event.subkey is None:
+            if event.action == 'N':
+                return LoggedDict.renameKeys(self, event.newValue, timestamp=event.timestamp)
+            raise ValueError(f"applyChange: unexpected action for a LoggedDict: {event}")
+        if event.action == 'D':
+            return LoggedDict.purge(self, event.subkey, timestamp=event.timestamp)
+        return LoggedDict.__setitem__(self, event.subkey, event.newValue, timestamp=event.timestamp)
+
     def get(self, key, default=None):
         if key in self.current and not self.current[key].isDeleted():
             return self[key]
@@ -96,7 +295,7 @@ class LoggedDict:
         return self.current.get(key, default)
 
     def update(self, newValues, timestamp=None):
-        changeTime = timestamp or gmtime()
+        changeTime = self._changeTime(timestamp)
         result = False
         newValIter = newValues
         if isinstance(newValues, dict):
@@ -105,36 +304,54 @@ class LoggedDict:
         for k, v in newValIter:
             if k in self.exclusions:
                 continue
-            v1 = self.current.get(k, LoggedValue(timestamp=changeTime))
-            r1 = v1.set(v, changeTime)
+            v1 = self.current.get(k)
+            isNew = v1 is None
+            if isNew:
+                v1 = LoggedValue(timestamp=changeTime, compactHistory=self.compactHistory)
+            wasDeleted = v1.isDeleted()
+            oldValue = v1.value
+            r1 = v1._update(v, changeTime)
             if r1:
+                if isNew:
+                    if LoggedValue.internPool is not None:
+                        k = LoggedValue.internPool.intern(k)
+                    v1.owner = self
+                    self.numLive += 1
                 self.current[k] = v1
+                if self.changeListeners:
+                    self._notifyValueChange(k, isNew, wasDeleted, changeTime, oldValue, v)
 
             result |= r1
 
         return result
 
     def purge(self, *kargs, timestamp=None) -> bool:
-        changeTime = timestamp or gmtime()
+        changeTime = self._changeTime(timestamp)
         result = False
         keys2delete = set(chainKargs(*kargs))
         for k in keys2delete:
-            if k in self.current:
-                result |= self.current[k].clear(timestamp=changeTime)
+            if k not in self.current:
+                continue
+            oldValue = self.current[k].value
+            if self.current[k]._clear(timestamp=changeTime):
+                result = True
+                if self.changeListeners:
+                    self._notify(k, 'D', changeTime, oldValue, None)
 
         return result
 
     def addExclusion(self, *kargs, timestamp: Optional[struct_time] = None) -> bool:
         keys2add = set(chainKargs(*kargs))
         changed = False
-        self.exclusions.update(keys2add)
+        # Rebound, not updated: the set may be shared (see Schemas)
+        self.exclusions = self.exclusions | keys2add
         changed |= self.purge(keys2add, timestamp=timestamp)
 
         return changed
 
     def removeExclusion(self, *kargs):
         keys2remove = set(chainKargs(*kargs))
-        self.exclusions.difference_update(keys2remove)
+        self.exclusions = self.exclusions - keys2remove
 
     def keys(self):
         for k, v in self.current.items():
@@ -164,6 +381,26 @@ class LoggedDict:
         result = dict(self.items())
         return result
 
+    def view(self) -> LoggedDictView:
+        """
+        Read-only Mapping over the live values, without copying them (unlike _asdict)
+        """
+        return LoggedDictView(self)
+
+    def asOf(self, timestamp) -> dict:
+        """
+        Returns the contents of the dict as they were at a given time
+        :param timestamp: moment of interest
+        :return: a dict with the keys that had a (not deleted) value at that moment
+        """
+        result = {}
+        for k, v in self.current.items():
+            entry = v.entryAt(timestamp)
+            if entry is None or entry[0] == 'D':
+                continue
+            result[k] = entry[2]
+        return result
+
     def replace(self, other, timestamp=None) -> bool:
         result = False
         if not isinstance(other, (dict, LoggedDict)):
@@ -179,7 +416,8 @@ class LoggedDict:
 
     def diff(self, newValues, doUpdate: bool = False) -> LoggedDictDiff:
         """
-        Returns the differences between a loggedDict and another loggedDict or a dict
+        Returns the differences between a loggedDict and another loggedDict or a dict. Keys are not sorted, that is
+        left to LoggedDictDiff.show
         :param newValues: a loggedDict or a dict
                doUpdate: changes if the change was an update
         :return: a Difference object
@@ -189,21 +427,65 @@ class LoggedDict:
 
         result = LoggedDictDiff()
 
-        compKeys = self.compareWithOtherKeys(newValues)
-        for k in sorted(compKeys.new):
-            if k in self.exclusions:
+        slots = alignedSlots(self.current, newValues)
+        if slots is not None:
+            # Same keys in the same order (see Schemas): compared pairwise, no key is removed
+            for (k, otherVal), currVal in zip(newValues.items(), slots):
+                if currVal.isDeleted():
+                    if k not in self.exclusions:
+                        result.addKey(k, otherVal)
+                    continue
+                result.change(k, currVal.get(), otherVal)
+            return result
+
+        for k, otherVal in newValues.items():
+            currVal = self.current.get(k)
+            if currVal is None or currVal.isDeleted():
+                if k not in self.exclusions:
+                    result.addKey(k, otherVal)
                 continue
-            result.addKey(k, newValues.get(k))
-        for k in sorted(compKeys.shared):
-            currVal = self.get(k)
-            otherVal = newValues.get(k)
-            result.change(k, currVal, otherVal)
+            result.change(k, currVal.get(), otherVal)
         if not doUpdate:
-            for k in sorted(compKeys.missing):
-                result.removeKey(k, self.get(k))
+            for k, currVal in self.items():
+                if k not in newValues:
+                    result.removeKey(k, currVal)
 
         return result
 
+    def differs(self, newValues, doUpdate: bool = False) -> bool:
+        """
+        Tells if there are differences between a loggedDict and another loggedDict or a dict, stopping at the first one
+        found. Same result as bool(self.diff(newValues, doUpdate))
+        :param newValues: a loggedDict or a dict
+               doUpdate: changes if the change was an update
+        :return: True if there are differences
+        """
+        if not isinstance(newValues, (dict, LoggedDict)):
+            raise TypeError(f"Parameter expected to be a dict or LoggedDict. Provided {type(newValues)}")
+
+        slots = alignedSlots(self.current, newValues)
+        if slots is not None:
+            for (k, otherVal), currVal in zip(newValues.items(), slots):
+                if currVal.isDeleted():
+                    if k not in self.exclusions:
+                        return True
+                elif currVal.get() != otherVal:
+                    return True
+            return False
+
+        numShared = 0
+        for k, otherVal in newValues.items():
+            currVal = self.current.get(k)
+            if currVal is None or currVal.isDeleted():
+                if k not in self.exclusions:
+                    return True
+                continue
+            if currVal.get() != otherVal:
+                return True
+            numShared += 1
+
+        return (not doUpdate) and (numShared != self.numLive)
+
     def compareWithOtherKeys(self, newValues) -> SetDiff:
         if not isinstance(newValues, (dict, LoggedDict)):
             raise TypeError(f"Parameter expected to be a dict or LoggedDict. Provided {type(newValues)}")
@@ -231,12 +513,18 @@ class LoggedDict:
         result = "\n".join([firstLine, nextLines, lastLine])
         return result
 
-    def renameKeys(self, keyMapping: Dict[str, str]) -> bool:
+    def renameKeys(self, keyMapping: Dict[str, str], timestamp=None) -> bool:
         compKeys = compareSets(set(self.current.keys()), set(keyMapping.keys()))
 
         if not compKeys.shared:
             return False
-        self.current = {keyMapping.get(k, k): v for k, v in self.itemsV()}
+        # Refilled in place so current keeps its type (see Schemas)
+        renamed = [(keyMapping.get(k, k), v) for k, v in self.itemsV()]
+        self.current.clear()
+        self.current.update(renamed)
+        self._recount()
+        if self.changeListeners:
+            self._notify(None, 'N', self._changeTime(timestamp), None, keyMapping)
 
         return True
 
@@ -244,10 +532,24 @@ class LoggedDict:
         return (k in self.current) and not self.current[k].isDeleted()
 
     def __ne__(self, other):
-        return self.diff(other)
+        return self.differs(other)
 
     def __eq__(self, other):
-        return not self.diff(other)
+        return not self.differs(other)
+
+    def __getstate__(self):
+        # Listeners are bound to the live object, they are not kept
+        return slotsGetState(self, skip={'changeListeners', 'batchState'})
+
+    def __setstate__(self, state):
+        slotsSetState(self, state)
+        self.changeListeners = None
+        self.batchState = None
+        if not hasattr(self, 'compactHistory'):
+            self.compactHistory = False
+        self._adoptValues()
+        if not hasattr(self, 'numLive'):
+            self._recount()
 
     def __repr__(self):
         return self.show(compact=True)
@@ -1,44 +1,229 @@
-from time import gmtime, strftime
+from array import array
+from bisect import bisect_right
+from calendar import timegm
+from collections.abc import Sequence
+from operator import itemgetter
+from time import gmtime, strftime, struct_time, time_ns
+
+from .Python import slotsGetState, slotsSetState
 
 DATEFORMAT = "%Y-%m-%d %H:%M:%S%z"
+NSPERSECOND = 1_000_000_000
+
+
+def now(epoch: bool = False):
+    """
+    Current time
+    :param epoch: if True, int nanoseconds since the epoch. Otherwise a struct_time (UTC)
+    :return:
+    """
+    return time_ns() if epoch else gmtime()
+
+
+def toStructTime(timestamp) -> struct_time:
+    return gmtime(timestamp // NSPERSECOND) if isinstance(timestamp, int) else timestamp
+
+
+def toEpochNs(timestamp) -> int:
+    return timestamp if isinstance(timestamp, int) else timegm(timestamp) * NSPERSECOND
+
+
+def initialTimestamp(timestamp, epoch: bool = False):
+    """
+    Timestamp for the creation of a container: the provided one (current time if None), converted to int nanoseconds
+    since the epoch if epoch is requested. An int timestamp puts the container in epoch mode anyway.
+    """
+    if timestamp is None:
+        return now(epoch)
+    return toEpochNs(timestamp) if epoch else timestamp
+
+
+def changeTimestamp(timestamp, reference):
+    """
+    Timestamp to record a change with: the provided one (current time if None) in the same representation as
+    reference, so containers created in epoch mode (int nanoseconds) keep using ints and the rest struct_time.
+    :param timestamp: provided timestamp (struct_time, int nanoseconds since the epoch or None)
+    :param reference: a timestamp already stored by the container
+    :return:
+    """
+    epoch = isinstance(reference, int)
+    if timestamp is None:
+        return now(epoch)
+    if isinstance(timestamp, int) == epoch:
+        return timestamp
+    return toEpochNs(timestamp) if epoch else toStructTime(timestamp)
+
+
+def formatTimestamp(timestamp) -> str:
+    return strftime(DATEFORMAT, toStructTime(timestamp))
+
+
+class CompactHistory(Sequence):
+    """
+    Columnar storage for the history of a LoggedValue.
+
+    Entries are appended and read as (action, timestamp, value) tuples, as in a plain list, but actions are kept in a
+    bytearray, timestamps as int64 epoch seconds (nanoseconds if epochNs) in an array and values in a list, so no
+    tuple nor struct_time is kept per change. Tuples are rebuilt on read.
+    """
+    __slots__ = ('actions', 'timestamps', 'values', 'epochNs')
+
+    def __init__(self, entries=None, epochNs: bool = False):
+        self.actions: bytearray = bytearray()
+        self.timestamps: array = array('q')
+        self.values: list = []
+        self.epochNs: bool = epochNs
+
+        for entry in (entries or []):
+            self.append(entry)
+
+    def _column(self, changeTime) -> int:
+        if self.epochNs:
+            return toEpochNs(changeTime)
+        return changeTime // NSPERSECOND if isinstance(changeTime, int) else timegm(changeTime)
+
+    def append(self, entry):
+        action, changeTime, v = entry
+        self.actions.append(ord(action))
+        self.timestamps.append(self._column(changeTime))
+        self.values.append(v)
+
+    def bisectTime(self, changeTime) -> int:
+        """
+        Number of entries recorded at or before changeTime (as bisect_right over the timestamps)
+        :param changeTime: a struct_time or int nanoseconds since the epoch
+        :return: position
+        """
+        return bisect_right(self.timestamps, self._column(changeTime))
+
+    def retain(self, positions):
+        """
+        Keeps only the entries at the given positions (sorted)
+        :param positions: positions to keep
+        """
+        self.actions = bytearray(self.actions[i] for i in positions)
+        self.timestamps = array('q', (self.timestamps[i] for i in positions))
+        self.values = [self.values[i] for i in positions]
+
+    def truncate(self, length: int):
+        """
+        Drops the entries from position length on
+        """
+        del self.actions[length:]
+        del self.timestamps[length:]
+        del self.values[length:]
+
+    def _entry(self, idx):
+        changeTime = self.timestamps[idx] if self.epochNs else gmtime(self.timestamps[idx])
+        return chr(self.actions[idx]), changeTime, self.values[idx]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._entry(i) for i in range(*idx.indices(len(self)))]
+        return self._entry(range(len(self))[idx])
+
+    def __len__(self):
+        return len(self.values)
+
+    def __eq__(self, other):
+        if isinstance(other, (CompactHistory, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
 
 
 class LoggedValue:
-    def __init__(self, v=None, timestamp=None):
-        self.last_updated = timestamp or gmtime()
+    __slots__ = ('last_updated', 'deleted', 'value', 'history', 'owner')
+    # InternPool shared by all the values (and LoggedDict keys), see Interning. None: no interning
+    internPool = None
+
+    def __init__(self, v=None, timestamp=None, compactHistory: bool = False, epochTimestamps: bool = False):
+        """
+        :param v: initial value
+        :param timestamp: time of creation. An int (nanoseconds since the epoch) sets epoch mode
+        :param compactHistory: keep history in a CompactHistory instead of a list
+        :param epochTimestamps: if True (or timestamp is an int) timestamps are kept as int nanoseconds since the epoch
+                                and only converted to struct_time for display
+        """
+        self.last_updated = initialTimestamp(timestamp, epochTimestamps)
         self.deleted = False
         self.value = None
-        self.history = []
+        self.history = (CompactHistory(epochNs=isinstance(self.last_updated, int)) if compactHistory else [])
+        # Container told (with _countChange) when the value is deleted or restored, so its counters stay right
+        self.owner = None
 
-        self.set(v, timestamp, change=True)
+        self._update(v, timestamp)
 
     def set(self, v, timestamp=None, change=False):
-        result = change
-        if self.deleted or (v != self.value):
-            changeTime = timestamp or gmtime()
-            action = 'U'
-            if self.deleted:
-                action = 'C'
-            result = True
-            self._set(v, action, changeTime)
+        """
+        Changes the value. If it belongs to a dict (owner), the listeners of the dict are told
+        :param v: new value
+        :param timestamp: time of the change (now if None)
+        :param change: value returned if v is the current value
+        :return: True if the value changed (or change)
+        """
+        wasDeleted = self.deleted
+        oldValue = None if wasDeleted else self.value
+        if not self._update(v, timestamp):
+            return change
+        if self.owner is not None and self.owner.changeListeners:
+            self.owner._valueChanged(self, 'C' if wasDeleted else 'U', oldValue, v)
+        return True
+
+    def _update(self, v, timestamp=None) -> bool:
+        """
+        set without telling the listeners of the owner: used by the owner, that tells them itself
+        """
+        if not (self.deleted or (v != self.value)):
+            return False
+        changeTime = changeTimestamp(timestamp, self.last_updated)
+        action = 'U'
+        if self.deleted:
+            action = 'C'
+        self._set(v, action, changeTime)
+        if self.deleted:
             self.deleted = False
-        return result
+            if self.owner is not None:
+                self.owner._countChange(1, -1)
+        return True
 
     def _set(self, v, action, changeTime):
         if changeTime < self.last_updated:
-            raise ValueError((f"changeTime value '{strftime(DATEFORMAT, changeTime)}' is before the last"
-                              f" recorded change '{strftime(DATEFORMAT, self.last_updated)}'"))
+            raise ValueError((f"changeTime value '{formatTimestamp(changeTime)}' is before the last"
+                              f" recorded change '{formatTimestamp(self.last_updated)}'"))
+        if LoggedValue.internPool is not None:
+            v = LoggedValue.internPool.intern(v)
         newLog = (action, changeTime, v)
         self.last_updated = changeTime
         self.value = v
         self.history.append(newLog)
 
     def clear(self, timestamp=None):
+        """
+        Deletes the value. If it belongs to a dict (owner), the listeners of the dict are told
+        :param timestamp: time of the change (now if None)
+        :return: True if the value was not deleted already
+        """
+        oldValue = self.value
+        if not self._clear(timestamp):
+            return False
+        if self.owner is not None and self.owner.changeListeners:
+            self.owner._valueChanged(self, 'D', oldValue, None)
+        return True
+
+    def _clear(self, timestamp=None) -> bool:
+        """
+        clear without telling the listeners of the owner (see _update)
+        """
         if self.deleted:
             return False
-        changeTime = timestamp or gmtime()
+        changeTime = changeTimestamp(timestamp, self.last_updated)
         self._set(None, 'D', changeTime)
         self.deleted = True
+        if self.owner is not None:
+            self.owner._countChange(-1, 1)
 
         return True
 
@@ -50,9 +235,36 @@ class LoggedValue:
     def isDeleted(self):
         return self.deleted
 
+    def entryAt(self, timestamp):
+        """
+        Returns the history entry in effect at a given time. History is sorted by time (_set rejects changes older
+        than the last one) so it is a binary search.
+        :param timestamp: moment of interest
+        :return: (action, timestamp, value) tuple or None if there was no change before that moment
+        """
+        if isinstance(self.history, CompactHistory):
+            idx = self.history.bisectTime(timestamp)
+        else:
+            idx = bisect_right(self.history, changeTimestamp(timestamp, self.last_updated), key=itemgetter(1))
+        if idx == 0:
+            return None
+        return self.history[idx - 1]
+
+    def valueAt(self, timestamp, default=None):
+        """
+        Returns the value held at a given time
+        :param timestamp: moment of interest
+        :param default: value returned if there was no value or it was deleted at that moment
+        :return:
+        """
+        entry = self.entryAt(timestamp)
+        if entry is None or entry[0] == 'D':
+            return default
+        return entry[2]
+
     def __repr__(self):
         delTxt = " D" if self.deleted else ""
-        dateTxt = strftime(DATEFORMAT, self.last_updated)
+        dateTxt = formatTimestamp(self.last_updated)
         lenTxt = f"l"":"f"{len(self.history)}"
 
         return f"{self.value.__repr__()} [t:{dateTxt}{delTxt} {lenTxt}]"
@@ -60,6 +272,22 @@ class LoggedValue:
     def __len__(self):
         return len(self.history)  # TODO: operaciones relativas a la historia
 
+    def compact(self, policy):
+        """
+        Applies a retention policy (see Retention) to the history. The last change is always kept
+        :param policy: a RetentionPolicy
+        :return: RetentionResult with what was removed
+        """
+        return policy.apply(self.history, 1)
+
+    def __getstate__(self):
+        # The owner adopts the value again when it is unpickled
+        return slotsGetState(self, skip={'owner'})
+
+    def __setstate__(self, state):
+        slotsSetState(self, state)
+        self.owner = None
+
     def __eq__(self, other):
         if isinstance(other, self.__class__):
             return self.value == other.get()
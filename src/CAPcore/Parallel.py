@@ -0,0 +1,152 @@
+"""
+Diff of a large DictOfLoggedDict computed in a pool of processes.
+
+The records to compare (those alive both in the container and in the new values) are split in chunks of outer keys.
+The workers get the container and the new values once, when they start (inherited, not copied, when processes are
+started with fork; pickled once per worker otherwise), so only the keys of each chunk are sent to them. They return
+the LoggedDictDiff (DictData.diff) of the records that changed, and the parent merges them, in the order of the new
+values, into the same DictOfLoggedDictDiff that DictOfLoggedDict.diff returns. Added and removed records only need the
+keys, so the parent handles them.
+
+Starting the workers and sending them the data has a cost that only pays off with many records and several CPUs: below
+minRecords records to compare, or with a single worker, the diff is computed in the calling process. Fork is only used
+on Linux and when the calling process runs a single thread (a forked child gets a copy of the locks other threads hold,
+and nobody releases them); otherwise workers are started with forkserver or spawn (see chooseStartMethod).
+
+Changes are applied in the parent (parallelApply, with DictOfLoggedDict.applyDiff): they modify the live container,
+which the workers only have a copy of. The container is read without locks: use ConcurrentDictOfLoggedDict.exclusive()
+around the calls if other threads change it.
+"""
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import get_all_start_methods, get_context
+from time import struct_time
+from typing import Iterable, List, Optional, Tuple
+
+from .DictLoggedDict import DictOfLoggedDict, DictOfLoggedDictDiff
+
+DEFAULTCHUNKSIZE = 5000
+DEFAULTMINRECORDS = 50000
+
+# Data of a worker process, set in it by _initWorker when it starts
+_workerData: Optional[Tuple] = None
+
+
+def _initWorker(data: DictOfLoggedDict, other):
+    global _workerData
+    _workerData = (data, other)
+
+
+def diffChunk(keys: List, doUpdate: bool, data: Optional[DictOfLoggedDict] = None, other=None) -> List[Tuple]:
+    """
+    Work done by a worker
+    :param keys: outer keys of records alive in both data and other
+    :param doUpdate: do an update instead of a replace
+    :param data: the container (if None, the one the worker got when it started)
+    :param other: the new values (if None, the ones the worker got when it started)
+    :return: list of (outer key, LoggedDictDiff) of the records that changed
+    """
+    if data is None:
+        data, other = _workerData
+    result = []
+    isDict = isinstance(other, dict)
+    for k in keys:
+        diff = data.current[k].diff(other[k] if isDict else other.getV(k), doUpdate=doUpdate)
+        if diff:
+            result.append((k, diff))
+    return result
+
+
+def chooseStartMethod() -> str:
+    """
+    Start method for the workers: fork on Linux if the calling process runs a single thread, otherwise forkserver (or
+    spawn where there is no forkserver)
+    :return: name of the start method (see multiprocessing.get_context)
+    """
+    methods = get_all_start_methods()
+    if sys.platform.startswith('linux') and 'fork' in methods and threading.active_count() == 1:
+        return 'fork'
+    return 'forkserver' if 'forkserver' in methods else 'spawn'
+
+
+def _chunks(items: Iterable, chunkSize: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunkSize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parallelDiff(data: DictOfLoggedDict, other, doUpdate: bool = False, maxWorkers: Optional[int] = None,
+                 chunkSize: int = DEFAULTCHUNKSIZE, minRecords: int = DEFAULTMINRECORDS,
+                 startMethod: Optional[str] = None) -> DictOfLoggedDictDiff:
+    """
+    Same result as data.diff(other, doUpdate), with the records compared in a pool of processes. If there are fewer
+    than minRecords records to compare, everything fits in a chunk or there is a single worker, the work is done in the
+    calling process
+    :param data: the container
+    :param other: values to replace or update (dict or DictOfLoggedDict)
+    :param doUpdate: do an update instead of a replace
+    :param maxWorkers: number of processes of the pool (if None, the number of CPUs)
+    :param chunkSize: number of records sent to a worker at once. Bigger chunks mean less overhead but worse balance
+    :param minRecords: minimum number of records to compare for the pool to be used
+    :param startMethod: how the workers are started: 'fork', 'forkserver' or 'spawn' (if None, chooseStartMethod())
+    :return: a DictOfLoggedDictDiff
+    """
+    if not isinstance(other, (dict, DictOfLoggedDict)):
+        raise TypeError(f"Parameter expected to be a dict or DictOfLoggedDict. Provided {type(other)}")
+    if chunkSize < 1:
+        raise ValueError(f"chunkSize must be positive: {chunkSize}")
+    if startMethod is not None and startMethod not in get_all_start_methods():
+        raise ValueError(f"Unknown start method: {startMethod}. Available: {get_all_start_methods()}")
+    numWorkers = maxWorkers if maxWorkers is not None else (os.cpu_count() or 1)
+
+    result = DictOfLoggedDictDiff()
+    shared = []
+    for k, _ in DictOfLoggedDict._otherItems(other):
+        currVal = data.current.get(k)
+        if currVal is None or currVal.isDeleted():
+            result.addKey(k, other.get(k))
+            continue
+        shared.append(k)
+
+    chunks = list(_chunks(shared, chunkSize))
+    if len(chunks) <= 1 or len(shared) < minRecords or numWorkers < 2:
+        fragments = [diffChunk(chunk, doUpdate, data, other) for chunk in chunks]
+    else:
+        context = get_context(startMethod or chooseStartMethod())
+        with ProcessPoolExecutor(max_workers=numWorkers, mp_context=context, initializer=_initWorker,
+                                 initargs=(data, other)) as pool:
+            fragments = list(pool.map(diffChunk, chunks, repeat(doUpdate)))
+
+    for fragment in fragments:
+        for k, diff in fragment:
+            result.addChange(k, diff)
+
+    for k, currVal in data.current.items():
+        if not currVal.isDeleted() and k not in other:
+            result.removeKey(k, currVal)
+
+    return result
+
+
+def parallelApply(data: DictOfLoggedDict, other, timestamp: Optional[struct_time] = None, doUpdate: bool = False,
+                  **kwargs) -> bool:
+    """
+    Replaces (or updates) the contents of data with other, computing the diff with parallelDiff and applying it with
+    DictOfLoggedDict.applyDiff
+    :param data: the container
+    :param other: new values (dict or DictOfLoggedDict)
+    :param timestamp: time of the changes
+    :param doUpdate: do an update instead of a replace
+    :param kwargs: parameters for parallelDiff (maxWorkers, chunkSize, minRecords, startMethod)
+    :return: True if something changed
+    """
+    diff = parallelDiff(data, other, doUpdate=doUpdate, **kwargs)
+    return data.applyDiff(diff, timestamp=timestamp, doUpdate=doUpdate)
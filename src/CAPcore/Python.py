@@ -3,6 +3,7 @@ Python specific functions
 """
 import sys
 from importlib import import_module
+from typing import Any, Dict, Optional, Set
 
 
 def loadModule(moduleName: str, classLocation: str):
@@ -12,3 +13,50 @@ def loadModule(moduleName: str, classLocation: str):
         import_module(fullModName, classLocation)
 
     return fullModName, sys.modules[fullModName]
+
+
+def classSlots(cls) -> set:
+    """
+    Returns the names of all the slots declared by a class and its ancestors
+    :param cls: a class
+    :return: set with the names
+    """
+    result = set()
+    for klass in cls.__mro__:
+        slots = vars(klass).get('__slots__', ())
+        result.update((slots,) if isinstance(slots, str) else slots)
+
+    return result
+
+
+def slotsSetState(obj, state):
+    """
+    Restores the state of an object with __slots__. Accepts both the (dict, slots) tuple produced by pickle for slotted
+    objects and a plain dict, which is what pickles made before the class had __slots__ contain, so those can still
+    be loaded. Attributes that are not slots of the class are ignored.
+    :param obj: object being unpickled
+    :param state: state as read from the pickle
+    :return:
+    """
+    auxState = {}
+    if isinstance(state, tuple):
+        for part in state:
+            auxState.update(part or {})
+    else:
+        auxState.update(state or {})
+
+    validSlots = classSlots(type(obj))
+    for k, v in auxState.items():
+        if k in validSlots:
+            setattr(obj, k, v)
+
+
+def slotsGetState(obj, skip: Optional[Set[str]] = None) -> Dict[str, Any]:
+    """
+    Returns the state of an object with __slots__ as a dict, to be restored with slotsSetState
+    :param obj: object being pickled
+    :param skip: attributes not to be included (e.g. things that can't or shouldn't be pickled)
+    :return: a dict with the attributes that are set
+    """
+    auxSkip = skip or set()
+    return {k: getattr(obj, k) for k in classSlots(type(obj)) if k not in auxSkip and hasattr(obj, k)}
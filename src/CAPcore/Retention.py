@@ -0,0 +1,138 @@
+"""
+Retention policies for the histories of logged containers (LoggedValue.history, DictData.history and
+DictOfLoggedDict.history).
+
+A policy decides which entries of a history are kept; the last entry (the current state) is always kept. Policies are
+applied with the compact methods of the containers, DictOfLoggedDict.compact does it over the whole structure in one
+pass and reports what was reclaimed.
+"""
+import sys
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from typing import List, Optional
+
+from .LoggedValue import CompactHistory, NSPERSECOND, now, toEpochNs
+
+# Result of applying a policy: number of entries removed and (approximate) bytes released
+RetentionResult = namedtuple('RetentionResult', field_names=['entries', 'bytes'], defaults=[0, 0])
+
+# Report of DictOfLoggedDict.compact (and DictData.compact): entries removed from values, records and the container,
+# plus approximate bytes
+CompactionReport = namedtuple('CompactionReport', field_names=['values', 'records', 'container', 'bytes'],
+                              defaults=[0, 0, 0, 0])
+
+SECONDSPERDAY = 86400
+COMPACTENTRYBYTES = 17  # action (1) + timestamp (8) + reference to value (8)
+
+
+def addResults(*kargs: RetentionResult) -> RetentionResult:
+    return RetentionResult(entries=sum(r.entries for r in kargs), bytes=sum(r.bytes for r in kargs))
+
+
+def addReports(*kargs: CompactionReport) -> CompactionReport:
+    return CompactionReport(*(sum(field) for field in zip(CompactionReport(), *kargs)))
+
+
+class RetentionPolicy(ABC):
+    """
+    Base class. Subclasses implement select
+    """
+
+    @abstractmethod
+    def select(self, timestamps: List) -> List[int]:
+        """
+        Chooses the entries to keep
+        :param timestamps: timestamps of the entries (struct_time or int nanoseconds), oldest first
+        :return: sorted positions of the entries to keep
+        """
+
+    def apply(self, history, timePos: int) -> RetentionResult:
+        """
+        Removes (in place) the entries of a history that the policy doesn't keep
+        :param history: list of tuples or CompactHistory
+        :param timePos: position of the timestamp in the entries of the history
+        :return: what was removed
+        """
+        if len(history) <= 1:
+            return RetentionResult()
+        if isinstance(history, CompactHistory):
+            timestamps = list(history.timestamps)
+            if not history.epochNs:
+                timestamps = [t * NSPERSECOND for t in timestamps]
+        else:
+            timestamps = [entry[timePos] for entry in history]
+
+        keep = set(self.select(timestamps))
+        keep.add(len(history) - 1)
+        numRemoved = len(history) - len(keep)
+        if numRemoved == 0:
+            return RetentionResult()
+
+        keepList = sorted(keep)
+        if isinstance(history, CompactHistory):
+            history.retain(keepList)
+            return RetentionResult(entries=numRemoved, bytes=numRemoved * COMPACTENTRYBYTES)
+
+        removedBytes = sum(sys.getsizeof(entry) for i, entry in enumerate(history) if i not in keep)
+        history[:] = [history[i] for i in keepList]
+        return RetentionResult(entries=numRemoved, bytes=removedBytes)
+
+
+class KeepLast(RetentionPolicy):
+    """
+    Keeps the last n changes
+    """
+
+    def __init__(self, n: int):
+        if n < 1:
+            raise ValueError(f"KeepLast: n must be at least 1: {n}")
+        self.n: int = n
+
+    def select(self, timestamps: List) -> List[int]:
+        return list(range(max(0, len(timestamps) - self.n), len(timestamps)))
+
+
+class KeepNewerThan(RetentionPolicy):
+    """
+    Keeps the changes made during the last window seconds (counted from reference, current time by default)
+    """
+
+    def __init__(self, window: float, reference=None):
+        self.window: float = window
+        self.reference = reference
+
+    def select(self, timestamps: List) -> List[int]:
+        reference = toEpochNs(self.reference if self.reference is not None else now(epoch=True))
+        limit = reference - int(self.window * NSPERSECOND)
+        return [i for i, t in enumerate(timestamps) if toEpochNs(t) >= limit]
+
+
+class KeepDaily(RetentionPolicy):
+    """
+    Downsamples to the last change of each (UTC) day
+    """
+
+    def select(self, timestamps: List) -> List[int]:
+        lastOfDay = {}
+        for i, t in enumerate(timestamps):
+            lastOfDay[toEpochNs(t) // (SECONDSPERDAY * NSPERSECOND)] = i
+        return sorted(lastOfDay.values())
+
+
+def retentionPolicy(keepLast: Optional[int] = None, window: Optional[float] = None,
+                    daily: bool = False) -> RetentionPolicy:
+    """
+    Builds a policy from configuration values (only one of them must be provided)
+    :param keepLast: keep the last keepLast changes
+    :param window: keep changes newer than window seconds
+    :param daily: keep one change per day
+    :return: a RetentionPolicy
+    """
+    provided = [x for x in (keepLast, window, daily or None) if x is not None]
+    if len(provided) != 1:
+        raise ValueError("retentionPolicy: provide exactly one of keepLast, window or daily")
+    if keepLast is not None:
+        return KeepLast(keepLast)
+    if window is not None:
+        return KeepNewerThan(window)
+    return KeepDaily()
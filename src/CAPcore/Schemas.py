@@ -0,0 +1,220 @@
+"""
+Shared key schemas ("hidden classes") for the records of a DictOfLoggedDict.
+
+Records of a container usually have the same subkeys. With shared schemas (DictOfLoggedDict(sharedSchemas=True)) the
+current of each record is a SchemaDict: a KeySchema (the keys in insertion order and their slot numbers, shared by all
+the records with those keys) plus a tuple with the LoggedValue of each slot. Adding a key moves the record to the next
+schema, found through the transitions of the current one, so records filled in the same order end up with the same
+schema object. A record whose keys are unusual (too many keys, or too many schemas in the family) turns its
+SchemaDict into a plain dict.
+
+The records of such a container also share the exclusions of the container (a frozenset, replaced when they change)
+instead of having a copy each.
+"""
+from collections.abc import ItemsView, KeysView, MutableMapping, ValuesView
+from typing import Dict, FrozenSet, Optional, Tuple
+from weakref import WeakValueDictionary
+
+DEFAULTMAXSCHEMAS = 1000
+DEFAULTMAXKEYS = 256
+
+
+class SchemaFamily:
+    """
+    Schemas reachable from an empty one (one family per container)
+    """
+    __slots__ = ('root', 'numSchemas', 'maxSchemas', 'maxKeys', 'exclusions')
+
+    def __init__(self, maxSchemas: int = DEFAULTMAXSCHEMAS, maxKeys: int = DEFAULTMAXKEYS,
+                 exclusions: FrozenSet = frozenset()):
+        """
+        :param maxSchemas: maximum number of schemas. Records that would need more use plain dicts
+        :param maxKeys: maximum number of keys of a schema
+        :param exclusions: exclusions shared by the records
+        """
+        self.numSchemas: int = 1
+        self.maxSchemas: int = maxSchemas
+        self.maxKeys: int = maxKeys
+        self.exclusions: FrozenSet = frozenset(exclusions)
+        self.root: KeySchema = KeySchema((), self)
+
+    def __reduce__(self):
+        # Schemas are rebuilt as records are filled (or unpickled)
+        return SchemaFamily, (self.maxSchemas, self.maxKeys, self.exclusions)
+
+
+class KeySchema:
+    """
+    Keys of a record, in insertion order, with their slot numbers. Schemas are never modified, only extended
+    """
+    __slots__ = ('keys', 'slotOf', 'transitions', 'family', '__weakref__')
+
+    def __init__(self, keys: Tuple, family: SchemaFamily):
+        self.keys: Tuple = keys
+        self.slotOf: Dict = {k: i for i, k in enumerate(keys)}
+        self.transitions: Dict = {}
+        self.family: SchemaFamily = family
+
+    def withKey(self, k) -> Optional['KeySchema']:
+        """
+        :param k: a key that is not in the schema
+        :return: the schema with the keys of this one plus k (None if the family can't grow more)
+        """
+        result = self.transitions.get(k)
+        if result is None:
+            family = self.family
+            if len(self.keys) >= family.maxKeys or family.numSchemas >= family.maxSchemas:
+                return None
+            result = KeySchema(self.keys + (k,), family)
+            family.numSchemas += 1
+            self.transitions[k] = result
+        return result
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return schemaFromKeys, (self.keys,)
+
+    def __repr__(self):
+        return f"KeySchema{self.keys}"
+
+
+# Schemas of unpickled records (pickled separately, e.g. by DictLoggedDictStore), so they are shared again
+_loadedSchemas: WeakValueDictionary = WeakValueDictionary()
+
+
+def schemaFromKeys(keys: Tuple) -> KeySchema:
+    result = _loadedSchemas.get(keys)
+    if result is None:
+        result = KeySchema(keys, SchemaFamily())
+        _loadedSchemas[keys] = result
+    return result
+
+
+def alignedSlots(current, newValues) -> Optional[Tuple]:
+    """
+    :param current: current of a record
+    :param newValues: values to compare with it
+    :return: the LoggedValues of current, if it is a SchemaDict with the keys of the dict newValues in the same order
+             (so they can be compared pairwise without lookups). None otherwise
+    """
+    if type(current) is not SchemaDict or current.schema is None or type(newValues) is not dict:
+        return None
+    keys = current.schema.keys
+    if len(keys) != len(newValues) or keys != tuple(newValues):
+        return None
+    return current.slots
+
+
+class SchemaDict(MutableMapping):
+    """
+    Mapping key -> LoggedValue of a record, as a shared KeySchema and a tuple of values (or, once its keys are unusual,
+    a plain dict, with schema None). Used as LoggedDict.current
+    """
+    __slots__ = ('schema', 'slots')
+
+    def __init__(self, schema: KeySchema):
+        self.schema: Optional[KeySchema] = schema
+        self.slots = ()
+
+    def _toDict(self):
+        if self.schema is not None:
+            self.slots = dict(zip(self.schema.keys, self.slots))
+            self.schema = None
+
+    def __getitem__(self, k):
+        schema = self.schema
+        if schema is None:
+            return self.slots[k]
+        return self.slots[schema.slotOf[k]]
+
+    def get(self, k, default=None):
+        schema = self.schema
+        if schema is None:
+            return self.slots.get(k, default)
+        idx = schema.slotOf.get(k)
+        return default if idx is None else self.slots[idx]
+
+    def __setitem__(self, k, v):
+        schema = self.schema
+        if schema is None:
+            self.slots[k] = v
+            return
+        idx = schema.slotOf.get(k)
+        if idx is not None:
+            if self.slots[idx] is not v:
+                self.slots = self.slots[:idx] + (v,) + self.slots[idx + 1:]
+            return
+        newSchema = schema.withKey(k)
+        if newSchema is None:
+            self._toDict()
+            self.slots[k] = v
+            return
+        self.schema = newSchema
+        self.slots = self.slots + (v,)
+
+    def __delitem__(self, k):
+        if k not in self:
+            raise KeyError(k)
+        self._toDict()
+        del self.slots[k]
+
+    def clear(self):
+        if self.schema is None:
+            self.slots.clear()
+        else:
+            self.schema = self.schema.family.root
+            self.slots = ()
+
+    def __contains__(self, k):
+        schema = self.schema
+        return k in self.slots if schema is None else k in schema.slotOf
+
+    def __iter__(self):
+        return iter(self.slots if self.schema is None else self.schema.keys)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def keys(self):
+        return KeysView(self)
+
+    def values(self):
+        return SchemaValuesView(self)
+
+    def items(self):
+        return SchemaItemsView(self)
+
+    def copy(self) -> 'SchemaDict':
+        result = SchemaDict(self.schema)
+        result.slots = dict(self.slots) if self.schema is None else self.slots
+        return result
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class SchemaValuesView(ValuesView):
+    """
+    Live view of the values of a SchemaDict, as dict.values(). Iterates the slots without looking up each key
+    """
+    __slots__ = ()
+
+    def __iter__(self):
+        mapping = self._mapping
+        return iter(mapping.slots.values() if mapping.schema is None else mapping.slots)
+
+
+class SchemaItemsView(ItemsView):
+    """
+    Live view of the items of a SchemaDict, as dict.items(). Iterates the slots without looking up each key
+    """
+    __slots__ = ()
+
+    def __iter__(self):
+        mapping = self._mapping
+        return iter(mapping.slots.items()) if mapping.schema is None else zip(mapping.schema.keys, mapping.slots)
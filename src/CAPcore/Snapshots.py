@@ -0,0 +1,127 @@
+"""
+Copy-on-write snapshots of DictOfLoggedDict.
+
+A snapshot shares the records of the container: taking it is O(1) (it only keeps the attributes of the container).
+The container copies a record into its open snapshots the first time one of its methods is about to change it (see
+DictOfLoggedDict._touch, the same point transactions use), so each snapshot only holds copies of the records changed
+since it was taken. As with transactions, changes made directly on the records (getV(k).update(...)) are not seen by
+the container and show in the snapshots. compact() trims the histories of the shared records in place.
+
+The container keeps weak references to its snapshots: they stop costing copies when closed or discarded.
+"""
+from contextlib import nullcontext
+from copy import deepcopy
+from typing import Any, Dict, Optional
+
+from .LoggedDict import LoggedDictView
+from .LoggedValue import formatTimestamp
+
+
+class Snapshot:
+    """
+    Read-only view of a DictOfLoggedDict as it was when snapshot() was called. Reads are like those of the container
+    (get, items, values, keys, getV...)
+    """
+
+    def __init__(self, container):
+        self.container = container
+        # Copies of the records changed since the snapshot (None: the record didn't exist)
+        self.saved: Dict[Any, Optional[Any]] = {}
+        self.timestamp = container.timestamp
+        self.numChanges: int = container.numChanges
+        self.numLive: int = container.numLive
+        self.numDeleted: int = container.numDeleted
+        self.exclusions = frozenset(container.exclusions)
+        self.historyLength: int = len(container.history)
+        # Records of a ConcurrentDictOfLoggedDict are read with their lock
+        self.recordLock = getattr(container, 'recordLock', lambda k: nullcontext())
+        self.isOpen: bool = True
+        container.snapshots.add(self)
+
+    def save(self, k):
+        """
+        Keeps a copy of the record of k (or that it doesn't exist) before the container changes it for the first time
+        :param k: outer key
+        """
+        if k in self.saved:
+            return
+        record = self.container.current.get(k)
+        self.saved[k] = None if record is None else deepcopy(record)
+
+    def close(self):
+        """
+        Stops following the changes of the container. The snapshot can't be read afterwards
+        """
+        self.container.snapshots.discard(self)
+        self.isOpen = False
+        self.saved = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def _record(self, k):
+        if not self.isOpen:
+            raise ValueError("Snapshot is closed")
+        with self.recordLock(k):
+            if k in self.saved:
+                return self.saved[k]
+            return self.container.current.get(k)
+
+    def _liveRecords(self):
+        for k in list(self.container.current):
+            record = self._record(k)
+            if record is not None and not record.isDeleted():
+                yield k, record
+
+    def getV(self, key):
+        record = self._record(key)
+        if record is None:
+            raise KeyError(f"Unknown key '{key}'")
+        return record
+
+    def get(self, key, views: bool = False):
+        """
+        :param key: outer key
+        :param views: return a read-only view of the record (see LoggedDictView) instead of a copy as dict. Views (as
+                      getV) of records not changed yet are on the live record, they show its later changes
+        """
+        record = self.getV(key)
+        if record.isDeleted():
+            raise KeyError(f"Requested item is deleted '{key}'")
+        return LoggedDictView(record) if views else record._asdict()
+
+    __getitem__ = get
+
+    def __contains__(self, k):
+        record = self._record(k)
+        return record is not None and not record.isDeleted()
+
+    def __len__(self):
+        return self.numLive
+
+    def keys(self):
+        for k, _ in self._liveRecords():
+            yield k
+
+    def items(self, views: bool = False):
+        for k, record in self._liveRecords():
+            yield k, (LoggedDictView(record) if views else record._asdict())
+
+    def values(self, views: bool = False):
+        for _, record in self._liveRecords():
+            yield LoggedDictView(record) if views else record._asdict()
+
+    def _asdict(self):
+        return dict(self.items())
+
+    def history(self):
+        """
+        History entries of the container up to the snapshot
+        """
+        return self.container.history[:self.historyLength]
+
+    def __repr__(self):
+        return f"Snapshot({self._asdict()}) [t:{formatTimestamp(self.timestamp)} n:{self.numChanges}]"
@@ -0,0 +1,59 @@
+"""
+Bounded queues of change events, to follow the changes of a logged container (LoggedDict, DictData,
+DictOfLoggedDict) incrementally instead of polling its history and diffing it.
+
+A ChangeQueue is a change listener that keeps the ChangeEvents (key, subkey, action, timestamp, old and new value)
+until the consumer reads them. When it is full the oldest events are dropped and counted: a consumer that finds
+dropped events has lost track and must read the container again.
+"""
+from collections import deque
+from typing import List, Optional
+
+DEFAULTQUEUELENGTH = 10000
+
+
+class ChangeQueue:
+    def __init__(self, maxLength: Optional[int] = DEFAULTQUEUELENGTH):
+        """
+        :param maxLength: maximum number of events kept. None for no limit
+        """
+        if maxLength is not None and maxLength < 1:
+            raise ValueError(f"ChangeQueue: maxLength must be positive: {maxLength}")
+        self.events: deque = deque(maxlen=maxLength)
+        self.maxLength: Optional[int] = maxLength
+        self.numEvents: int = 0
+        self.dropped: int = 0
+
+    def __call__(self, event):
+        if self.maxLength is not None and len(self.events) == self.maxLength:
+            self.dropped += 1
+        self.events.append(event)
+        self.numEvents += 1
+
+    def get(self, maxEvents: Optional[int] = None) -> List:
+        """
+        Takes the oldest events out of the queue
+        :param maxEvents: maximum number of events returned. None for all of them
+        :return: the ChangeEvents, in the order they happened
+        """
+        numEvents = len(self.events) if maxEvents is None else min(maxEvents, len(self.events))
+        return [self.events.popleft() for _ in range(numEvents)]
+
+    def resetDropped(self) -> int:
+        """
+        Clears the count of dropped events (after the consumer has caught up with the container)
+        :return: the events dropped until now
+        """
+        result = self.dropped
+        self.dropped = 0
+        return result
+
+    def __len__(self):
+        return len(self.events)
+
+    def __bool__(self):
+        return bool(self.events)
+
+    def __repr__(self):
+        return f"ChangeQueue(pending={len(self.events)}, max={self.maxLength}, total={self.numEvents}, " \
+               f"dropped={self.dropped})"
@@ -0,0 +1,173 @@
+"""
+Diff of a DictOfLoggedDict against a columnar snapshot: a dict of equally long columns (lists, tuples or arrays) or
+a NumPy structured array, with one column holding the outer keys.
+
+Values are compared a column at a time (with NumPy if it is installed) and LoggedDictDiff objects are built only for
+the records that changed. The result is the same DictOfLoggedDictDiff that DictOfLoggedDict.diff returns, and
+applyTable applies it with DictOfLoggedDict.applyDiff.
+
+Each value still lives in its own LoggedValue, so it is read and compared in Python: a diff costs about the same as
+DictOfLoggedDict.diff with the rows already built as dicts. What it saves is building them (see
+benchmarks/tabularDiff.py).
+"""
+from collections.abc import Mapping
+from itertools import compress
+from operator import ne
+from time import struct_time
+from typing import Dict, List, Optional, Tuple
+
+from .DictLoggedDict import DictOfLoggedDict, DictOfLoggedDictDiff
+from .LoggedDict import LoggedDict, LoggedDictDiff
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+class _Missing:
+    """
+    Placeholder for a value the record doesn't have. Different from anything
+    """
+
+    def __eq__(self, other):
+        return False
+
+    def __ne__(self, other):
+        return True
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+def _asList(column) -> List:
+    # Arrays (NumPy or array.array) are converted in one call, which also turns NumPy scalars into Python objects
+    return column.tolist() if hasattr(column, 'tolist') else list(column)
+
+
+def tableColumns(table, keyColumn: str) -> Tuple[List, Dict[str, List]]:
+    """
+    Splits a columnar snapshot into the keys and the rest of the columns
+    :param table: dict of columns or NumPy structured array
+    :param keyColumn: name of the column with the outer keys
+    :return: (keys, {column name: values})
+    """
+    if getattr(getattr(table, 'dtype', None), 'names', None):
+        columns = {name: _asList(table[name]) for name in table.dtype.names}
+    elif isinstance(table, Mapping):
+        columns = {name: _asList(column) for name, column in table.items()}
+    else:
+        raise TypeError(f"Expected dict of columns or structured array, got '{type(table)}'")
+
+    if keyColumn not in columns:
+        raise KeyError(f"Key column '{keyColumn}' not in table: {sorted(columns)}")
+    keys = columns.pop(keyColumn)
+
+    wrongLengths = {name: len(column) for name, column in columns.items() if len(column) != len(keys)}
+    if wrongLengths:
+        raise ValueError(f"Columns with a length different from that of the keys ({len(keys)}): {wrongLengths}")
+    if len(set(keys)) != len(keys):
+        raise ValueError(f"Repeated keys in column '{keyColumn}'")
+
+    return keys, columns
+
+
+def differentMask(currentValues: List, newValues: List) -> List[bool]:
+    """
+    Element-wise comparison of two columns
+    :return: list with True where the values differ
+    """
+    if numpy is not None and currentValues:
+        # Filled after creation so values that are sequences are kept as single objects
+        currentArray = numpy.empty(len(currentValues), dtype=object)
+        currentArray[:] = currentValues
+        newArray = numpy.empty(len(newValues), dtype=object)
+        newArray[:] = newValues
+        return (currentArray != newArray).tolist()
+
+    return list(map(ne, currentValues, newValues))
+
+
+def diffTable(data: DictOfLoggedDict, table, keyColumn: str, doUpdate: bool = False) -> DictOfLoggedDictDiff:
+    """
+    Computes the changes a replace (or update) of data with the rows of table would make. Same result as
+    data.diff({key: row as dict}, doUpdate)
+    :param data: container to compare
+    :param table: dict of columns or NumPy structured array
+    :param keyColumn: name of the column with the outer keys
+    :param doUpdate: do an Update instead of a replace (columns missing from the table are not removed from records)
+    :return: a DictOfLoggedDictDiff
+    """
+    keys, columns = tableColumns(table, keyColumn)
+    result = DictOfLoggedDictDiff()
+
+    sharedRows = []
+    sharedRecords = []
+    for row, k in enumerate(keys):
+        record = data.current.get(k)
+        if record is None or record.isDeleted():
+            result.addKey(k, {name: column[row] for name, column in columns.items()})
+            continue
+        sharedRows.append(row)
+        sharedRecords.append(record)
+
+    recordDiffs: Dict[int, LoggedDictDiff] = {}
+    numMissing: Dict[int, int] = {}
+    allRows = len(sharedRows) == len(keys)
+
+    for name, column in columns.items():
+        newValues = column if allRows else [column[row] for row in sharedRows]
+        slots = [record.current.get(name) for record in sharedRecords]
+        # Attributes read directly: this is the loop that runs once per value
+        currentValues = [MISSING if (v is None or v.deleted) else v.value for v in slots]
+        for i in compress(range(len(sharedRows)), differentMask(currentValues, newValues)):
+            recordDiff = recordDiffs.setdefault(i, LoggedDictDiff())
+            if currentValues[i] is MISSING:
+                numMissing[i] = numMissing.get(i, 0) + 1
+                if name not in sharedRecords[i].exclusions:
+                    recordDiff.addKey(name, newValues[i])
+                continue
+            recordDiff.change(name, currentValues[i], newValues[i])
+
+    if not doUpdate:
+        # Only records with more live values than the columns they have can have values to remove
+        numColumns = len(columns)
+        for i, record in enumerate(sharedRecords):
+            if record.numLive == numColumns - numMissing.get(i, 0):
+                continue
+            for name, value in record.current.items():
+                if not value.deleted and name not in columns:
+                    recordDiffs.setdefault(i, LoggedDictDiff()).removeKey(name, value.value)
+
+    for i in sorted(recordDiffs):
+        result.addChange(keys[sharedRows[i]], recordDiffs[i])
+
+    keySet = set(keys)
+    for k, record in data.current.items():
+        if not record.isDeleted() and k not in keySet:
+            result.removeKey(k, record)
+
+    return result
+
+
+def applyTable(data: DictOfLoggedDict, table, keyColumn: str, timestamp: Optional[struct_time] = None,
+               doUpdate: bool = False) -> DictOfLoggedDictDiff:
+    """
+    Replaces (or updates) the contents of data with the rows of table, computing the changes with diffTable and
+    applying them in one go (see DictOfLoggedDict.applyDiff)
+    :param data: container to change
+    :param table: dict of columns or NumPy structured array
+    :param keyColumn: name of the column with the outer keys
+    :param timestamp: time of the changes
+    :param doUpdate: do an Update instead of a replace
+    :return: the changes made
+    """
+    result = diffTable(data, table, keyColumn, doUpdate=doUpdate)
+    data.applyDiff(result, timestamp=timestamp, doUpdate=doUpdate)
+
+    return result
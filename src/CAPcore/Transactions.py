@@ -0,0 +1,159 @@
+"""
+Transactions for LoggedDict, DictData and DictOfLoggedDict based on undo logs instead of copies.
+
+Histories only grow (compaction aside), so the state of a LoggedValue is saved as its attributes plus the length of
+its history, and restoring it truncates the history. A record (LoggedDict or DictData) is saved as a shallow copy of
+its dict of values plus the state of each value, so keys added later are dropped and renames undone.
+
+A DictOfLoggedDict transaction only saves the records it is told about (DictOfLoggedDict._touch, called by its
+methods before they change a record), so both starting it and rolling it back are O(records touched), not O(size).
+"""
+from typing import Any, Dict, Optional
+
+from .LoggedValue import CompactHistory
+
+
+def truncateHistory(history, length: int):
+    """
+    Drops the entries of a history (list or CompactHistory) from position length on
+    """
+    if isinstance(history, CompactHistory):
+        history.truncate(length)
+    else:
+        del history[length:]
+
+
+class RecordUndo:
+    """
+    Saved state of a LoggedDict or DictData (and its values)
+    """
+    __slots__ = ('target', 'current', 'values', 'counters', 'exclusions', 'extra')
+
+    def __init__(self, target):
+        self.target = target
+        self.current = target.current.copy()
+        self.values = [(v, v.last_updated, v.deleted, v.value, len(v.history)) for v in self.current.values()]
+        self.counters = (target.numLive, target.numDeleted)
+        self.exclusions = set(target.exclusions)
+        # DictData
+        self.extra = ((target.last_updated, target.deleted, len(target.history)) if hasattr(target, 'history')
+                      else None)
+
+    def restore(self):
+        target = self.target
+        target.current = self.current
+        for v, lastUpdated, deleted, value, historyLen in self.values:
+            v.last_updated = lastUpdated
+            v.deleted = deleted
+            v.value = value
+            truncateHistory(v.history, historyLen)
+        target.numLive, target.numDeleted = self.counters
+        target.exclusions = self.exclusions
+        if self.extra is not None:
+            target.last_updated, target.deleted, historyLen = self.extra
+            truncateHistory(target.history, historyLen)
+
+
+class Transaction:
+    """
+    Base of transactions: finished with commit() or rollback(). Used as a context manager, it commits at the end of
+    the block or rolls back if the block raises an exception.
+    """
+
+    def __init__(self):
+        self.isOpen: bool = True
+
+    def _finish(self):
+        if not self.isOpen:
+            raise ValueError("Transaction already finished")
+        self.isOpen = False
+
+    def commit(self):
+        self._finish()
+
+    def rollback(self):
+        self._finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if not self.isOpen:
+            return
+        if excType is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+class RecordTransaction(Transaction):
+    """
+    Transaction of a LoggedDict or DictData: its state is saved at the start (O(number of keys), histories are not
+    copied)
+    """
+
+    def __init__(self, target):
+        super().__init__()
+        self.undo: Optional[RecordUndo] = RecordUndo(target)
+
+    def commit(self):
+        super().commit()
+        self.undo = None
+
+    def rollback(self):
+        super().rollback()
+        self.undo.restore()
+        self.undo = None
+
+
+class ContainerTransaction(Transaction):
+    """
+    Transaction of a DictOfLoggedDict: saves the attributes of the container at the start and each record the first
+    time it is touched
+    """
+
+    def __init__(self, container):
+        super().__init__()
+        self.container = container
+        self.records: Dict[Any, Optional[RecordUndo]] = {}
+        self.state = (container.timestamp, container.numChanges, len(container.history), container.numLive,
+                      container.numDeleted, set(container.exclusions))
+        container.transaction = self
+
+    def touch(self, k):
+        """
+        Saves the state of a record (or that it doesn't exist) before it is changed for the first time
+        :param k: outer key
+        """
+        if k in self.records:
+            return
+        record = self.container.current.get(k)
+        self.records[k] = None if record is None else RecordUndo(record)
+
+    def _finish(self):
+        super()._finish()
+        self.container.transaction = None
+
+    def commit(self):
+        super().commit()
+        self.records = {}
+
+    def rollback(self):
+        super().rollback()
+        container = self.container
+        for k, undo in self.records.items():
+            if undo is None:
+                container.current.pop(k, None)
+                continue
+            undo.restore()
+            container.current[k] = undo.target
+
+        (container.timestamp, container.numChanges, historyLen, container.numLive, container.numDeleted,
+         container.exclusions) = self.state
+        truncateHistory(container.history, historyLen)
+        container._shareExclusions()
+
+        for index in container.indexes.values():
+            for k in self.records:
+                index.refresh(k, container.current.get(k))
+        self.records = {}
@@ -0,0 +1,22 @@
+from time import struct_time
+
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict
+
+TIME1 = struct_time((2024, 12, 13, 10, 4, 10, 4, 348, 0))
+TIME2 = struct_time((2024, 12, 14, 10, 4, 10, 5, 349, 0))
+
+
+def buildContainer(values: dict, purged=(), cls=DictOfLoggedDict, **kwargs):
+    """
+    Container (DictOfLoggedDict or a subclass) with values inserted at TIME1
+    :param values: {outer key: record}
+    :param purged: outer keys to delete after the insertion
+    :param cls: class of the container
+    :param kwargs: other parameters of the constructor
+    :return: the container
+    """
+    result = cls(timestamp=TIME1, **kwargs)
+    result.update(values, timestamp=TIME1)
+    if purged:
+        result.purge(*purged, timestamp=TIME1)
+    return result
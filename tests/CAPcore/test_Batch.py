@@ -0,0 +1,150 @@
+import unittest
+from time import struct_time
+
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict, DictData
+from src.CAPcore.LoggedDict import LoggedDict
+
+TIME1 = struct_time((2024, 12, 13, 10, 4, 10, 4, 348, 0))
+TIME2 = struct_time((2024, 12, 14, 10, 4, 10, 5, 349, 0))
+
+
+class TestBatch(unittest.TestCase):
+    def test_loggedDict(self):
+        d1 = LoggedDict(timestamp=TIME1)
+
+        with d1.batch(timestamp=TIME2) as d:
+            d['a'] = 1
+            d.update({'b': 2, 'c': 3})
+            d.purge('c')
+
+        self.assertIsNone(d1.batchState)
+        self.assertEqual(d1._asdict(), {'a': 1, 'b': 2})
+        self.assertTrue(all(v.last_updated == TIME2 for v in d1.valuesV()))
+
+    def test_loggedDictRollback(self):
+        d1 = LoggedDict(timestamp=TIME1)
+        d1.update({'a': 1}, timestamp=TIME1)
+
+        with self.assertRaises(RuntimeError):
+            with d1.batch(timestamp=TIME2, rollback=True):
+                d1['a'] = 2
+                d1['b'] = 3
+                raise RuntimeError("Failed")
+
+        self.assertEqual(d1._asdict(), {'a': 1})
+        self.assertEqual(len(d1), 1)
+        self.assertEqual(len(d1.getV('a').history), 1)
+
+    def test_dictData(self):
+        d1 = DictData(timestamp=TIME1)
+        numHistory = len(d1.history)
+
+        with d1.batch(timestamp=TIME2):
+            d1['a'] = 1
+            d1.update({'b': 2})
+            d1.update({'b': 2})
+            d1.purge('a')
+
+        self.assertEqual(len(d1.history), numHistory + 1)
+        self.assertEqual(d1.history[-1], (TIME2, "Batch: 3 changes"))
+        self.assertEqual(d1._asdict(), {'b': 2})
+
+        with d1.batch(timestamp=TIME2):
+            d1.update({'b': 2})
+        self.assertEqual(len(d1.history), numHistory + 1)
+
+    def test_dictDataRollback(self):
+        d1 = DictData(timestamp=TIME1)
+        d1.update({'a': 1}, timestamp=TIME1)
+        numHistory = len(d1.history)
+
+        with self.assertRaises(KeyError):
+            with d1.batch(rollback=True):
+                d1['a'] = 5
+                d1.delete()
+                raise KeyError('x')
+
+        self.assertFalse(d1.isDeleted())
+        self.assertEqual(d1._asdict(), {'a': 1})
+        self.assertFalse(d1.differs({'a': 1}))
+        self.assertEqual(len(d1.history), numHistory)
+
+    def test_dictOfLoggedDict(self):
+        d1 = DictOfLoggedDict(timestamp=TIME1)
+        d1.update({'x': {'a': 0}}, timestamp=TIME1)
+        numHistory = len(d1.history)
+        numChanges = d1.numChanges
+
+        with d1.batch(timestamp=TIME2):
+            for i in range(10):
+                d1[f"k{i}"] = {'a': i}
+            d1.update({'x': {'a': 1}})
+            d1.purge('k0')
+
+        self.assertEqual(len(d1.history), numHistory + 1)
+        self.assertEqual(d1.history[-1], (TIME2, "Batch: 12 changes"))
+        self.assertEqual(d1.numChanges, numChanges + 1)
+        self.assertEqual(d1.timestamp, TIME2)
+        self.assertEqual(len(d1), 10)
+        self.assertEqual(d1.getV('k1').getV('a').last_updated, TIME2)
+        self.assertEqual(d1.getV('x').getV('a').last_updated, TIME2)
+        self.assertEqual(d1.getV('k0').last_updated, TIME2)
+
+    def test_dictOfLoggedDictNoChanges(self):
+        d1 = DictOfLoggedDict(timestamp=TIME1)
+        d1.update({'x': {'a': 0}}, timestamp=TIME1)
+        numChanges = d1.numChanges
+
+        with d1.batch(timestamp=TIME2):
+            d1.update({'x': {'a': 0}})
+
+        self.assertEqual(d1.numChanges, numChanges)
+        self.assertEqual(d1.timestamp, TIME1)
+
+    def test_dictOfLoggedDictNested(self):
+        d1 = DictOfLoggedDict(timestamp=TIME1)
+
+        with d1.batch(timestamp=TIME2):
+            d1['a'] = {'a': 1}
+            with d1.batch(timestamp=TIME1):
+                d1['b'] = {'b': 1}
+
+        self.assertEqual(d1.numChanges, 1)
+        self.assertEqual(d1.getV('b').getV('b').last_updated, TIME2)
+
+    def test_dictOfLoggedDictRollback(self):
+        d1 = DictOfLoggedDict(timestamp=TIME1)
+        d1.update({'x': {'a': 0}, 'y': {'a': 1}}, timestamp=TIME1)
+        d1.addIndex('a')
+        events = []
+        d1.addChangeListener(events.append)
+        before = repr(d1)
+
+        with self.assertRaises(ValueError):
+            with d1.batch(timestamp=TIME2, rollback=True):
+                d1.update({'x': {'a': 5}, 'z': {'a': 5}})
+                d1.purge('y')
+                raise ValueError("Failed")
+
+        self.assertEqual(repr(d1), before)
+        self.assertTrue(d1.checkCounters())
+        self.assertIsNone(d1.batchState)
+        self.assertEqual(d1.find(a=1), {'y'})
+        self.assertEqual(d1.find(a=5), set())
+
+        events.clear()
+        d1['x'] = {'a': 7}
+        self.assertEqual(len(events), 1)
+        self.assertEqual(d1.find(a=7), {'x'})
+
+    def test_dictOfLoggedDictNoRollback(self):
+        d1 = DictOfLoggedDict(timestamp=TIME1)
+
+        with self.assertRaises(ValueError):
+            with d1.batch(timestamp=TIME2):
+                d1['a'] = {'a': 1}
+                raise ValueError("Failed")
+
+        self.assertEqual(d1._asdict(), {'a': {'a': 1}})
+        self.assertEqual(d1.numChanges, 1)
+        self.assertEqual(d1.history[-1], (TIME2, "Batch: 1 changes"))
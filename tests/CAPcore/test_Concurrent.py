@@ -0,0 +1,193 @@
+import pickle
+import unittest
+from threading import Event, Thread
+
+from src.CAPcore.Concurrent import ConcurrentDictOfLoggedDict, ConcurrentTransaction
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict
+from tests.CAPcore.common import TIME1, TIME2
+
+NUMTHREADS = 4
+NUMROUNDS = 50
+NUMKEYS = 40
+
+
+def runThreads(*targets):
+    """
+    Runs each target in a thread and waits for all of them. Raises the first exception raised in a thread
+    """
+    errors = []
+
+    def run(target):
+        try:
+            target()
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            errors.append(exc)
+
+    threads = [Thread(target=run, args=(target,)) for target in targets]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+
+
+class TestConcurrent(unittest.TestCase):
+    def test_sequential(self):
+        d1 = ConcurrentDictOfLoggedDict(timestamp=TIME1, numStripes=4)
+        d2 = DictOfLoggedDict(timestamp=TIME1)
+        for d in (d1, d2):
+            d.update({'a': {'x': 1}, 'b': {'x': 2}, 'c': {'x': 3}}, timestamp=TIME1)
+            d['d'] = {'x': 4}
+            d.purge('b', timestamp=TIME2)
+            d.pop('c', timestamp=TIME2)
+
+        self.assertEqual(d1._asdict(), d2._asdict())
+        self.assertEqual(list(d1.items()), list(d2.items()))
+        self.assertEqual(list(d1.keys()), ['a', 'd'])
+        self.assertEqual(d1.get('a'), {'x': 1})
+        self.assertEqual(d1['d'], {'x': 4})
+        self.assertEqual(d1.numChanges, d2.numChanges)
+        self.assertFalse(d1.differs(d2))
+        self.assertTrue(d1.checkCounters())
+
+        with self.assertRaises(ValueError):
+            d1.get('a', views=True)
+        with self.assertRaises(ValueError):
+            ConcurrentDictOfLoggedDict(numStripes=0)
+
+    def test_batch(self):
+        d1 = ConcurrentDictOfLoggedDict(timestamp=TIME1)
+
+        with d1.batch(timestamp=TIME2):
+            d1['a'] = {'x': 1}
+            d1.update({'b': {'x': 2}})
+
+        self.assertEqual(d1.numChanges, 1)
+        self.assertEqual(d1.history[-1], (TIME2, "Batch: 2 changes"))
+
+        with self.assertRaises(KeyError):
+            with d1.batch(rollback=True):
+                d1['a'] = {'x': 5}
+                raise KeyError('a')
+        self.assertEqual(d1['a'], {'x': 1})
+
+    def test_concurrentWriters(self):
+        d1 = ConcurrentDictOfLoggedDict(timestamp=TIME1, numStripes=8)
+
+        def writer(n):
+            def run():
+                for r in range(NUMROUNDS):
+                    for i in range(NUMKEYS):
+                        d1.update({f"k{i}": {f"t{n}": r}})
+                        if i % 10 == n:
+                            d1.purge(f"k{i}")
+
+            return run
+
+        runThreads(*[writer(n) for n in range(NUMTHREADS)])
+
+        self.assertTrue(d1.checkCounters())
+        self.assertEqual(d1.lenV(), NUMKEYS)
+        for k, v in d1.itemsV():
+            self.assertEqual(set(v.current.keys()), {f"t{n}" for n in range(NUMTHREADS)}, k)
+
+    def test_sameKeyEpoch(self):
+        d1 = ConcurrentDictOfLoggedDict(epochTimestamps=True)
+
+        def writer(n):
+            def run():
+                for r in range(NUMROUNDS * 20):
+                    d1.update({'shared': {'a': r, f"t{n}": r}})
+                    if r % 7 == n:
+                        d1.purge('shared')
+
+            return run
+
+        runThreads(*[writer(n) for n in range(NUMTHREADS)])
+
+        self.assertTrue(d1.checkCounters())
+        record = d1.getV('shared')
+        self.assertEqual(set(record.current.keys()), {'a'} | {f"t{n}" for n in range(NUMTHREADS)})
+        for v in record.current.values():
+            times = [entry[1] for entry in v.history]
+            self.assertEqual(times, sorted(times))
+
+    def test_readersWhileWriting(self):
+        d1 = ConcurrentDictOfLoggedDict(timestamp=TIME1)
+        d1.update({f"k{i}": {'a': 0, 'b': 0} for i in range(NUMKEYS)})
+        errors = []
+
+        def writer():
+            for r in range(1, NUMROUNDS):
+                for i in range(NUMKEYS):
+                    d1[f"k{i}"] = {'a': r, 'b': r}
+                d1[f"new{r}"] = {'a': r, 'b': r}
+
+        def reader():
+            try:
+                for _ in range(NUMROUNDS):
+                    for k, v in d1.items():
+                        if v['a'] != v['b']:
+                            errors.append((k, v))
+                    for v in d1.values():
+                        if v['a'] != v['b']:
+                            errors.append(v)
+                    d1.get('k0')
+            except Exception as exc:  # pragma: no cover
+                errors.append(exc)
+
+        runThreads(writer, reader, reader)
+
+        self.assertEqual(errors, [])
+        self.assertTrue(d1.checkCounters())
+        self.assertEqual(len(d1), NUMKEYS + NUMROUNDS - 1)
+
+    def test_transactionWaitsForWriters(self):
+        d1 = ConcurrentDictOfLoggedDict(timestamp=TIME1)
+        d1.update({'a': {'x': 1}, 'b': {'x': 1}})
+        locked = Event()
+        release = Event()
+        finished = Event()
+
+        def writer():
+            # Holds the lock of 'b' as a writer in the middle of a change would
+            with d1.recordLock('b'):
+                locked.set()
+                release.wait()
+
+        def rollback():
+            transaction.rollback()
+            finished.set()
+
+        transaction = d1.begin()
+        self.assertIsInstance(transaction, ConcurrentTransaction)
+        d1['a'] = {'x': 2}
+
+        threads = [Thread(target=writer), Thread(target=rollback)]
+        threads[0].start()
+        locked.wait()
+        threads[1].start()
+        self.assertFalse(finished.wait(0.2))
+        release.set()
+        for t in threads:
+            t.join()
+
+        self.assertTrue(finished.is_set())
+        self.assertEqual(d1['a'], {'x': 1})
+        self.assertIsNone(d1.transaction)
+        self.assertTrue(d1.checkCounters())
+
+        with self.assertRaises(ValueError):
+            with d1.begin():
+                d1.begin()
+
+    def test_pickle(self):
+        d1 = ConcurrentDictOfLoggedDict(timestamp=TIME1, numStripes=3)
+        d1.update({'a': {'x': 1}}, timestamp=TIME1)
+
+        d2 = pickle.loads(pickle.dumps(d1))
+        self.assertEqual(len(d2.stripes), 3)
+        self.assertEqual(d2._asdict(), {'a': {'x': 1}})
+        d2['b'] = {'x': 2}
+        self.assertEqual(len(d2), 2)
@@ -1,7 +1,8 @@
+import pickle
 import unittest
 from time import struct_time
 
-from src.CAPcore.DictLoggedDict import DictOfLoggedDict, LoggedDict, DictData
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict, LoggedDict, DictData, UpdateRecord
 
 
 class TestDictData(unittest.TestCase):
@@ -73,3 +74,64 @@ class TestDictData(unittest.TestCase):
 
         self.assertIsInstance(r3, DictData)
         self.assertIsInstance(r3, LoggedDict)
+
+    def test_slots1(self):
+        d1 = DictData()
+        d1.update({'a': 1, 'b': 2})
+
+        self.assertFalse(hasattr(d1, '__dict__'))
+
+        d2 = pickle.loads(pickle.dumps(d1))
+        self.assertIsInstance(d2, DictData)
+        self.assertEqual(d2, d1)
+        self.assertEqual(len(d2.history), len(d1.history))
+        self.assertEqual(d2.last_updated, d1.last_updated)
+
+    def test_history1(self):
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        time2 = struct_time((2024, 12, 13, 23, 4, 44, 4, 348, 0))
+
+        d1 = DictData(timestamp=time1)
+        d1.update({'a': 1}, timestamp=time2)
+
+        self.assertEqual(len(d1.history), 2)
+        self.assertEqual(d1.history[-1][0], time2)
+        self.assertIn("'a': A '1'", str(d1.history[-1][1]))
+
+    def test_history2(self):
+        d1 = DictData()
+        d1.update({'a': 1, 'b': 2})
+        d1['a'] = 3
+        d1.purge('b')
+
+        self.assertIsInstance(d1.history[1][1], UpdateRecord)
+        self.assertEqual(d1.history[1][1], "Updated data 'a': A '1', 'b': A '2'")
+        self.assertEqual(str(d1.history[2][1]), "Updated data __setitem__ kargs=('a', 3) kwargs={}")
+        self.assertEqual(len(d1.history), 4)
+        self.assertEqual(d1.history[1][1].kargs, ())
+
+        keys = ['a']
+        d1.purge(keys)
+        keys.append('c')
+        self.assertEqual(str(d1.history[4][1]), "Updated data purge kargs=(['a'],) kwargs={}")
+
+    def test_keepHistory1(self):
+        d1 = DictData(keepHistory=False)
+        d1.update({'a': 1, 'b': 2})
+        d1.purge('b')
+        d1.delete()
+
+        self.assertEqual(len(d1.history), 0)
+        self.assertEqual(len(d1.getV('a')), 1)
+
+        d2 = DictOfLoggedDict(keepHistory=False)
+        d2.update({'a': {'a1': 1}})
+        d2['b'] = {'b1': 1}
+        self.assertEqual(len(d2.history), 0)
+        self.assertEqual(len(d2.getV('a').history), 0)
+
+        d2.setKeepHistory(True)
+        d2.update({'a': {'a1': 2}})
+        self.assertEqual(len(d2.history), 1)
+        self.assertEqual(len(d2.getV('a').history), 1)
+
@@ -1,11 +1,24 @@
+import pickle
 import unittest
 from time import struct_time
 
 from src.CAPcore.DictLoggedDict import DictOfLoggedDict, DictData
 from src.CAPcore.LoggedDict import LoggedDict
+from src.CAPcore.LoggedValue import CompactHistory
 from src.CAPcore.Misc import SetDiff
 
 
+class SameRepr:
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, SameRepr) and self.value == other.value
+
+    def __repr__(self):
+        return "SameRepr"
+
+
 class TestDictLoggedDict(unittest.TestCase):
     def test_constructor1(self):
         d1 = DictOfLoggedDict()
@@ -649,3 +662,228 @@ class TestDictLoggedDict(unittest.TestCase):
         self.assertTrue(r1)
         self.assertFalse(r2)
         self.assertFalse(r3)
+
+    def test_epoch1(self):
+        time0 = struct_time((2024, 12, 13, 23, 4, 24, 4, 348, 0))
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        dAux1 = {'a1': 1, 'a2': 'ce'}
+        di1 = {'a': dAux1, 'b': dAux1}
+
+        d1 = DictOfLoggedDict(timestamp=time0)
+        d1.update(newValues=di1, timestamp=time1)
+        d2 = DictOfLoggedDict(timestamp=time0, epochTimestamps=True)
+        d2.update(newValues=di1, timestamp=time1)
+
+        self.assertIsInstance(d2.timestamp, int)
+        self.assertIsInstance(d2.getV('a').last_updated, int)
+        self.assertIsInstance(d2.getV('a').getV('a1').last_updated, int)
+        self.assertEqual(repr(d2.getV('a')), repr(d1.getV('a')))
+        self.assertEqual(d2.buildMetadataStr(), d1.buildMetadataStr())
+
+        d2.update({'c': dAux1})
+        self.assertIsInstance(d2.getV('c').getV('a1').last_updated, int)
+        self.assertFalse(d2.diff(d1._asdict() | {'c': dAux1}))
+
+    def test_compactHistory1(self):
+        time0 = struct_time((2024, 12, 13, 23, 4, 24, 4, 348, 0))
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        dAux1 = {'a1': 1, 'a2': 'ce'}
+
+        d1 = DictOfLoggedDict(timestamp=time0)
+        d1.update({'a': dAux1}, timestamp=time0)
+        d2 = DictOfLoggedDict(timestamp=time0, compactHistory=True)
+        d2.update({'a': dAux1}, timestamp=time0)
+        d2.getV('a')['a3'] = 5
+        d2.update({'a': {'a1': 2}}, timestamp=time1)
+        d1.getV('a')['a3'] = 5
+        d1.update({'a': {'a1': 2}}, timestamp=time1)
+        d3 = DictOfLoggedDict.fromIterable({'a': dAux1}, compactHistory=True)
+
+        self.assertIsInstance(d2.getV('a').getV('a1').history, CompactHistory)
+        self.assertIsInstance(d2.getV('a').getV('a3').history, CompactHistory)
+        self.assertIsInstance(d3.getV('a').getV('a1').history, CompactHistory)
+        self.assertNotIsInstance(d1.getV('a').getV('a1').history, CompactHistory)
+        self.assertEqual(d2.getV('a').getV('a1').history, d1.getV('a').getV('a1').history)
+        self.assertEqual(repr(d2.getV('a')), repr(d1.getV('a')))
+
+        d4 = pickle.loads(pickle.dumps(d2))
+        d4.update({'b': dAux1})
+        self.assertIsInstance(d4.getV('b').getV('a1').history, CompactHistory)
+
+    def test_counters1(self):
+        d1 = DictOfLoggedDict()
+        dAux1 = {'a1': 1, 'a2': 'ce'}
+
+        d1.update({'a': dAux1, 'b': dAux1, 'c': dAux1, 'e': {}})
+        d1['d'] = dAux1
+        self.assertEqual(len(d1), 4)
+
+        d1.purge('a', 'b')
+        d1.pop('c')
+        self.assertEqual(len(d1), 1)
+        self.assertEqual(d1.numDeleted, 3)
+
+        d1.update({'a': dAux1})
+        d1.replace({'a': dAux1, 'b': dAux1})
+        self.assertEqual(len(d1), 2)
+        self.assertEqual(d1.numDeleted, 2)
+        self.assertEqual(len(d1), len(list(d1.keys())))
+        self.assertTrue(d1.checkCounters())
+
+        d1.getV('a').delete()
+        d1.getV('c').restore()
+        d1.getV('b').getV('a1').clear()
+        self.assertEqual(len(d1), 2)
+        self.assertEqual(len(d1.getV('b')), 1)
+        self.assertTrue(d1.checkCounters())
+
+        d2 = pickle.loads(pickle.dumps(d1))
+        d2.getV('b').delete()
+        d2.getV('c').getV('a2').clear()
+        self.assertEqual(len(d2), 1)
+        self.assertEqual(len(d2.getV('c')), 1)
+        self.assertEqual(len(d1), 2)
+        self.assertTrue(d2.checkCounters())
+        self.assertTrue(d1.checkCounters())
+
+    def test_differs1(self):
+        d1 = DictOfLoggedDict()
+        dAux1 = {'a1': 1, 'a2': 'ce'}
+        dAux2 = {'a1': 1, 'a2': 'de'}
+        d1.update({'a': dAux1, 'b': dAux1, 'c': dAux1})
+        d1.purge('c')
+        d2 = DictOfLoggedDict()
+        d2.update({'a': dAux1, 'b': dAux1})
+
+        cases = [{'a': dAux1, 'b': dAux1}, {'a': dAux1}, {'a': dAux1, 'b': dAux2}, {'a': dAux1, 'b': {'a1': 1}},
+                 {'a': dAux1, 'b': dAux1, 'c': dAux1}, {}, d1, d2]
+        for other in cases:
+            for doUpdate in (False, True):
+                self.assertEqual(d1.differs(other, doUpdate=doUpdate), bool(d1.diff(other, doUpdate=doUpdate)),
+                                 msg=f"{other} {doUpdate}")
+
+        self.assertEqual(d1, d2)
+        self.assertNotEqual(d1, {'a': dAux1})
+        self.assertNotEqual(d1, None)
+        self.assertIn(d1, [1, d1])
+        self.assertEqual(len({d1, d2}), 2)
+
+        d2.getV('b').delete()
+        d1.getV('a').getV('a1').clear()
+        for other in ({'a': dAux1}, {'a': {'a2': 'ce'}}, {'a': {'a2': 'ce'}, 'b': dAux1}):
+            self.assertEqual(d1.differs(other), bool(d1.diff(other)))
+            self.assertEqual(d2.differs(other), bool(d2.diff(other)))
+            self.assertEqual(d2.getV('a').differs(other['a']), bool(d2.getV('a').diff(other['a'])))
+        self.assertEqual(d2, {'a': dAux1})
+        self.assertEqual(d1.getV('a'), {'a2': 'ce'})
+
+    def test_fromIterable1(self):
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        dAux1 = {'a1': 1, 'a2': 'ce', 'x': 3}
+        source = [('a', dAux1), ('b', dAux1), ('c', {}), ('b', {'a3': 5})]
+
+        d1 = DictOfLoggedDict.fromIterable(iter(source), timestamp=time1, exclusions={'x'})
+        d2 = DictOfLoggedDict(timestamp=time1, exclusions={'x'})
+        for k, v in source:
+            d2.update({k: v}, timestamp=time1)
+
+        self.assertEqual(d1, d2)
+        self.assertEqual(len(d1), 2)
+        self.assertTrue(d1.checkCounters())
+        self.assertEqual(d1.numChanges, 1)
+        self.assertEqual(len(d1.history), 2)
+        self.assertEqual(d1.history[-1], (time1, "Bulk load: 2 records"))
+        self.assertEqual(repr(d1.getV('b').getV('a1')), "1 [t:2024-12-13 23:04:34+0000 l:1]")
+        self.assertEqual(len(d1.getV('b').history), 1)
+
+        d3 = DictOfLoggedDict.fromIterable(d1)
+        self.assertEqual(d3, d1)
+
+    def test_replaceSkipsUnchanged(self):
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        time2 = struct_time((2024, 12, 14, 23, 4, 34, 5, 349, 0))
+        source = {'a': {'a1': 1}, 'b': {'b1': 2}, 'c': {'c1': 3}}
+        d1 = DictOfLoggedDict.fromIterable(source, timestamp=time1)
+        historyA = len(d1.getV('a').history)
+
+        self.assertFalse(d1.replace(source, timestamp=time2))
+        self.assertTrue(d1.replace({'a': {'a1': 1}, 'b': {'b1': 5}}, timestamp=time2))
+
+        self.assertEqual(d1._asdict(), {'a': {'a1': 1}, 'b': {'b1': 5}})
+        self.assertEqual(len(d1.getV('a').history), historyA)
+        self.assertTrue(d1.checkCounters())
+
+        self.assertFalse(d1.__setitem__('a', {'a1': 1}, timestamp=time2))
+        self.assertFalse(d1.update({'a': {'a1': 1}}, timestamp=time2))
+        self.assertEqual(len(d1.getV('a').history), historyA)
+
+        # Same repr, different contents
+        d2 = DictOfLoggedDict()
+        d2.update({'a': {'x': SameRepr(1)}, 'b': {'x': SameRepr(1)}})
+        self.assertTrue(d2.update({'a': {'x': SameRepr(2)}}))
+        self.assertEqual(d2.getV('a')['x'].value, 2)
+        self.assertTrue(d2.replace({'a': {'x': SameRepr(2)}, 'b': {'x': SameRepr(3)}}))
+        self.assertEqual(d2.getV('b')['x'].value, 3)
+
+        # Changed directly on the value
+        d1.getV('a').getV('a1').set(2)
+        self.assertTrue(d1.replace({'a': {'a1': 1}, 'b': {'b1': 5}}))
+        self.assertEqual(d1['a'], {'a1': 1})
+
+    def test_views(self):
+        d1 = DictOfLoggedDict()
+        d1.update({'a': {'a1': 1}, 'b': {'b1': 2}, 'c': {'c1': 3}})
+        d1.purge('c')
+
+        view = d1.get('a', views=True)
+        self.assertEqual(view, {'a1': 1})
+        d1.update({'a': {'a2': 2}})
+        self.assertEqual(view, {'a1': 1, 'a2': 2})
+
+        self.assertEqual(dict(d1.items(views=True)), d1._asdict())
+        self.assertEqual(list(d1.values(views=True)), list(d1.values()))
+        self.assertEqual(d1.getV('b').view()['b1'], 2)
+        with self.assertRaises(ValueError):
+            d1.getV('c').view()
+        with self.assertRaises(KeyError):
+            d1.get('c', views=True)
+        self.assertEqual(d1.subkeys(), {'a1', 'a2', 'b1'})
+        self.assertEqual(d1.extractKey('a1'), {'a': 1, 'b': None})
+
+    def test_changesSince1(self):
+        d1 = DictOfLoggedDict()
+        self.assertEqual(d1.changesSince(), ({}, 0))
+        d1.update({'a': {'a1': 1}, 'b': {'b1': 2}, 'c': {'c1': 3}})
+
+        changes, cursor = d1.changesSince()
+        self.assertEqual(changes, {'a': {'a1': 1}, 'b': {'b1': 2}, 'c': {'c1': 3}})
+
+        self.assertEqual(d1.changesSince(cursor), ({}, cursor))
+        d1.update({'a': {'a1': 1}})
+        self.assertEqual(d1.changesSince(cursor), ({}, cursor))
+
+        d1['b'] = {'b1': 5}
+        d1.purge('a')
+        d1.update({'d': {'d1': 4}})
+        d1['b'] = {'b1': 6}
+        changes, cursor2 = d1.changesSince(cursor)
+        self.assertEqual(list(changes), ['a', 'd', 'b'])
+        self.assertEqual(changes, {'a': None, 'd': {'d1': 4}, 'b': {'b1': 6}})
+        self.assertGreater(cursor2, cursor)
+        self.assertEqual(list(d1.changesSince(cursor2 - 1)[0]), ['b'])
+
+        with self.assertRaises(ValueError):
+            d1.changesSince(cursor2 + 1)
+
+    def test_changesSince2(self):
+        d1 = DictOfLoggedDict.fromIterable({'a': {'a1': 1}, 'b': {'b1': 2}})
+        self.assertEqual(list(d1.changesSince()[0]), ['a', 'b'])
+        _, cursor = d1.changesSince()
+
+        d1.applyDiff(d1.diff({'a': {'a1': 5}, 'c': {'c1': 3}}))
+        self.assertEqual(d1.changesSince(cursor)[0], {'a': {'a1': 5}, 'c': {'c1': 3}, 'b': None})
+        _, cursor = d1.changesSince()
+
+        d2 = pickle.loads(pickle.dumps(d1))
+        d2.pop('a')
+        self.assertEqual(d2.changesSince(cursor), ({'a': None}, cursor + 1))
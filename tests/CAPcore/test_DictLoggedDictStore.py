@@ -0,0 +1,147 @@
+import os
+import tempfile
+import unittest
+from time import struct_time
+
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict
+from src.CAPcore.DictLoggedDictStore import saveChunked, loadChunked, loadRecord, LazyRecords, DictOfLoggedDictView
+
+
+class TestDictLoggedDictStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpDir.name, "data.dold")
+
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        self.data = DictOfLoggedDict(timestamp=time1, exclusions={'x'})
+        self.data.update({f"k{i}": {'a1': i, 'a2': 'ce'} for i in range(10)}, timestamp=time1)
+        self.data.purge('k9')
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_saveLoad1(self):
+        r1 = saveChunked(self.data, self.filename)
+        d1 = loadChunked(self.filename)
+
+        self.assertEqual(r1, 10)
+        self.assertIsInstance(d1.current, LazyRecords)
+        self.assertEqual(d1.current.numLoaded(), 0)
+        self.assertEqual(len(d1), 9)
+        self.assertEqual(d1.lenV(), 10)
+        self.assertIn('k1', d1.current)
+        self.assertEqual(d1.current.numLoaded(), 0)
+
+        self.assertDictEqual(d1['k1'], {'a1': 1, 'a2': 'ce'})
+        self.assertEqual(d1.current.numLoaded(), 1)
+        self.assertEqual(d1.exclusions, {'x'})
+        self.assertEqual(d1.history, self.data.history)
+        self.assertEqual(d1.timestamp, self.data.timestamp)
+
+        self.assertEqual(d1, self.data)
+        self.assertEqual(repr(d1), repr(self.data))
+
+        d1.getV('k2').delete()
+        self.assertEqual(len(d1), 8)
+        self.assertTrue(d1.checkCounters())
+
+    def test_saveLoad2(self):
+        saveChunked(self.data, self.filename)
+        d1 = loadChunked(self.filename, lazy=False)
+
+        self.assertIsInstance(d1.current, dict)
+        self.assertEqual(d1, self.data)
+        self.assertEqual(repr(loadRecord(self.filename, 'k3')), repr(self.data.getV('k3')))
+
+    def test_incremental1(self):
+        saveChunked(self.data, self.filename)
+        size1 = os.path.getsize(self.filename)
+
+        d1 = loadChunked(self.filename)
+        d1.get('k2')
+        d1.update({'k1': {'a1': 100}, 'k10': {'a1': 10}})
+        r1 = saveChunked(d1, self.filename, incremental=True)
+        size2 = os.path.getsize(self.filename)
+
+        self.assertEqual(r1, 2)
+        self.assertGreater(size2, size1)
+
+        d2 = loadChunked(self.filename)
+        self.assertEqual(d2, d1)
+        self.assertEqual(len(d2), 10)
+        self.assertDictEqual(d2['k1'], {'a1': 100, 'a2': 'ce'})
+
+        r2 = saveChunked(d2, self.filename, incremental=True)
+        self.assertEqual(r2, 0)
+        r3 = saveChunked(d2, self.filename)
+        self.assertEqual(r3, 11)
+        self.assertLess(os.path.getsize(self.filename), size2)
+        self.assertEqual(loadChunked(self.filename), d1)
+
+    def test_incremental2(self):
+        saveChunked(self.data, self.filename)
+        d1 = loadChunked(self.filename)
+        d1.update({'k1': {'a1': 100}})
+        saveChunked(d1, self.filename, incremental=True)
+        size1 = os.path.getsize(self.filename)
+        expected = d1._asdict()
+
+        # Interrupted incremental saves: part of the tail (or only the records) was written
+        d1.update({'k2': {'a1': 200}})
+        saveChunked(d1, self.filename, incremental=True)
+        for cut in (1, 10, 100):
+            with open(self.filename, "r+b") as handle:
+                handle.truncate(os.path.getsize(self.filename) - cut)
+            d2 = loadChunked(self.filename)
+            self.assertEqual(d2._asdict(), expected)
+            self.assertEqual(len(d2), 9)
+
+        # A later incremental save appends after the incomplete tail
+        d2.update({'k3': {'a1': 300}})
+        saveChunked(d2, self.filename, incremental=True)
+        self.assertGreater(os.path.getsize(self.filename), size1)
+        self.assertDictEqual(loadChunked(self.filename)._asdict(), d2._asdict())
+
+        with open(self.filename, "r+b") as handle:
+            handle.truncate(20)
+        with self.assertRaises(ValueError):
+            loadChunked(self.filename)
+
+    def test_lazyKeys(self):
+        saveChunked(self.data, self.filename)
+        d1 = loadChunked(self.filename)
+
+        self.assertEqual(list(d1.keys()), list(self.data.keys()))
+        self.assertEqual(d1.current.numLoaded(), 0)
+        d1.pop('k1')
+        d1.update({'k9': {'a1': 9}, 'k10': {'a1': 10}})
+        self.assertEqual(set(d1.keys()), set(self.data.keys()) - {'k1'} | {'k9', 'k10'})
+        self.assertEqual(d1.current.numLoaded(), 3)
+
+    def test_badFile1(self):
+        with open(self.filename, "wb") as handle:
+            handle.write(b"0" * 100)
+
+        with self.assertRaises(ValueError):
+            loadChunked(self.filename)
+
+    def test_view1(self):
+        saveChunked(self.data, self.filename)
+
+        with DictOfLoggedDictView(self.filename) as v1:
+            self.assertEqual(len(v1), 9)
+            self.assertEqual(v1.lenV(), 10)
+            self.assertEqual(set(v1.keys()), set(self.data.keys()))
+            self.assertNotIn('k9', v1)
+            self.assertDictEqual(v1.get('k1'), self.data.get('k1'))
+            self.assertDictEqual(v1['k2'], self.data['k2'])
+            self.assertDictEqual(dict(v1.items()), self.data._asdict())
+            self.assertEqual(v1.subkeys(), self.data.subkeys())
+            self.assertDictEqual(v1.extractKey('a1'), self.data.extractKey('a1'))
+            self.assertTrue(v1.getV('k9').isDeleted())
+            self.assertEqual(v1.history, self.data.history)
+
+            with self.assertRaises(KeyError):
+                v1.get('k9')
+            with self.assertRaises(KeyError):
+                v1.get('z')
@@ -0,0 +1,122 @@
+import pickle
+import unittest
+
+from src.CAPcore.Indexes import SubkeyIndex
+from tests.CAPcore.common import buildContainer
+
+PLAYERS = {'a': {'team': 'RMA', 'pos': 'G'},
+           'b': {'team': 'FCB', 'pos': 'F'},
+           'c': {'team': 'RMA', 'pos': 'F'},
+           'd': {'pos': 'C'}}
+
+
+class TestSubkeyIndex(unittest.TestCase):
+    def test_setDiscard(self):
+        index = SubkeyIndex('x')
+        index.set('a', 1)
+        index.set('b', 1)
+        index.set('c', [1, 2])
+
+        self.assertEqual(index.find(1), {'a', 'b'})
+        self.assertEqual(index.find([1, 2]), {'c'})
+        self.assertEqual(len(index), 3)
+
+        index.set('a', 2)
+        index.discard('b')
+        index.discard('b')
+        index.discard('c')
+
+        self.assertEqual(index.find(1), set())
+        self.assertEqual(index.find(2), {'a'})
+        self.assertEqual(index.buckets, {2: {'a'}})
+        self.assertEqual(index.unhashable, set())
+
+
+class TestDictOfLoggedDictIndexes(unittest.TestCase):
+    def test_find1(self):
+        d1 = buildContainer(PLAYERS)
+        d1.addIndex('team')
+
+        self.assertEqual(d1.find(team='RMA'), {'a', 'c'})
+        self.assertEqual(d1.find(team='RMA', pos='F'), {'c'})
+        self.assertEqual(d1.find({'pos': 'C'}), {'d'})
+        self.assertEqual(d1.find(team='XXX'), set())
+        with self.assertRaises(ValueError):
+            d1.find()
+
+    def test_maintenance(self):
+        d1 = buildContainer(PLAYERS)
+        d1.addIndex('team')
+        d1.addIndex('pos')
+
+        d1.update({'b': {'team': 'RMA'}, 'e': {'team': 'FCB', 'pos': 'G'}})
+        self.assertEqual(d1.find(team='RMA'), {'a', 'b', 'c'})
+        self.assertEqual(d1.find(team='FCB'), {'e'})
+
+        d1['c'] = {'pos': 'F'}
+        self.assertEqual(d1.find(team='RMA'), {'a', 'b'})
+
+        d1.purge('a')
+        self.assertEqual(d1.find(team='RMA'), {'b'})
+        self.assertEqual(d1.find(pos='G'), {'e'})
+
+        d1.update({'a': {'team': 'RMA'}})
+        self.assertEqual(d1.find(team='RMA'), {'a', 'b'})
+        self.assertEqual(d1.find(pos='G'), {'a', 'e'})
+
+        d1.pop('e')
+        d1.getV('b').purge('team')
+        self.assertEqual(d1.find(team='RMA'), {'a'})
+        self.assertEqual(d1.find(team='FCB'), set())
+
+        d1.replace({'x': {'team': 'RMA'}})
+        self.assertEqual(d1.find(team='RMA'), {'x'})
+        self.assertEqual(d1.find(pos='F'), set())
+
+    def test_recordsNotInserted(self):
+        d1 = buildContainer({})
+        d1.addIndex('a')
+
+        # Records that would stay empty are not inserted, nor indexed
+        d1.replace({'s': {'a': None}})
+        d1.update({'t': {'a': None}})
+        self.assertNotIn('s', d1.current)
+        self.assertEqual(d1.find(a=None), set())
+        self.assertEqual(d1.find(a=None, b=1), set())
+        self.assertEqual(len(d1.indexes['a']), 0)
+
+        d1.update({'t': {'a': 1}})
+        self.assertEqual(d1.find(a=1), {'t'})
+
+    def test_renameKeys(self):
+        d1 = buildContainer(PLAYERS)
+        d1.addIndex('team')
+        d1.addIndex('club')
+
+        d1.renameKeys({'team': 'club'})
+
+        self.assertEqual(d1.find(team='RMA'), set())
+        self.assertEqual(d1.find(club='RMA'), {'a', 'c'})
+
+    def test_indexesAndListeners(self):
+        d1 = buildContainer(PLAYERS)
+        events = []
+        d1.addChangeListener(events.append)
+        d1.addIndex('team')
+        d1.removeChangeListener(events.append)
+
+        d1['a'] = {'team': 'FCB'}
+        self.assertEqual(d1.find(team='FCB'), {'a', 'b'})
+        self.assertEqual(events, [])
+
+        d1.removeIndex('team')
+        self.assertEqual(d1.getV('a').changeListeners, None)
+        self.assertEqual(d1.find(team='FCB'), {'a', 'b'})
+
+    def test_pickle(self):
+        d1 = buildContainer(PLAYERS)
+        d1.addIndex('team')
+
+        d2 = pickle.loads(pickle.dumps(d1))
+        self.assertEqual(d2.indexes, {})
+        self.assertEqual(d2.find(team='RMA'), {'a', 'c'})
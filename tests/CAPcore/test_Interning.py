@@ -0,0 +1,93 @@
+import unittest
+from time import struct_time
+
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict
+from src.CAPcore.Interning import InternPool, disableInterning, enableInterning
+from src.CAPcore.LoggedDict import LoggedDict
+from src.CAPcore.LoggedValue import LoggedValue
+
+TIME1 = struct_time((2024, 12, 13, 10, 4, 10, 4, 348, 0))
+
+
+def newString(text: str) -> str:
+    # A str equal to text but a different object (as when parsing)
+    return "".join(list(text))
+
+
+class TestInterning(unittest.TestCase):
+    def tearDown(self):
+        disableInterning()
+
+    def test_pool(self):
+        p1 = InternPool(maxSize=3, maxLength=5)
+        s1 = newString("abc")
+        s2 = newString("abc")
+        self.assertIsNot(s1, s2)
+
+        self.assertIs(p1.intern(s1), s1)
+        self.assertIs(p1.intern(s2), s1)
+        self.assertIs(p1.intern(s1), s1)
+        self.assertEqual(p1.intern(1.0), 1.0)
+        self.assertIs(type(p1.intern(1)), int)
+        self.assertIs(p1.intern(True), True)
+        self.assertEqual(len(p1), 3)
+        p1.intern("def")
+        self.assertEqual(len(p1), 3)
+
+        longText = newString("abcdef")
+        self.assertIs(p1.intern(longText), longText)
+        values = [1, 2]
+        self.assertIs(p1.intern(values), values)
+
+        stats = p1.stats()
+        self.assertEqual((stats.lookups, stats.hits, stats.size), (6, 2, 3))
+        self.assertAlmostEqual(stats.hitRate, 2 / 6)
+        self.assertGreater(stats.bytesSaved, 0)
+
+        p1.clear()
+        self.assertEqual(p1.stats(), (0, 0, 0.0, 0, 0))
+
+    def test_floats(self):
+        p1 = InternPool()
+        zero = float("0.0")
+        self.assertIs(p1.intern(zero), zero)
+        negZero = float("-0.0")
+        self.assertIs(p1.intern(negZero), negZero)
+        self.assertEqual(str(p1.intern(float("-0.0"))), "-0.0")
+        self.assertEqual(str(p1.intern(float("0.0"))), "0.0")
+        self.assertEqual(len(p1), 2)
+
+        nan = float("nan")
+        for _ in range(3):
+            self.assertIs(p1.intern(nan), nan)
+            p1.intern(float("nan"))
+        self.assertEqual(len(p1), 2)
+        self.assertEqual(p1.stats().lookups, 4)
+
+        v1 = LoggedValue(timestamp=TIME1)
+        enableInterning(p1)
+        v1.set(float("-0.0"), timestamp=TIME1)
+        self.assertEqual(str(v1.get()), "-0.0")
+
+    def test_containers(self):
+        p1 = enableInterning()
+        self.assertIs(LoggedValue.internPool, p1)
+
+        d1 = DictOfLoggedDict(timestamp=TIME1)
+        d1.update({'a': {newString('team'): newString('red')}, 'b': {newString('team'): newString('red')}},
+                  timestamp=TIME1)
+        d1['c'] = {newString('team'): newString('red')}
+        l1 = LoggedDict(timestamp=TIME1)
+        l1[newString('team')] = newString('red')
+
+        keys = [next(iter(d1.getV(k).current)) for k in 'abc'] + [next(iter(l1.current))]
+        values = [d1.getV(k).getV('team').value for k in 'abc'] + [l1.getV('team').value]
+        self.assertTrue(all(k is keys[0] for k in keys))
+        self.assertTrue(all(v is values[0] for v in values))
+        self.assertIs(d1.getV('a').getV('team').history[-1][2], values[0])
+        self.assertGreater(p1.stats().hits, 0)
+
+        self.assertIs(disableInterning(), p1)
+        self.assertIsNone(LoggedValue.internPool)
+        d1['d'] = {'team': newString('red')}
+        self.assertIsNot(d1.getV('d').getV('team').value, values[0])
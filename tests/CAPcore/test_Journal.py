@@ -0,0 +1,116 @@
+import os
+import pickle
+import tempfile
+import unittest
+from time import struct_time
+
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict
+from src.CAPcore.Journal import ChangeJournal, readJournal, replayJournal
+from src.CAPcore.LoggedDict import LoggedDict, ChangeEvent
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpDir.name, "journal.bin")
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_journal1(self):
+        time0 = struct_time((2024, 12, 13, 23, 4, 24, 4, 348, 0))
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        time2 = struct_time((2024, 12, 13, 23, 4, 44, 4, 348, 0))
+        time3 = struct_time((2024, 12, 13, 23, 4, 54, 4, 348, 0))
+        dAux1 = {'a1': 1, 'a2': 'ce'}
+
+        d1 = DictOfLoggedDict(timestamp=time0)
+        d1.update({'a': dAux1, 'b': dAux1, 'c': dAux1}, timestamp=time0)
+        snapshot = pickle.dumps(d1)
+
+        with ChangeJournal(self.filename, groupSize=3) as journal:
+            journal.attach(d1)
+            d1.update({'a': {'a1': 2}, 'd': dAux1}, timestamp=time1)
+            d1.purge('b', timestamp=time1)
+            d1.pop('c', timestamp=time2)
+            d1.replace({'a': {'a1': 3}, 'b': dAux1, 'd': dAux1}, timestamp=time2)
+            d1.renameKeys({'a2': 'a3'}, timestamp=time3)
+            d1.getV('d')['a1'] = 7
+            journal.detach(d1)
+            d1['d'] = {'a1': 8}
+
+        events = list(readJournal(self.filename))
+        self.assertIsInstance(events[0], ChangeEvent)
+        self.assertEqual(events[0], ChangeEvent('a', 'a1', 'U', time1, 1, 2))
+
+        d2 = pickle.loads(snapshot)
+        r1 = replayJournal(d2, self.filename)
+        d1['d'] = {'a1': 7, 'a3': 'ce'}
+
+        self.assertEqual(r1, len(events))
+        self.assertEqual(d2, d1)
+        self.assertEqual(set(d2.keysV()), set(d1.keysV()))
+        self.assertTrue(d2.checkCounters())
+        for k in d1.keysV():
+            self.assertEqual(d2.getV(k).isDeleted(), d1.getV(k).isDeleted())
+            for sk, v in d1.getV(k).itemsV():
+                self.assertEqual(d2.getV(k).getV(sk).history, v.history[:len(d2.getV(k).getV(sk).history)])
+
+    def test_journal2(self):
+        d1 = LoggedDict()
+        d1.update({'a': 1, 'b': 2})
+        d2 = pickle.loads(pickle.dumps(d1))
+
+        journal = ChangeJournal(self.filename, groupSize=1, fsyncEvery=0).attach(d1)
+        d1['a'] = 3
+        d1.purge('b')
+        d1['c'] = None
+        journal.close()
+        with open(self.filename, "ab") as handle:
+            handle.write(b"\x10\x00\x00\x00trunc")
+
+        replayJournal(d2, self.filename)
+        self.assertEqual(d2, d1)
+        self.assertEqual(d2.getV('a').history, d1.getV('a').history)
+        self.assertIn('c', d2)
+        self.assertEqual(len(d2), 2)
+
+        # Closed journals are detached
+        d1['d'] = 4
+        self.assertIsNone(d1.changeListeners)
+
+        # Reopening drops the incomplete record, so the new ones can be read
+        with ChangeJournal(self.filename, groupSize=1).attach(d1):
+            d1['e'] = 5
+        d1['f'] = 6
+        events = list(readJournal(self.filename))
+        self.assertEqual(len(events), 4)
+        self.assertEqual(events[-1].subkey, 'e')
+
+    def test_journalReplayEquivalence(self):
+        time0 = struct_time((2024, 12, 13, 23, 4, 24, 4, 348, 0))
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        time2 = struct_time((2024, 12, 13, 23, 4, 44, 4, 348, 0))
+
+        d1 = DictOfLoggedDict(timestamp=time0)
+        d1.update({'a': {'a1': 1, 'a2': 'ce'}, 'b': {'a1': 2}}, timestamp=time0)
+        d2 = pickle.loads(pickle.dumps(d1))
+
+        with ChangeJournal(self.filename, groupSize=1).attach(d1):
+            d1.update({'a': {'a1': 3}, 'c': {'a1': 4}}, timestamp=time1)
+            d1.replace({'a': {'a1': 3, 'a2': 'ce'}, 'b': {'a1': 2}, 'c': {'a1': 4}, 'q': {'d': None}},
+                       timestamp=time1)
+            d1['s'] = {}
+            d1.addExclusion('a2', timestamp=time1)
+            d1.update({'b': {'a2': 'xx'}}, timestamp=time1)
+            d1.removeExclusion('a2')
+            d1.addExclusion('zz', timestamp=time2)
+            d1.purge('b', timestamp=time2)
+            d1.renameKeys({'a1': 'a3'}, timestamp=time2)
+            d1.update({'c': {'a3': None}, 't': {'x': None}}, timestamp=time2)
+
+        replayJournal(d2, self.filename)
+        self.assertEqual(d2._asdict(), d1._asdict())
+        self.assertEqual(set(d2.keysV()), set(d1.keysV()))
+        self.assertEqual(d2.exclusions, d1.exclusions)
+        self.assertTrue(d2.checkCounters())
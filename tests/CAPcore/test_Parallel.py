@@ -0,0 +1,101 @@
+import unittest
+from threading import Event, Thread
+
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict
+from src.CAPcore.Parallel import chooseStartMethod, diffChunk, parallelApply, parallelDiff
+from tests.CAPcore.common import TIME1, TIME2, buildContainer
+
+
+def buildNewValues():
+    result = {f"k{i}": {'a': i, 'b': 'x', 'c': [i]} for i in range(2, 60)}
+    result['k2'] = {'a': 2, 'b': 'y', 'd': 1}
+    result['k3'] = {'a': 3}
+    result['k5'] = {'a': 5, 'b': 'x', 'c': [5]}
+    result['k7'] = {'a': 7, 'b': 'x', 'z': 1}
+    result['k8'] = {'a': 8}
+    return result
+
+
+class TestParallel(unittest.TestCase):
+    def test_diffChunk(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x', 'c': [i]} for i in range(50)}, purged=['k3', 'k4'],
+                            exclusions={'z'})
+        d1.getV('k5').addExclusion('c')
+        newValues = buildNewValues()
+
+        result = diffChunk(['k2', 'k5', 'k6', 'k7', 'k8'], False, d1, newValues)
+        self.assertEqual([k for k, _ in result], ['k2', 'k7', 'k8'])
+        self.assertEqual(repr(result[0][1]), repr(d1.getV('k2').diff(newValues['k2'])))
+        self.assertEqual([k for k, _ in diffChunk(['k8'], True, d1, newValues)], [])
+
+    def test_sameAsDiff(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x', 'c': [i]} for i in range(50)}, purged=['k3', 'k4'],
+                            exclusions={'z'})
+        d1.getV('k5').addExclusion('c')
+        newValues = buildNewValues()
+
+        for doUpdate in (False, True):
+            expected = d1.diff(newValues, doUpdate=doUpdate)
+            for chunkSize in (1, 7, 1000):
+                result = parallelDiff(d1, newValues, doUpdate=doUpdate, chunkSize=chunkSize, maxWorkers=2,
+                                      minRecords=0)
+                self.assertEqual(result.show(), expected.show())
+                self.assertEqual(list(result.changed), list(expected.changed))
+                self.assertEqual(result.changeCount, expected.changeCount)
+
+    def test_otherDictOfLoggedDict(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x', 'c': [i]} for i in range(50)}, purged=['k3', 'k4'],
+                            exclusions={'z'})
+        d1.getV('k5').addExclusion('c')
+        d2 = DictOfLoggedDict(timestamp=TIME1)
+        d2.update(buildNewValues(), timestamp=TIME1)
+
+        result = parallelDiff(d1, d2, chunkSize=10, maxWorkers=2, minRecords=0)
+        self.assertEqual(result.show(), d1.diff(d2).show())
+        # Below minRecords, computed in the calling process
+        self.assertEqual(parallelDiff(d1, d2, chunkSize=10, maxWorkers=2).show(), d1.diff(d2).show())
+
+        with self.assertRaises(TypeError):
+            parallelDiff(d1, [])
+        with self.assertRaises(ValueError):
+            parallelDiff(d1, {}, chunkSize=0)
+        with self.assertRaises(ValueError):
+            parallelDiff(d1, {}, startMethod='thread')
+
+    def test_startMethod(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x', 'c': [i]} for i in range(50)}, purged=['k3', 'k4'],
+                            exclusions={'z'})
+        newValues = buildNewValues()
+
+        result = parallelDiff(d1, newValues, chunkSize=10, maxWorkers=2, minRecords=0, startMethod='spawn')
+        self.assertEqual(result.show(), d1.diff(newValues).show())
+
+        # Never fork while other threads run
+        running = Event()
+        release = Event()
+        thread = Thread(target=lambda: (running.set(), release.wait()))
+        thread.start()
+        running.wait()
+        try:
+            self.assertNotEqual(chooseStartMethod(), 'fork')
+        finally:
+            release.set()
+            thread.join()
+
+    def test_apply(self):
+        newValues = buildNewValues()
+        for doUpdate in (False, True):
+            d1, d2 = (buildContainer({f"k{i}": {'a': i, 'b': 'x', 'c': [i]} for i in range(50)}, purged=['k3', 'k4'],
+                                     exclusions={'z'}) for _ in range(2))
+            for d in (d1, d2):
+                d.getV('k5').addExclusion('c')
+            self.assertTrue(parallelApply(d1, newValues, timestamp=TIME2, doUpdate=doUpdate, chunkSize=10,
+                                          maxWorkers=2, minRecords=0))
+            if doUpdate:
+                d2.update(newValues, timestamp=TIME2)
+            else:
+                d2.replace(newValues, timestamp=TIME2)
+
+            self.assertEqual(d1._asdict(), d2._asdict())
+            self.assertTrue(d1.checkCounters())
+            self.assertFalse(parallelApply(d1, d1._asdict(), doUpdate=doUpdate, chunkSize=10))
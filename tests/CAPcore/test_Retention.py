@@ -0,0 +1,90 @@
+import unittest
+from time import struct_time
+
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict
+from src.CAPcore.LoggedValue import LoggedValue
+from src.CAPcore.Retention import (KeepLast, KeepNewerThan, KeepDaily, retentionPolicy, CompactionReport,
+                                   RetentionPolicy)
+
+DAY1 = [struct_time((2024, 12, 13, 10, 4, s, 4, 348, 0)) for s in (10, 20, 30)]
+DAY2 = [struct_time((2024, 12, 14, 10, 4, s, 5, 349, 0)) for s in (10, 20, 30)]
+
+
+def buildValue(compact=False):
+    result = LoggedValue(v=0, timestamp=DAY1[0], compactHistory=compact)
+    for i, t in enumerate(DAY1[1:] + DAY2, start=1):
+        result.set(i, timestamp=t)
+    return result
+
+
+class TestRetention(unittest.TestCase):
+    def test_keepLast1(self):
+        for compact in (False, True):
+            v1 = buildValue(compact)
+            r1 = v1.compact(KeepLast(2))
+
+            self.assertEqual(r1.entries, 4)
+            self.assertGreater(r1.bytes, 0)
+            self.assertEqual(len(v1), 2)
+            self.assertEqual([e[2] for e in v1.history], [4, 5])
+            self.assertEqual(v1.get(), 5)
+
+    def test_window1(self):
+        for compact in (False, True):
+            v1 = buildValue(compact)
+            r1 = v1.compact(KeepNewerThan(15, reference=DAY2[2]))
+
+            self.assertEqual(r1.entries, 4)
+            self.assertEqual([e[2] for e in v1.history], [4, 5])
+
+            r2 = v1.compact(KeepNewerThan(1, reference=DAY2[2]))
+            self.assertEqual(r2.entries, 1)
+            r3 = v1.compact(KeepNewerThan(1))
+            self.assertEqual(r3.entries, 0)
+            self.assertEqual(len(v1), 1)
+
+    def test_daily1(self):
+        for compact in (False, True):
+            v1 = buildValue(compact)
+            r1 = v1.compact(KeepDaily())
+
+            self.assertEqual(r1.entries, 4)
+            self.assertEqual([e[2] for e in v1.history], [2, 5])
+            self.assertEqual(v1.valueAt(DAY2[0]), 2)
+
+    def test_policy1(self):
+        self.assertIsInstance(retentionPolicy(keepLast=3), KeepLast)
+        self.assertIsInstance(retentionPolicy(window=3600), KeepNewerThan)
+        self.assertIsInstance(retentionPolicy(daily=True), KeepDaily)
+        with self.assertRaises(ValueError):
+            retentionPolicy(keepLast=3, daily=True)
+        with self.assertRaises(ValueError):
+            KeepLast(0)
+        with self.assertRaises(TypeError):
+            RetentionPolicy()
+
+    def test_compactDOLD1(self):
+        d1 = DictOfLoggedDict(timestamp=DAY1[0])
+        for i, t in enumerate(DAY1 + DAY2):
+            d1.update({'a': {'a1': i, 'a2': 'ce'}, 'b': {'a1': i}}, timestamp=t)
+        content = d1._asdict()
+
+        r1 = d1.compact(KeepLast(1))
+
+        self.assertIsInstance(r1, CompactionReport)
+        self.assertEqual(r1.values, 10)
+        self.assertEqual(r1.records, 12)
+        self.assertEqual(r1.container, 6)
+        self.assertGreater(r1.bytes, 0)
+        self.assertDictEqual(d1._asdict(), content)
+        self.assertEqual(len(d1.getV('a').getV('a1')), 1)
+        self.assertEqual(len(d1.history), 1)
+        self.assertEqual(d1.compact(KeepLast(1)), CompactionReport())
+
+        for i in range(3):
+            d1.update({'a': {'a1': 10 + i}})
+        r2 = d1.getV('a').compact(KeepLast(1), values=False)
+        self.assertEqual((r2.values, r2.records, r2.container), (0, 3, 0))
+        r3 = d1.getV('a').compact(KeepLast(1))
+        self.assertEqual((r3.values, r3.records, r3.container), (3, 0, 0))
+        self.assertGreater(r3.bytes, 0)
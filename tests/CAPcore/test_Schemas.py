@@ -0,0 +1,166 @@
+import pickle
+import unittest
+from copy import deepcopy
+
+from src.CAPcore.LoggedValue import LoggedValue
+from src.CAPcore.Schemas import SchemaDict, SchemaFamily
+from tests.CAPcore.common import TIME2, buildContainer
+
+ROWS = {**{f"k{i}": {'a': i, 'b': 'x', 'z': 0} for i in range(10)}, 'odd': {'c': 1, 'a': 2}}
+
+
+class TestSchemas(unittest.TestCase):
+    def test_schemaDict(self):
+        family = SchemaFamily(maxSchemas=4)
+        d1 = SchemaDict(family.root)
+        d2 = SchemaDict(family.root)
+        v1, v2, v3 = LoggedValue(1), LoggedValue(2), LoggedValue(3)
+
+        d1['a'] = v1
+        d1['b'] = v2
+        d2['a'] = v3
+        d2['b'] = v1
+        self.assertIs(d1.schema, d2.schema)
+        self.assertEqual(d1.schema.keys, ('a', 'b'))
+        self.assertEqual(family.numSchemas, 3)
+        self.assertIs(d1['b'], v2)
+        self.assertIsNone(d1.get('c'))
+        self.assertEqual(list(d1), ['a', 'b'])
+        self.assertEqual(dict(d1.items()), {'a': v1, 'b': v2})
+        self.assertIn('a', d1)
+        self.assertEqual(len(d1), 2)
+
+        d1['a'] = v3
+        self.assertIs(d1['a'], v3)
+        self.assertIs(d1.schema, d2.schema)
+
+        d3 = d1.copy()
+        d3['c'] = v1
+        d3['d'] = v2
+        self.assertIsNone(d3.schema)
+        self.assertEqual(list(d3.keys()), ['a', 'b', 'c', 'd'])
+        self.assertEqual(list(d1.keys()), ['a', 'b'])
+
+        del d2['a']
+        self.assertIsNone(d2.schema)
+        self.assertEqual(dict(d2), {'b': v1})
+        with self.assertRaises(KeyError):
+            del d2['a']
+
+        d1.clear()
+        self.assertIs(d1.schema, family.root)
+        self.assertEqual(len(d1), 0)
+
+    def test_views(self):
+        d1 = SchemaDict(SchemaFamily(maxKeys=2).root)
+        v1, v2, v3 = LoggedValue(1), LoggedValue(2), LoggedValue(3)
+        d1['a'] = v1
+        d1['b'] = v2
+        keys, values, items = d1.keys(), d1.values(), d1.items()
+
+        for _ in range(2):
+            self.assertEqual(list(keys), ['a', 'b'])
+            self.assertEqual(list(values), [v1, v2])
+            self.assertEqual(list(items), [('a', v1), ('b', v2)])
+        self.assertEqual((len(keys), len(values), len(items)), (2, 2, 2))
+        self.assertIn('a', keys)
+        self.assertIn(v2, values)
+        self.assertIn(('b', v2), items)
+        self.assertNotIn(('b', v1), items)
+
+        # Views follow the dict, also once it is a plain dict
+        d1['c'] = v3
+        self.assertIsNone(d1.schema)
+        self.assertEqual(list(keys), ['a', 'b', 'c'])
+        self.assertEqual(list(values), [v1, v2, v3])
+        self.assertEqual(list(items), [('a', v1), ('b', v2), ('c', v3)])
+        self.assertEqual(len(items), 3)
+
+        d2 = buildContainer(ROWS, sharedSchemas=True)
+        record = d2.getV('k0')
+        self.assertEqual(len(record.keysV()), 3)
+        self.assertIn('a', record.keysV())
+        self.assertEqual(list(record.itemsV()), list(record.itemsV()))
+        self.assertEqual([v.get() for v in record.valuesV()], [0, 'x', 0])
+
+    def test_container(self):
+        d1 = buildContainer(ROWS, purged=['k9'], exclusions={'z'}, sharedSchemas=True)
+        d2 = buildContainer(ROWS, purged=['k9'], exclusions={'z'}, sharedSchemas=False)
+
+        self.assertEqual(d1._asdict(), d2._asdict())
+        self.assertEqual(repr(d1), repr(d2))
+        self.assertFalse(d1.differs(d2))
+        self.assertIs(d1.getV('k0').current.schema, d1.getV('k5').current.schema)
+        self.assertIsNot(d1.getV('k0').current.schema, d1.getV('odd').current.schema)
+        self.assertIs(d1.getV('k0').exclusions, d1.getV('k1').exclusions)
+        self.assertEqual(d1.getV('k0').exclusions, {'z'})
+
+        for d in (d1, d2):
+            d.update({'k0': {'a': 5, 'c': 1}, 'k1': {'b': 'y'}}, timestamp=TIME2)
+            d.replace({'k0': {'a': 6}, 'k2': {'a': 2, 'b': 'x'}}, timestamp=TIME2)
+            d.renameKeys({'a': 'aa'}, timestamp=TIME2)
+        self.assertEqual(d1._asdict(), d2._asdict())
+        self.assertEqual(d1.diff({'k0': {'aa': 7}}).show(), d2.diff({'k0': {'aa': 7}}).show())
+        self.assertTrue(d1.checkCounters())
+
+    def test_alignedDiff(self):
+        d1 = buildContainer(ROWS, purged=['k9'], exclusions={'z'}, sharedSchemas=True)
+        d2 = buildContainer(ROWS, purged=['k9'], exclusions={'z'}, sharedSchemas=False)
+        for d in (d1, d2):
+            d.replace({'k0': {'a': 0, 'b': 'x'}, 'k1': {'a': 1}}, timestamp=TIME2)
+
+        # Same keys as the records, in the same order (compared slot by slot), and others
+        for newValues in ({'k0': {'a': 0, 'b': 'x'}}, {'k0': {'a': 3, 'b': 'x', 'z': 1}}, {'k1': {'a': 1, 'b': 'y'}},
+                          {'k0': {'b': 'x', 'a': 0}}, {'k0': {'a': 0}}, {'k1': {'a': 1, 'b': 'x', 'c': 2}}):
+            self.assertEqual(d1.diff(newValues).show(), d2.diff(newValues).show())
+            self.assertEqual(d1.differs(newValues), d2.differs(newValues))
+            for k, values in newValues.items():
+                self.assertEqual(d1.getV(k).diff(values, doUpdate=True).show(),
+                                 d2.getV(k).diff(values, doUpdate=True).show())
+        self.assertFalse(d1.getV('k0').differs({'a': 0, 'b': 'x'}))
+        self.assertTrue(d1.getV('k1').differs({'a': 1, 'b': 'y'}))
+        self.assertFalse(d1.getV('k1').differs({'a': 1}, doUpdate=True))
+
+    def test_exclusions(self):
+        d1 = buildContainer(ROWS, purged=['k9'], exclusions={'z'}, sharedSchemas=True)
+
+        d1.addExclusion('b', timestamp=TIME2)
+        self.assertEqual(d1.getV('k0').exclusions, {'b', 'z'})
+        self.assertIs(d1.getV('k0').exclusions, d1.getV('k1').exclusions)
+        self.assertIs(d1.getV('k0').exclusions, d1.schemas.exclusions)
+        d1['new'] = {'b': 1, 'a': 1}
+        self.assertEqual(d1['new'], {'a': 1})
+
+        d1.removeExclusion('b')
+        self.assertEqual(d1.getV('k0').exclusions, {'z'})
+        self.assertIs(d1.getV('new').exclusions, d1.schemas.exclusions)
+
+        with self.assertRaises(KeyError):
+            with d1.begin():
+                d1.addExclusion('a')
+                raise KeyError('a')
+        self.assertEqual(d1.schemas.exclusions, {'z'})
+        d1['new2'] = {'a': 1}
+        self.assertEqual(d1['new2'], {'a': 1})
+
+    def test_copies(self):
+        d1 = buildContainer(ROWS, purged=['k9'], exclusions={'z'}, sharedSchemas=True)
+
+        d2 = pickle.loads(pickle.dumps(d1))
+        self.assertEqual(d2._asdict(), d1._asdict())
+        self.assertIs(d2.getV('k0').current.schema, d2.getV('k1').current.schema)
+        d2['k0'] = {'a': 1, 'b': 'x', 'c': 3}
+        d2['new'] = {'a': 1}
+        self.assertEqual(d2['k0'], {'a': 1, 'b': 'x', 'c': 3})
+
+        r1 = pickle.loads(pickle.dumps(d1.getV('k0')))
+        r2 = pickle.loads(pickle.dumps(d1.getV('k1')))
+        self.assertIs(r1.current.schema, r2.current.schema)
+
+        r3 = deepcopy(d1.getV('k0'))
+        self.assertIs(r3.current.schema, d1.getV('k0').current.schema)
+        self.assertIsNot(r3.getV('a'), d1.getV('k0').getV('a'))
+
+        with d1.snapshot() as s1:
+            d1['k0'] = {'a': 100}
+            self.assertEqual(s1['k0'], {'a': 0, 'b': 'x'})
@@ -0,0 +1,119 @@
+import gc
+import pickle
+import unittest
+
+from src.CAPcore.Concurrent import ConcurrentDictOfLoggedDict
+from tests.CAPcore.common import TIME1, TIME2, buildContainer
+
+
+class TestSnapshots(unittest.TestCase):
+    def test_pointInTime(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x'} for i in range(10)}, purged=['k9'])
+        before = d1._asdict()
+        numChanges = d1.numChanges
+
+        s1 = d1.snapshot()
+        self.assertEqual(s1.saved, {})
+        self.assertEqual(s1._asdict(), before)
+
+        d1.update({'k0': {'a': 100}, 'new': {'a': 1}, 'k9': {'a': 9}}, timestamp=TIME2)
+        d1['k1'] = {'c': 1}
+        d1.purge('k2')
+        d1.pop('k3')
+        d1.renameKeys({'b': 'c'}, timestamp=TIME2)
+
+        self.assertEqual(s1._asdict(), before)
+        self.assertEqual(list(s1.keys()), list(before.keys()))
+        self.assertEqual(len(s1), 9)
+        self.assertEqual(s1.numChanges, numChanges)
+        self.assertEqual(s1.timestamp, TIME1)
+        self.assertEqual(s1.get('k0'), {'a': 0, 'b': 'x'})
+        self.assertEqual(s1['k2'], {'a': 2, 'b': 'x'})
+        self.assertEqual(dict(s1.get('k1', views=True)), {'a': 1, 'b': 'x'})
+        self.assertNotIn('new', s1)
+        self.assertNotIn('k9', s1)
+        self.assertIn('k3', s1)
+        with self.assertRaises(KeyError):
+            s1.get('new')
+        with self.assertRaises(KeyError):
+            s1.get('k9')
+        self.assertEqual(len(s1.history()), len(d1.history) - 4)
+
+        self.assertEqual(d1['k0'], {'a': 100, 'c': 'x'})
+        self.assertNotIn('k2', d1)
+        self.assertTrue(d1.checkCounters())
+
+    def test_copiesOnlyChanged(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x'} for i in range(10)}, purged=['k9'])
+        s1 = d1.snapshot()
+
+        d1['k0'] = {'a': 5}
+        d1['k0'] = {'a': 6}
+        d1.update({'k1': {'a': 1, 'b': 'x'}})
+
+        self.assertEqual(set(s1.saved), {'k0'})
+        self.assertIsNot(s1.getV('k0'), d1.getV('k0'))
+        self.assertIs(s1.getV('k5'), d1.getV('k5'))
+        self.assertEqual(s1.getV('k0').changeListeners, None)
+
+    def test_severalSnapshots(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x'} for i in range(10)}, purged=['k9'])
+        s1 = d1.snapshot()
+        d1['k0'] = {'a': 5}
+        s2 = d1.snapshot()
+        d1['k0'] = {'a': 6}
+
+        self.assertEqual(s1['k0'], {'a': 0, 'b': 'x'})
+        self.assertEqual(s2['k0'], {'a': 5})
+        self.assertEqual(d1['k0'], {'a': 6})
+
+    def test_close(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x'} for i in range(10)}, purged=['k9'])
+
+        with d1.snapshot() as s1:
+            d1['k0'] = {'a': 5}
+            self.assertEqual(s1['k0'], {'a': 0, 'b': 'x'})
+        self.assertEqual(len(d1.snapshots), 0)
+        with self.assertRaises(ValueError):
+            s1.get('k0')
+
+        d1.snapshot()
+        gc.collect()
+        self.assertEqual(len(d1.snapshots), 0)
+
+    def test_transaction(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x'} for i in range(10)}, purged=['k9'])
+        s1 = d1.snapshot()
+
+        with self.assertRaises(KeyError):
+            with d1.begin():
+                d1['k0'] = {'a': 5}
+                raise KeyError('k0')
+
+        self.assertEqual(d1['k0'], {'a': 0, 'b': 'x'})
+        self.assertEqual(s1['k0'], {'a': 0, 'b': 'x'})
+
+    def test_pickle(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x'} for i in range(10)}, purged=['k9'])
+        s1 = d1.snapshot()
+
+        d2 = pickle.loads(pickle.dumps(d1))
+        self.assertEqual(len(d2.snapshots), 0)
+        self.assertEqual(len(d1.snapshots), 1)
+        self.assertTrue(s1.isOpen)
+
+    def test_concurrent(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x'} for i in range(10)}, purged=['k9'],
+                            cls=ConcurrentDictOfLoggedDict)
+        s1 = d1.snapshot()
+        d1['k0'] = {'a': 5}
+        self.assertEqual(s1['k0'], {'a': 0, 'b': 'x'})
+        self.assertEqual(len(list(s1.items())), 9)
+
+    def test_applyDiff(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x'} for i in range(10)}, purged=['k9'])
+        s1 = d1.snapshot()
+
+        d1.applyDiff(d1.diff({'k0': {'a': 5}}))
+        self.assertEqual(s1['k0'], {'a': 0, 'b': 'x'})
+        self.assertEqual(len(list(s1.keys())), 9)
@@ -0,0 +1,113 @@
+import unittest
+from time import struct_time
+
+from src.CAPcore.DictLoggedDict import DictOfLoggedDict, DictData
+from src.CAPcore.LoggedDict import ChangeEvent, LoggedDict
+from src.CAPcore.Subscriptions import ChangeQueue
+
+TIME1 = struct_time((2024, 12, 13, 10, 4, 10, 4, 348, 0))
+TIME2 = struct_time((2024, 12, 14, 10, 4, 10, 5, 349, 0))
+
+
+class TestSubscriptions(unittest.TestCase):
+    def test_queue(self):
+        q1 = ChangeQueue(maxLength=3)
+        for i in range(5):
+            q1(i)
+
+        self.assertEqual(len(q1), 3)
+        self.assertEqual(q1.dropped, 2)
+        self.assertEqual(q1.numEvents, 5)
+        self.assertEqual(q1.get(maxEvents=2), [2, 3])
+        self.assertEqual(q1.get(), [4])
+        self.assertFalse(q1)
+        self.assertEqual(q1.resetDropped(), 2)
+        self.assertEqual(q1.dropped, 0)
+
+        q2 = ChangeQueue(maxLength=None)
+        for i in range(5):
+            q2(i)
+        self.assertEqual(q2.get(), list(range(5)))
+        self.assertEqual(q2.dropped, 0)
+
+        with self.assertRaises(ValueError):
+            ChangeQueue(maxLength=0)
+
+    def test_loggedDict(self):
+        d1 = LoggedDict(timestamp=TIME1)
+        q1 = d1.subscribe()
+
+        d1.update({'a': 1}, timestamp=TIME1)
+        d1.update({'a': 2, 'b': 3}, timestamp=TIME2)
+        d1.purge('b', timestamp=TIME2)
+        d1.update({'b': 4}, timestamp=TIME2)
+
+        self.assertEqual([(e.subkey, e.action, e.oldValue, e.newValue) for e in q1.get()],
+                         [('a', 'A', None, 1), ('a', 'U', 1, 2), ('b', 'A', None, 3), ('b', 'D', 3, None),
+                          ('b', 'C', None, 4)])
+
+        d1.unsubscribe(q1)
+        d1['a'] = 5
+        self.assertEqual(len(q1), 0)
+        self.assertIsNone(d1.changeListeners)
+
+    def test_valuesChangedDirectly(self):
+        d1 = LoggedDict(timestamp=TIME1)
+        d1.update({'a': 1, 'b': 2}, timestamp=TIME1)
+        q1 = d1.subscribe()
+
+        self.assertTrue(d1.getV('a').set(3, timestamp=TIME2))
+        self.assertFalse(d1.getV('a').set(3, timestamp=TIME2))
+        d1.getV('b').clear(timestamp=TIME2)
+        d1.getV('b').set(4, timestamp=TIME2)
+        self.assertEqual(q1.get(), [ChangeEvent(None, 'a', 'U', TIME2, 1, 3),
+                                    ChangeEvent(None, 'b', 'D', TIME2, 2, None),
+                                    ChangeEvent(None, 'b', 'C', TIME2, None, 4)])
+
+        d2 = DictOfLoggedDict(timestamp=TIME1)
+        d2.update({'x': {'a': 1}}, timestamp=TIME1)
+        d2.addIndex('a')
+        q2 = d2.subscribe()
+
+        d2.getV('x').getV('a').set(5, timestamp=TIME2)
+        self.assertEqual(q2.get(), [ChangeEvent('x', 'a', 'U', TIME2, 1, 5)])
+        self.assertEqual(d2.find(a=5), {'x'})
+
+        # Changes done through the container are told once
+        d2.update({'x': {'a': 6}}, timestamp=TIME2)
+        self.assertEqual(len(q2.get()), 1)
+
+    def test_dictData(self):
+        d1 = DictData(timestamp=TIME1)
+        d1.update({'a': 1}, timestamp=TIME1)
+        q1 = d1.subscribe(maxLength=10)
+
+        d1.delete(timestamp=TIME2)
+        d1.restore(timestamp=TIME2)
+
+        self.assertEqual(q1.get(), [ChangeEvent(None, None, 'D', TIME2, None, None),
+                                    ChangeEvent(None, None, 'C', TIME2, None, None)])
+
+    def test_dictOfLoggedDict(self):
+        d1 = DictOfLoggedDict(timestamp=TIME1)
+        d1.update({'x': {'a': 1}}, timestamp=TIME1)
+        q1 = d1.subscribe()
+        q2 = d1.subscribe(maxLength=1)
+
+        d1.update({'x': {'a': 2}, 'y': {'b': 1}}, timestamp=TIME2)
+        d1.purge('x', timestamp=TIME2)
+
+        events = q1.get()
+        self.assertEqual([(e.key, e.subkey, e.action) for e in events],
+                         [('x', 'a', 'U'), ('y', None, 'A'), ('x', None, 'D')])
+        self.assertEqual(events[0].timestamp, TIME2)
+        # New records are notified once, with their contents
+        self.assertEqual(events[1].newValue, {'b': 1})
+        self.assertEqual(q2.dropped, 2)
+        self.assertEqual(q2.get(), events[-1:])
+
+        d1.unsubscribe(q1)
+        d1.unsubscribe(q2)
+        d1['y'] = {'b': 2}
+        self.assertFalse(q1)
+        self.assertIsNone(d1.getV('y').changeListeners)
@@ -0,0 +1,165 @@
+import unittest
+
+from src.CAPcore.TabularDiff import diffTable, applyTable, tableColumns, differentMask, MISSING
+from tests.CAPcore.common import TIME2, buildContainer
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+TABLE = {'id': ['a', 'b', 'd'],
+         'x': [1, 20, 4],
+         'y': ['ya', 'yb', 'yd']}
+
+
+def tableAsDict(table, keyColumn='id'):
+    keys, columns = tableColumns(table, keyColumn)
+    return {k: {name: column[row] for name, column in columns.items()} for row, k in enumerate(keys)}
+
+
+ROWS = {'a': {'x': 1, 'y': 'ya'},
+        'b': {'x': 2, 'y': 'yb', 'z': True},
+        'c': {'x': 3, 'y': 'yc'},
+        'd': {'x': 4}}
+
+
+class TestTabularDiff(unittest.TestCase):
+    def test_tableColumns(self):
+        keys, columns = tableColumns(TABLE, 'id')
+
+        self.assertEqual(keys, ['a', 'b', 'd'])
+        self.assertEqual(set(columns), {'x', 'y'})
+
+    def test_tableColumnsErrors(self):
+        with self.assertRaises(KeyError):
+            tableColumns(TABLE, 'key')
+        with self.assertRaises(ValueError):
+            tableColumns({'id': ['a', 'b'], 'x': [1]}, 'id')
+        with self.assertRaises(ValueError):
+            tableColumns({'id': ['a', 'a'], 'x': [1, 2]}, 'id')
+        with self.assertRaises(TypeError):
+            tableColumns([('a', 1)], 'id')
+
+    def test_differentMask(self):
+        self.assertEqual(differentMask([1, MISSING, [1, 2]], [1, 2, [1, 3]]), [False, True, True])
+
+    def test_diffTableReplace(self):
+        d1 = buildContainer(ROWS, purged=['d'])
+
+        result = diffTable(d1, TABLE, 'id')
+
+        self.assertEqual(repr(result), repr(d1.diff(tableAsDict(TABLE))))
+        self.assertEqual(set(result.added), {'d'})
+        self.assertEqual(set(result.removed), {'c'})
+        self.assertEqual(set(result.changed), {'b'})
+        self.assertEqual(result.changed['b'].changed, {'x': (2, 20)})
+        self.assertEqual(set(result.changed['b'].removed), {'z'})
+
+    def test_diffTableUpdate(self):
+        d1 = buildContainer(ROWS, purged=['d'])
+
+        result = diffTable(d1, TABLE, 'id', doUpdate=True)
+
+        self.assertEqual(repr(result), repr(d1.diff(tableAsDict(TABLE), doUpdate=True)))
+        self.assertEqual(len(result.changed['b'].removed), 0)
+
+    def test_diffTableNoChanges(self):
+        d1 = buildContainer(ROWS, purged=['d'])
+        table = {'id': ['a', 'b', 'c'], 'x': [1, 2, 3], 'y': ['ya', 'yb', 'yc'], 'z': [None, True, None]}
+        d1['a'] = {'x': 1, 'y': 'ya', 'z': None}
+        d1['c'] = {'x': 3, 'y': 'yc', 'z': None}
+
+        self.assertFalse(diffTable(d1, table, 'id'))
+
+    def test_diffTableExclusions(self):
+        d1 = buildContainer(ROWS, purged=['d'], exclusions={'w'})
+        table = dict(TABLE, w=[0, 0, 0])
+
+        result = diffTable(d1, table, 'id')
+
+        self.assertEqual(repr(result), repr(d1.diff(tableAsDict(table))))
+        self.assertNotIn('w', result.changed['b'].added)
+
+    def test_applyTableReplace(self):
+        d1 = buildContainer(ROWS, purged=['d'])
+        d2 = buildContainer(ROWS, purged=['d'])
+        numHistory = len(d1.history)
+
+        result = applyTable(d1, TABLE, 'id', timestamp=TIME2)
+        d2.replace(tableAsDict(TABLE), timestamp=TIME2)
+
+        self.assertTrue(result)
+        self.assertEqual(d1._asdict(), d2._asdict())
+        self.assertEqual(d1._asdict(), tableAsDict(TABLE))
+        self.assertEqual(len(d1.history), numHistory + 1)
+        self.assertEqual(d1.timestamp, TIME2)
+        self.assertEqual(d1.getV('b').getV('x').last_updated, TIME2)
+        self.assertTrue(d1.getV('c').isDeleted())
+        self.assertTrue(d1.checkCounters())
+        self.assertFalse(diffTable(d1, TABLE, 'id'))
+
+    def test_applyTableUpdate(self):
+        d1 = buildContainer(ROWS, purged=['d'])
+        d2 = buildContainer(ROWS, purged=['d'])
+
+        applyTable(d1, TABLE, 'id', timestamp=TIME2, doUpdate=True)
+        d2.update(tableAsDict(TABLE), timestamp=TIME2)
+
+        self.assertEqual(d1._asdict(), d2._asdict())
+        self.assertIn('c', d1)
+        self.assertTrue(d1.checkCounters())
+
+    def test_applyTableNones(self):
+        table = {'id': ['r', 'q'], 'b': [1, None], 'e': [None, None]}
+        for doUpdate in (False, True):
+            d1 = buildContainer({'r': {'b': 1}})
+            d2 = buildContainer({'r': {'b': 1}})
+
+            applyTable(d1, table, 'id', timestamp=TIME2, doUpdate=doUpdate)
+            if doUpdate:
+                d2.update(tableAsDict(table), timestamp=TIME2)
+            else:
+                d2.replace(tableAsDict(table), timestamp=TIME2)
+
+            self.assertEqual(d1._asdict(), d2._asdict())
+            self.assertNotIn('q', d1.current)
+            self.assertTrue(d1.checkCounters())
+
+        # The diff says 'q' is added, but a record with only None values is never inserted
+        d1 = buildContainer({})
+        numChanges = d1.numChanges
+        self.assertFalse(d1.applyDiff(d1.diff({'q': {'b': None}})))
+        self.assertNotIn('q', d1.current)
+        self.assertEqual(d1.numChanges, numChanges)
+        self.assertEqual(d1.changesSince(0)[0], {})
+
+    def test_applyTableNoChanges(self):
+        d1 = buildContainer(ROWS, purged=['d'])
+        table = {'id': ['a', 'b', 'c'], 'x': [1, 2, 3], 'y': ['ya', 'yb', 'yc']}
+        d1.getV('b').purge('z')
+        numChanges = d1.numChanges
+
+        self.assertFalse(applyTable(d1, table, 'id'))
+        self.assertEqual(d1.numChanges, numChanges)
+
+    def test_applyTableRecordHistory(self):
+        d1 = buildContainer(ROWS, purged=['d'])
+        numHistory = len(d1.getV('b').history)
+
+        applyTable(d1, TABLE, 'id', timestamp=TIME2)
+
+        self.assertEqual(len(d1.getV('b').history), numHistory + 1)
+        self.assertEqual(d1.getV('b').history[-1][0], TIME2)
+
+    @unittest.skipIf(numpy is None, "NumPy not installed")
+    def test_structuredArray(self):  # pragma: no cover
+        d1 = buildContainer(ROWS, purged=['d'])
+        table = numpy.array([('a', 1, 'ya'), ('b', 20, 'yb'), ('d', 4, 'yd')],
+                            dtype=[('id', 'U4'), ('x', 'i8'), ('y', 'U4')])
+
+        result = applyTable(d1, table, 'id', timestamp=TIME2)
+
+        self.assertEqual(set(result.changed), {'b'})
+        self.assertEqual(d1._asdict(), tableAsDict(TABLE))
+        self.assertIs(type(d1['b']['x']), int)
@@ -0,0 +1,131 @@
+import unittest
+
+from src.CAPcore.DictLoggedDict import DictData
+from src.CAPcore.LoggedDict import LoggedDict
+from src.CAPcore.LoggedValue import CompactHistory, LoggedValue
+from src.CAPcore.Retention import KeepLast
+from src.CAPcore.Transactions import truncateHistory
+from tests.CAPcore.common import TIME1, TIME2, buildContainer
+
+
+class TestTransactions(unittest.TestCase):
+    def test_truncateHistory(self):
+        v1 = LoggedValue(1, timestamp=TIME1, compactHistory=True)
+        v1.set(2, timestamp=TIME2)
+        v1.set(3, timestamp=TIME2)
+        self.assertIsInstance(v1.history, CompactHistory)
+
+        truncateHistory(v1.history, 1)
+        self.assertEqual(list(v1.history), [('U', TIME1, 1)])
+
+        h1 = [1, 2, 3]
+        truncateHistory(h1, 2)
+        self.assertEqual(h1, [1, 2])
+
+    def test_loggedDictRollback(self):
+        d1 = LoggedDict(timestamp=TIME1)
+        d1.update({'a': 1, 'b': 2}, timestamp=TIME1)
+        d1.purge('b', timestamp=TIME1)
+
+        tx = d1.begin()
+        d1.update({'a': 3, 'b': 4, 'c': 5}, timestamp=TIME2)
+        d1.renameKeys({'a': 'z'})
+        tx.rollback()
+
+        self.assertEqual(d1._asdict(), {'a': 1})
+        self.assertEqual(len(d1), 1)
+        self.assertTrue(d1.checkCounters())
+        self.assertEqual(len(d1.getV('a').history), 1)
+        self.assertEqual(d1.getV('a').last_updated, TIME1)
+        self.assertTrue(d1.getV('b').isDeleted())
+        with self.assertRaises(ValueError):
+            tx.commit()
+
+    def test_dictDataContext(self):
+        d1 = DictData(timestamp=TIME1)
+        d1.update({'a': 1}, timestamp=TIME1)
+        numHistory = len(d1.history)
+
+        with self.assertRaises(RuntimeError):
+            with d1.begin():
+                d1['a'] = 2
+                d1.addExclusion('a')
+                d1.delete()
+                raise RuntimeError("Failed")
+
+        self.assertFalse(d1.isDeleted())
+        self.assertEqual(d1.exclusions, set())
+        self.assertEqual(d1._asdict(), {'a': 1})
+        self.assertEqual(len(d1.history), numHistory)
+        self.assertFalse(d1.differs({'a': 1}))
+
+        with d1.begin():
+            d1['a'] = 2
+        self.assertEqual(d1['a'], 2)
+
+    def test_containerRollback(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x'} for i in range(10)}, purged=['k9'])
+        before = repr(d1)
+        numHistory = len(d1.history)
+
+        tx = d1.begin()
+        d1.update({'k0': {'a': 100}, 'new': {'a': 1}, 'k9': {'a': 9}}, timestamp=TIME2)
+        d1['k1'] = {'c': 1}
+        d1.purge('k2', 'k3')
+        d1.pop('k4')
+
+        self.assertIs(d1.transaction, tx)
+        self.assertEqual(set(tx.records), {'k0', 'new', 'k9', 'k1', 'k2', 'k3', 'k4'})
+        tx.rollback()
+
+        self.assertIsNone(d1.transaction)
+        self.assertEqual(repr(d1), before)
+        self.assertNotIn('new', d1.current)
+        self.assertEqual(len(d1.history), numHistory)
+        self.assertTrue(d1.checkCounters())
+        self.assertEqual(d1.getV('k0').getV('a').last_updated, TIME1)
+
+    def test_containerCommit(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x'} for i in range(10)}, purged=['k9'])
+
+        with d1.begin() as tx:
+            d1['k0'] = {'a': 100}
+            with self.assertRaises(ValueError):
+                d1.begin()
+
+        self.assertFalse(tx.isOpen)
+        self.assertIsNone(d1.transaction)
+        self.assertEqual(d1['k0'], {'a': 100})
+
+        tx = d1.begin()
+        d1['k1'] = {'a': 100}
+        tx.commit()
+        tx2 = d1.begin()
+        tx2.rollback()
+        self.assertEqual(d1['k1'], {'a': 100})
+
+    def test_containerWideChanges(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x'} for i in range(10)}, purged=['k9'])
+        d1.addIndex('a')
+        before = repr(d1)
+
+        with self.assertRaises(KeyError):
+            with d1.begin():
+                d1.renameKeys({'a': 'c'}, timestamp=TIME2)
+                d1.addExclusion('b')
+                d1.replace({'k0': {'a': 5}}, timestamp=TIME2)
+                raise KeyError("Failed")
+
+        self.assertEqual(repr(d1), before)
+        self.assertEqual(d1.exclusions, set())
+        self.assertEqual(d1.getV('k0').exclusions, set())
+        self.assertEqual(d1.find(a=1), {'k1'})
+        self.assertEqual(d1.find(a=9), set())
+        self.assertTrue(d1.checkCounters())
+
+    def test_compactInTransaction(self):
+        d1 = buildContainer({f"k{i}": {'a': i, 'b': 'x'} for i in range(10)}, purged=['k9'])
+
+        with d1.begin():
+            with self.assertRaises(ValueError):
+                d1.compact(KeepLast(1))
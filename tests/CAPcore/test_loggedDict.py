@@ -1,7 +1,10 @@
+import pickle
 import unittest
+from collections.abc import Mapping
 from time import struct_time
 
 from src.CAPcore.LoggedDict import LoggedDict
+from src.CAPcore.LoggedValue import CompactHistory
 from src.CAPcore.Misc import SetDiff
 
 
@@ -537,3 +540,114 @@ class TestLoggedDict(unittest.TestCase):
         self.assertTrue(r1)
         self.assertFalse(r2)
         self.assertFalse(r3)
+
+    def test_asOf1(self):
+        time0 = struct_time((2024, 12, 13, 23, 4, 24, 4, 348, 0))
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        time2 = struct_time((2024, 12, 13, 23, 4, 44, 4, 348, 0))
+        time3 = struct_time((2024, 12, 13, 23, 4, 54, 4, 348, 0))
+
+        d1 = LoggedDict(timestamp=time0)
+        d1.update({'a': 1, 'b': 2, 'c': None}, timestamp=time1)
+        d1.update({'a': 3, 'd': 4}, timestamp=time2)
+        d1.purge('b', timestamp=time3)
+
+        self.assertDictEqual(d1.asOf(time0), {})
+        self.assertDictEqual(d1.asOf(time1), {'a': 1, 'b': 2})
+        self.assertDictEqual(d1.asOf(time2), {'a': 3, 'b': 2, 'd': 4})
+        self.assertDictEqual(d1.asOf(time3), {'a': 3, 'd': 4})
+        self.assertDictEqual(d1.asOf(time3), d1._asdict())
+
+    def test_compactHistory1(self):
+        d1 = LoggedDict(compactHistory=True)
+
+        d1['a'] = 1
+        d1.update({'b': 2})
+        d1['a'] = 3
+        self.assertIsInstance(d1.getV('a').history, CompactHistory)
+        self.assertIsInstance(d1.getV('b').history, CompactHistory)
+        self.assertEqual(len(d1.getV('a')), 2)
+        self.assertFalse(LoggedDict().compactHistory)
+
+    def test_counters1(self):
+        d1 = LoggedDict(exclusions={'x'})
+
+        d1['a'] = 1
+        d1['a'] = 2
+        d1.update({'b': 2, 'c': 3, 'x': 4, 'n': None})
+        self.assertEqual(len(d1), 3)
+        self.assertEqual(d1.numDeleted, 0)
+
+        d1.purge('a', 'b', 'z')
+        d1.purge('a')
+        self.assertEqual(len(d1), 1)
+        self.assertEqual(d1.numDeleted, 2)
+
+        d1['a'] = 5
+        d1.update({'b': 2})
+        self.assertEqual(len(d1), 3)
+        self.assertEqual(d1.numDeleted, 0)
+
+        d1.purge('c')
+        d1.renameKeys({'a': 'd'})
+        self.assertEqual(len(d1), 2)
+        self.assertEqual(d1.numDeleted, 1)
+        self.assertTrue(d1.checkCounters())
+
+        d1.getV('b').clear()
+        self.assertEqual(len(d1), 1)
+        d1.getV('c').set(4)
+        self.assertEqual(len(d1), 2)
+        self.assertEqual(d1.numDeleted, 1)
+        self.assertTrue(d1.checkCounters())
+
+        d2 = pickle.loads(pickle.dumps(d1))
+        d2.getV('c').clear()
+        self.assertEqual(len(d2), 1)
+        self.assertEqual(len(d1), 2)
+        self.assertTrue(d2.checkCounters())
+
+    def test_differs1(self):
+        d1 = LoggedDict(exclusions={'x'})
+        d1.update({'a': 1, 'b': 2, 'c': 3})
+        d1.purge('c')
+
+        cases = [{'a': 1, 'b': 2}, {'a': 1}, {'a': 1, 'b': 2, 'x': 5}, {'a': 1, 'b': 3}, {'a': 1, 'b': 2, 'c': 3},
+                 {}, d1]
+        for other in cases:
+            for doUpdate in (False, True):
+                self.assertEqual(d1.differs(other, doUpdate=doUpdate), bool(d1.diff(other, doUpdate=doUpdate)),
+                                 msg=f"{other} {doUpdate}")
+
+        self.assertEqual(d1, {'a': 1, 'b': 2})
+        self.assertNotEqual(d1, {'a': 1})
+        self.assertEqual(d1.diff({'b': 1, 'a': 0, 'd': 5}).show(compact=True),
+                         "'a': C '1' -> '0', 'b': C '2' -> '1', 'd': A '5'")
+
+        d1.getV('b').clear()
+        for other in ({'a': 1}, {'a': 1, 'b': 2}, {}):
+            self.assertEqual(d1.differs(other), bool(d1.diff(other)), msg=f"{other}")
+        self.assertEqual(d1, {'a': 1})
+
+    def test_view1(self):
+        d1 = LoggedDict()
+        d1.update({'a': 1, 'b': 2, 'c': 3})
+        d1.purge('c')
+        v1 = d1.view()
+
+        self.assertIsInstance(v1, Mapping)
+        self.assertEqual(len(v1), 2)
+        self.assertEqual(v1['a'], 1)
+        self.assertEqual(list(v1), ['a', 'b'])
+        self.assertEqual(v1, {'a': 1, 'b': 2})
+        self.assertNotIn('c', v1)
+        self.assertIsNone(v1.get('c'))
+        with self.assertRaises(KeyError):
+            _ = v1['c']
+        with self.assertRaises(TypeError):
+            v1['a'] = 5
+
+        d1['c'] = 4
+        d1['a'] = 0
+        self.assertEqual(v1.copy(), {'a': 0, 'b': 2, 'c': 4})
+        self.assertEqual(repr(v1), "{'a': 0, 'b': 2, 'c': 4}")
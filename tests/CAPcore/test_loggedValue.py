@@ -1,7 +1,19 @@
+import pickle
 import unittest
 from time import struct_time
 
-from src.CAPcore.LoggedValue import LoggedValue
+from src.CAPcore.LoggedValue import LoggedValue, CompactHistory
+
+
+class LegacyPickle:
+    """Reproduces the pickle of an object made when its class had a __dict__ instead of __slots__"""
+
+    def __init__(self, cls, state):
+        self.cls = cls
+        self.state = state
+
+    def __reduce__(self):
+        return object.__new__, (self.cls,), self.state
 
 
 class Test_LoggedValue(unittest.TestCase):
@@ -162,3 +174,108 @@ class Test_LoggedValue(unittest.TestCase):
 
         v1 = LoggedValue(timestamp=time1)
         self.assertEqual(repr(v1), 'None [t:2024-12-13 23:04:34+0000 l:0]')
+
+    def test_compactHistory1(self):
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        time2 = struct_time((2024, 12, 13, 23, 4, 44, 4, 348, 0))
+        time3 = struct_time((2024, 12, 13, 23, 4, 54, 4, 348, 0))
+
+        v1 = LoggedValue(v=5, timestamp=time1)
+        v2 = LoggedValue(v=5, timestamp=time1, compactHistory=True)
+        for v in (v1, v2):
+            v.set(6, timestamp=time2)
+            v.clear(timestamp=time3)
+
+        self.assertIsInstance(v2.history, CompactHistory)
+        self.assertEqual(len(v2), 3)
+        self.assertEqual(v2.history, v1.history)
+        self.assertEqual(v2.history[-1], ('D', time3, None))
+        self.assertEqual(v2.history[0:2], v1.history[0:2])
+        self.assertEqual(repr(v2), repr(v1))
+
+    def test_compactHistory2(self):
+        v1 = LoggedValue(compactHistory=True)
+        self.assertEqual(len(v1), 0)
+        with self.assertRaises(IndexError):
+            print(v1.history[0])
+
+    def test_slots1(self):
+        v1 = LoggedValue(5)
+
+        self.assertFalse(hasattr(v1, '__dict__'))
+        with self.assertRaises(AttributeError):
+            v1.newAttr = 3
+
+    def test_pickle1(self):
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        v1 = LoggedValue(v=5, timestamp=time1)
+        v1.set(6)
+
+        v2 = pickle.loads(pickle.dumps(v1))
+
+        self.assertEqual(v2.get(), 6)
+        self.assertEqual(v2.history, v1.history)
+        self.assertEqual(repr(v2), repr(v1))
+
+    def test_pickle2(self):
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        legacyState = {'last_updated': time1, 'deleted': False, 'value': 5, 'history': [('U', time1, 5)],
+                       'removedAttr': 1}
+
+        v1 = pickle.loads(pickle.dumps(LegacyPickle(LoggedValue, legacyState)))
+
+        self.assertIsInstance(v1, LoggedValue)
+        self.assertEqual(v1.get(), 5)
+        self.assertEqual(repr(v1), '5 [t:2024-12-13 23:04:34+0000 l:1]')
+
+    def test_valueAt1(self):
+        time0 = struct_time((2024, 12, 13, 23, 4, 24, 4, 348, 0))
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        time2 = struct_time((2024, 12, 13, 23, 4, 44, 4, 348, 0))
+        time3 = struct_time((2024, 12, 13, 23, 4, 54, 4, 348, 0))
+        time4 = struct_time((2024, 12, 13, 23, 5, 4, 4, 348, 0))
+
+        for compact in (False, True):
+            v1 = LoggedValue(v=5, timestamp=time1, compactHistory=compact)
+            v1.set(6, timestamp=time2)
+            v1.clear(timestamp=time3)
+            v1.set(7, timestamp=time4)
+
+            self.assertIsNone(v1.valueAt(time0))
+            self.assertEqual(v1.valueAt(time0, default='X'), 'X')
+            self.assertEqual(v1.valueAt(time1), 5)
+            self.assertEqual(v1.valueAt(time2), 6)
+            self.assertEqual(v1.valueAt(time3, default='X'), 'X')
+            self.assertEqual(v1.valueAt(time4), 7)
+            self.assertEqual(v1.entryAt(time3)[0], 'D')
+
+    def test_epoch1(self):
+        time1 = struct_time((2024, 12, 13, 23, 4, 34, 4, 348, 0))
+        time2 = struct_time((2024, 12, 13, 23, 4, 44, 4, 348, 0))
+        ns1 = 1734131074 * 1_000_000_000
+
+        v1 = LoggedValue(v=5, timestamp=ns1)
+        self.assertIsInstance(v1.last_updated, int)
+        self.assertEqual(repr(v1), '5 [t:2024-12-13 23:04:34+0000 l:1]')
+
+        v1.set(6, timestamp=time2)
+        self.assertEqual(v1.last_updated, ns1 + 10_000_000_000)
+        self.assertEqual(v1.valueAt(time1), 5)
+        self.assertEqual(v1.valueAt(ns1 + 1), 5)
+
+        with self.assertRaises(ValueError):
+            v1.set(7, timestamp=time1)
+
+        v1.set(7)
+        self.assertIsInstance(v1.last_updated, int)
+        self.assertEqual(len(v1), 3)
+
+    def test_epoch2(self):
+        v1 = LoggedValue(v=5, epochTimestamps=True, compactHistory=True)
+        ts1 = v1.last_updated
+        v1.clear()
+
+        self.assertIsInstance(ts1, int)
+        self.assertEqual(v1.history[0], ('U', ts1, 5))
+        self.assertEqual(v1.valueAt(ts1), 5)
+        self.assertEqual(v1.entryAt(v1.last_updated)[0], 'D')